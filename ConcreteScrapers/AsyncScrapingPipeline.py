@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from Protocols import ApartmentScrapingPipeline, AsyncApartmentScrapingPipeline
+from Services import AsyncHTTPClient
+
+class AsyncScrapingPipeline(AsyncApartmentScrapingPipeline):
+    """
+    Runs an ApartmentScrapingPipeline on the event loop. Requests go through an
+    AsyncHTTPClient, while parsing stays in the scrapers and the pipeline and is
+    done in the parse stage of the pipeline (or worker threads without one) so it
+    does not block the loop.
+    """
+
+    def __init__(self, pipeline: ApartmentScrapingPipeline, http_client: AsyncHTTPClient):
+        """
+        Args:
+            pipeline (ApartmentScrapingPipeline): The pipeline providing listing pages, the scraper, storage and image loader.
+            http_client (AsyncHTTPClient): The client used for all requests.
+        """
+        self.pipeline = pipeline
+        self.http_client = http_client
+
+    def source_identifier(self) -> str:
+        return self.pipeline.apartment_scraper.source_identifier()
+
+    def pipeline_identifier(self) -> str:
+        return self.pipeline.pipeline_identifier()
+
+    def is_update(self, apartment_url: str) -> bool:
+        return self.pipeline.is_update(apartment_url)
+
+    def link_done(self, apartment_url: str):
+        self.pipeline.link_done(apartment_url)
+
+    def when_stored(self, callback):
+        self.pipeline.when_stored(callback)
+
+    async def wait_stored(self):
+        await asyncio.to_thread(self.pipeline.wait_stored)
+
+    async def get_apartment_links(self, page: int) -> list[str]:
+        request = self.pipeline.page_request(page)
+
+        # Pipelines without numbered pages (e.g. the sitemap) have all links on their first page
+        if request is None:
+            if page == 1:
+                return await asyncio.to_thread(self.pipeline.get_apartment_links)
+            return []
+
+        status, body = await self.http_client.request(request["method"], request["url"], data = request.get("data"))
+        if status != 200 or not body.strip():
+            error = f"{self.source_identifier()} | Failed to fetch the webpage. Status code: {status}, {request['url']}"
+            logging.critical(error)
+            raise Exception(error)
+
+        # Compressing and writing the page would hold up the loop
+        await asyncio.to_thread(self.pipeline.archive_page, request["url"], body, "listing", page)
+        soup = await asyncio.to_thread(self.pipeline.parse_page, body)
+        return self.pipeline.links_from_page(soup)
+
+    async def scrape_apartment(self, apartment_url: str):
+        for attempt in range(self.pipeline.blocked_retries + 1):
+            status, body = await self.http_client.get(apartment_url)
+            if status != 200 or not body.strip():
+                error = f"Failed to fetch the webpage. Status code: {status}, {apartment_url}"
+                logging.error(error)
+                raise Exception(error)
+            if not self.pipeline.is_blocked_page(body):
+                break
+            if attempt == self.pipeline.blocked_retries:
+                raise Exception(f"Blocked page, {apartment_url}")
+            delay = self.http_client.penalize(apartment_url)
+            logging.warning(f"{self.source_identifier()} | blocked page, retrying in {delay:.0f}s, {apartment_url}")
+            await asyncio.sleep(delay)
+
+        await asyncio.to_thread(self.pipeline.archive_page, apartment_url, body, "detail")
+        parse_stage = getattr(self.pipeline, "parse_stage", None)
+        if parse_stage is not None:
+            parsing = parse_stage.submit(self.pipeline.apartment_scraper, apartment_url, body)
+            apartment_data, images_links, apartment_id = await asyncio.wrap_future(parsing)
+        else:
+            apartment_data, images_links, apartment_id = await asyncio.to_thread(
+                self.pipeline.apartment_scraper.parse, apartment_url, body
+            )
+        await asyncio.to_thread(self.pipeline.storage.append, apartment_data)
+
+        if self.pipeline.image_loader:
+            await self.pipeline.image_loader.download_images_async(
+                links = images_links,
+                source = self.source_identifier(),
+                apartment_id = apartment_id,
+                client = self.http_client
+            )
@@ -1,19 +1,33 @@
 import re
-import requests
-from bs4 import BeautifulSoup
 from Protocols import ApartmentScraper
+from Services.HTTPClient import HTTPClient
+from Services.HTMLParser import HTMLParser
 import logging
 
 class BarsApartmentScraper(ApartmentScraper):
+
+    # The quick data is read from the parent of its <strong> label, whose tag
+    # is not fixed, so the whole page is parsed
+    parse_targets = None
     
-    def __init__(self, webpage: str):
+    def __init__(self, webpage: str, http_client: HTTPClient = None, html: str | bytes = None):
         
-        response = requests.get(webpage)
+        self.http_client = http_client or HTTPClient.shared()
+        if html is None:
+            response = self.http_client.get(webpage)
 
-        if response.status_code != 200 or not response.text.strip():
-            print("Failed", response.status_code)
+            # An error page is not an apartment, the pipeline records the failure
+            if response.status_code != 200 or not response.text.strip():
+                error = f"Failed to fetch the webpage. Status code: {response.status_code}, {webpage}"
+                logging.error(error)
+                raise Exception(error)
+            html = response.text
+        elif not html.strip():
+            error = f"Empty webpage, {webpage}"
+            logging.error(error)
+            raise Exception(error)
         self.webpage = webpage
-        self.soup = BeautifulSoup(response.text, 'html.parser')
+        self.soup = HTMLParser.parse(html, self.parse_targets)
         
         self.id = self.webpage.split("/")[-1]
         self.price = None
@@ -39,14 +53,12 @@ class BarsApartmentScraper(ApartmentScraper):
     # must through some errors
     def scrape(self):
         
-        # Set a check on Capcha and if detected, use `prompt` from Python to 
-        # wait for the user to pass it.
+        # A captcha page is retried by the pipeline (see `is_blocked_page`),
+        # one that still reaches here is not an apartment
         
         captcha_div = self.soup.find('div', class_='captcha_absolute')
         if captcha_div:
-            _ = input("Detected captcha. Please, pass it and press input anything here.")
-            response = requests.get(self.webpage)
-            self.soup = BeautifulSoup(response.text, 'html.parser')
+            raise Exception(f"Bars | captcha page, {self.webpage}")
         
         self.price = self.__get_price()
         self.facilities = self.__get_facilities()
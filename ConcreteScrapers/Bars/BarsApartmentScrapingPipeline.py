@@ -1,25 +1,29 @@
-import requests
-from bs4 import BeautifulSoup
 from ConcreteStorages.CSVStorage import CSVStorage
 from ConcreteScrapers.Bars.BarsApartmentScraper import BarsApartmentScraper
 from Protocols import ApartmentScrapingPipeline
-from Services import ImageLoader
+from Services import ImageLoader, HTTPClient, ParseStage, HTMLParser
+from ConcreteStorages.HTMLArchive import HTMLArchive
 import logging
-from time import sleep
 
 import pandas as pd
 
 # https://bars.am/en/properties/standard/apartment
 class BarsApartmentScrapingPipeline(ApartmentScrapingPipeline):
 
-    def __init__(self, base_url, storage: CSVStorage, image_loader: ImageLoader):
+    # Elements of the listing pages read by `links_from_page`
+    listing_targets = ["a.wrapper-image"]
+
+    def __init__(self, base_url, storage: CSVStorage, image_loader: ImageLoader, http_client: HTTPClient = None, parse_stage: ParseStage = None, archive: HTMLArchive = None):
         self.base_url = base_url
         self.page = 1
         self.storage = storage
         self.image_loader = image_loader
+        self.http_client = http_client or HTTPClient.shared()
+        self.parse_stage = parse_stage
+        self.archive = archive
 
-        self.__set_soup(base_url)
         super().__init__(BarsApartmentScraper)
+        self.__set_soup(base_url)
 
     def navigate_to_next_page(self):
         self.navigate_to_next_page_()
@@ -28,35 +32,46 @@ class BarsApartmentScrapingPipeline(ApartmentScrapingPipeline):
         self.page += 1
         self.__set_soup(self.base_url)
 
+    def supports_prefetch(self) -> bool:
+        return True
+
+    def load_page(self, page: int):
+        return self.__fetch_soup(self.base_url, page)
+
+    def page_request(self, page: int) -> dict:
+        return {"method": "POST", "url": self.base_url, "data": self.__page_body(page)}
+
+    def parse_page(self, html):
+        # Parse the HTML content of the page with BeautifulSoup
+        return HTMLParser.parse(html, self.listing_targets)
+
+    def is_blocked_page(self, html: bytes) -> bool:
+        # Bars answers too many requests with a captcha page
+        return b"captcha_absolute" in html
+
     def scrape_apartment(self, apartment_url):
         
-        id = self.apartment_scraper.get_id(apartment_url)
-        
-        # Create an instance of ApartmentScraper with the provided URL
-        apartment_scraper: BarsApartmentScraper = self.apartment_scraper(apartment_url)
-
-        # Call the scrape method of the ApartmentScraper
-        apartment_scraper.scrape()
-        apartment_data = apartment_scraper.values()
+        # Download the page here, parse it in the parse stage
+        html = self.fetch_apartment(apartment_url)
+        apartment_data, images_links, apartment_id = self.parse_apartment(apartment_url, html)
 
         # Store or process the scraped data as needed
         self.storage.append(apartment_data)
         
         # download images
-        images_links = apartment_scraper.images_links()
         if self.image_loader:
             self.image_loader.download_images(
                 links = images_links,
                 source = BarsApartmentScraper.source_identifier(),
-                apartment_id = apartment_scraper.id
+                apartment_id = apartment_id
             )
 
     def get_apartment_links(self, page_url=None):
-        if page_url is None:
-            page_url = self.base_url
+        return self.links_from_page(self.soup)
 
+    def links_from_page(self, soup) -> list[str]:
         # Find all 'a' elements with the specific class
-        a_elements = self.soup.find_all('a', class_='wrapper-image')
+        a_elements = soup.find_all('a', class_='wrapper-image')
 
         # Iterate over the found 'a' elements and navigate to their links
         links = []
@@ -66,10 +81,12 @@ class BarsApartmentScrapingPipeline(ApartmentScrapingPipeline):
 
         return links
     
-    def __set_soup(self, url, retry_count: int = 0):
-        # Send a GET request to the website
-        body = {
-            'offset': str(self.page),
+    def __set_soup(self, url):
+        self.soup = self.__fetch_soup(url, self.page)
+
+    def __page_body(self, page: int) -> dict:
+        return {
+            'offset': str(page),
             'category': 'apartment',
             'cx8v78cx7': 'xc90v8cx8vcxv',
             'section': 'standard',
@@ -88,24 +105,19 @@ class BarsApartmentScrapingPipeline(ApartmentScrapingPipeline):
             'rooms_to': ''
         }
 
-
-        response = requests.post(url, data = body)
+    def __fetch_soup(self, url, page: int):
+        # Send a POST request to the website
+        # Failed requests are retried with backoff by the HTTP client
+        response = self.http_client.post(url, data = self.__page_body(page))
 
         # Check if the page is empty or not found, and break the loop if so
         if response.status_code != 200:
             error = f"Bars | Failed to fetch the webpage. Status code: {response.status_code}, {url}"
-        
-            if retry_count < 3:
-                sleep(retry_count + 1)
-                self.__set_soup(url, retry_count + 1)
-                return
-            else:
-                logging.critical(error)
-                raise Exception(error)
-            
+            logging.critical(error)
+            raise Exception(error)
 
-        # Parse the HTML content of the page with BeautifulSoup
-        self.soup = BeautifulSoup(response.text, 'html.parser')
+        self.archive_page(url, response.content, "listing", page)
+        return self.parse_page(response.text)
         
     def finish(self):
         self.driver.quit()
\ No newline at end of file
@@ -1,24 +1,40 @@
 import re
-import requests
 import logging
-from bs4 import BeautifulSoup
 from Protocols import ApartmentScraper
+from Services.HTTPClient import HTTPClient
+from Services.HTMLParser import HTMLParser
 
 class BnakaranApartmentScraper(ApartmentScraper):
+
+    parse_targets = [
+        "ul.property-main-features",
+        "ul.property-features",
+        "ul.property-stats",
+        "ul.property-prices",
+        "div.yandex-map",
+        "a.item"
+    ]
     
-    def __init__(self, webpage: str):
-        # Send a GET request to the website
-        response = requests.get(webpage)
-        
-        # Check if the page is empty or not found, and break the loop if so
-        if response.status_code != 200 or not response.text.strip():
-            error = f"Failed to fetch the webpage. Status code: {response.status_code}, {webpage}"
+    def __init__(self, webpage: str, http_client: HTTPClient = None, html: str | bytes = None):
+        if html is None:
+            # Send a GET request to the website
+            http_client = http_client or HTTPClient.shared()
+            response = http_client.get(webpage)
+            
+            # Check if the page is empty or not found, and break the loop if so
+            if response.status_code != 200 or not response.text.strip():
+                error = f"Failed to fetch the webpage. Status code: {response.status_code}, {webpage}"
+                logging.error(error)
+                raise Exception(error)
+            html = response.content
+        elif not html.strip():
+            error = f"Empty webpage, {webpage}"
             logging.error(error)
             raise Exception(error)
         
         # Parse the HTML content of the page with BeautifulSoup
         self.webpage = webpage
-        self.soup = BeautifulSoup(response.content, 'html.parser')
+        self.soup = HTMLParser.parse(html, self.parse_targets)
         self.id = webpage.split("-")[-1]
     
     def get_id(webpage: str) -> str:
@@ -1,38 +1,53 @@
 import re
-import requests
-from bs4 import BeautifulSoup
 from ConcreteScrapers.Bnakaran.BnakaranApartmentScraper import BnakaranApartmentScraper
 from Protocols import ApartmentScrapingPipeline
-from Services import ImageLoader
+from Services import ImageLoader, HTTPClient, ParseStage, HTMLParser
+from ConcreteStorages.HTMLArchive import HTMLArchive
 import logging
 
 class BnakaranScrapingPipeline(ApartmentScrapingPipeline):
 
-    def __init__(self, base_url, storage, image_loader: ImageLoader):
+    # Elements of the listing pages read by `links_from_page` and `last_page_from_pager`
+    listing_targets = ["a"]
+
+    def __init__(self, base_url, storage, image_loader: ImageLoader, http_client: HTTPClient = None, parse_stage: ParseStage = None, archive: HTMLArchive = None):
         self.base_url = base_url
         self.page = 1
         self.storage = storage
         self.image_loader = image_loader
+        self.http_client = http_client or HTTPClient.shared()
+        self.parse_stage = parse_stage
+        self.archive = archive
         self.potential_bad_api = False
         
-        self.__set_soup(base_url)
         super().__init__(BnakaranApartmentScraper)
+        self.__set_soup(self.page)
+
+    def __set_soup(self, page):
+        self.soup = self.__fetch_soup(page)
 
-    def __set_soup(self, url):
-        response = requests.get(url)
+    def __fetch_soup(self, page):
+        url = self.__page_url(page)
+        response = self.http_client.get(url)
         if response.status_code != 200 or not response.text.strip():
             error = f"Bnakaran | Failed to fetch the webpage. Status code: {response.status_code}, {url}"
             logging.critical(error)
             raise Exception(error)
 
-        self.soup = BeautifulSoup(response.text, 'html.parser')
+        self.archive_page(url, response.content, "listing", page)
+        return self.parse_page(response.text)
+
+    def __page_url(self, page: int) -> str:
+        if page == 1:
+            return self.base_url
+        return f"{self.base_url}?page={page}"
 
     def navigate_to_next_page(self, max_retries=3):
         retry_count = 0
+        previous_links = self.get_apartment_links()
         while retry_count < max_retries:
-            previous_links = self.get_apartment_links()
             self.page += 1
-            self.__set_soup(f"{self.base_url}?page={self.page}")
+            self.__set_soup(self.page)
             current_links = self.get_apartment_links()
 
             if previous_links != current_links:
@@ -42,19 +57,32 @@ class BnakaranScrapingPipeline(ApartmentScrapingPipeline):
 
         logging.error(f"Bnakaran | Failed to navigate after {max_retries} retries.")
         raise Exception("Bnakaran | Maximum retries exceeded for page navigation")
-        
+
+    def supports_prefetch(self) -> bool:
+        return True
+
+    def supports_fan_out(self) -> bool:
+        return True
+
+    def load_page(self, page: int):
+        # Repeated pages are detected by the page walker of `GlobalScrapingPipeline`
+        return self.__fetch_soup(page)
+
+    def page_request(self, page: int) -> dict:
+        return {"method": "GET", "url": self.__page_url(page), "data": None}
+
+    def parse_page(self, html):
+        return HTMLParser.parse(html, self.listing_targets)
 
     def scrape_apartment(self, apartment_url):
         
         id = self.apartment_scraper.get_id(apartment_url)
         
-        apartment_scraper = self.apartment_scraper(apartment_url)
-        apartment_scraper.scrape()
-        apartment_data = apartment_scraper.values()
+        html = self.fetch_apartment(apartment_url)
+        apartment_data, images_links, _ = self.parse_apartment(apartment_url, html)
 
         self.storage.append(apartment_data)
 
-        images_links = apartment_scraper.images_links()
         if self.image_loader:
             self.image_loader.download_images(
                 links=images_links,
@@ -64,8 +92,11 @@ class BnakaranScrapingPipeline(ApartmentScrapingPipeline):
         return
 
     def get_apartment_links(self):
+        return self.links_from_page(self.soup)
+
+    def links_from_page(self, soup) -> list[str]:
         # Find all <a> tags with hrefs that end in -d followed by some numbers
-        apartment_links = self.soup.find_all('a', href = re.compile(r"-d\d+$"))
+        apartment_links = soup.find_all('a', href = re.compile(r"-d\d+$"))
 
         # Extract hrefs from the links
         apartment_hrefs = set([link.get('href') for link in apartment_links])
@@ -2,45 +2,72 @@
 from ConcreteScrapers.Bnakaran.BnakaranScrapingPipeline import BnakaranScrapingPipeline
 from ConcreteScrapers.Bnakaran.BnakaranApartmentScraper import BnakaranApartmentScraper
 from Protocols import ApartmentScrapingPipeline
-from Services import ImageLoader
-import requests
+from Services import ImageLoader, HTTPClient, ParseStage, SitemapLastmodService
+from ConcreteStorages.HTMLArchive import HTMLArchive
 import re
+import gzip
 import logging
 import xml.etree.ElementTree as ET
 
+SITEMAP_NAMESPACE = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
 class BnakaranSitemapScrapingPipeline(ApartmentScrapingPipeline):
 
-    def __init__(self, sitemap_url, storage, image_loader: ImageLoader):
+    # Regex pattern to match URLs ending with -d<number>
+    apartment_pattern = re.compile(r".*-d\d+$")
+
+    # URLs recorded in the lastmod service at once
+    see_batch_size = 1000
+
+    def __init__(
+        self,
+        sitemap_url,
+        storage,
+        image_loader: ImageLoader,
+        http_client: HTTPClient = None,
+        parse_stage: ParseStage = None,
+        archive: HTMLArchive = None,
+        lastmod_service: SitemapLastmodService = None
+    ):
         self.base_url = sitemap_url
         self.page = 1
         self.finished_with_sitemap = False
         self.storage = storage
         self.image_loader = image_loader
+        self.http_client = http_client or HTTPClient.shared()
+        self.parse_stage = parse_stage
+        self.archive = archive
+        # Without it every apartment of the sitemap is listed on each run
+        self.lastmod_service = lastmod_service
 
-        # Initialize an empty list to store the filtered URLs
         filtered_urls = []
-
+        batch = []
+        self.read_sitemaps = []
         try:
-            # Fetch the sitemap
-            response = requests.get(sitemap_url)
-
-            # Check if the request was successful
-            if response.status_code == 200:
-                # Parse the XML
-                root = ET.fromstring(response.content)
-
-                # Regex pattern to match URLs ending with -d<number>
-                pattern = re.compile(r".*-d\d+$")
-
-                # Extract URLs matching the pattern
-                filtered_urls = [elem.text for elem in root.findall(".//{http://www.sitemaps.org/schemas/sitemap/0.9}loc")
-                                if pattern.match(elem.text)]
-
+            for url, lastmod in self.__read_sitemap(sitemap_url):
+                if not self.apartment_pattern.match(url) or "apartment" not in url:
+                    continue
+                if self.lastmod_service is None:
+                    filtered_urls.append(url)
+                    continue
+                batch.append((url, lastmod))
+                if len(batch) >= self.see_batch_size:
+                    self.lastmod_service.see(batch)
+                    batch = []
         except Exception as e:
             error_message = str(e)
             logging.critical(error_message)
-        
-        self.links = [link for link in filtered_urls if "apartment" in link]
+
+        if self.lastmod_service is not None:
+            # What was read before a failure is kept, with the URLs left from previous runs
+            self.lastmod_service.see(batch)
+            # Only once their URLs are recorded
+            for child_url, child_lastmod in self.read_sitemaps:
+                self.lastmod_service.set_sitemap_lastmod(child_url, child_lastmod)
+            filtered_urls = self.lastmod_service.pending()
+            logging.info(f"bnakaran | {len(filtered_urls)} new or changed apartments in the sitemap")
+
+        self.links = filtered_urls
 
         super().__init__(BnakaranApartmentScraper)
 
@@ -50,6 +77,13 @@ class BnakaranSitemapScrapingPipeline(ApartmentScrapingPipeline):
     def scrape_apartment(self, apartment_url):
         BnakaranScrapingPipeline.scrape_apartment(self, apartment_url)
 
+    def is_update(self, apartment_url) -> bool:
+        return self.lastmod_service is not None and self.lastmod_service.is_update(apartment_url)
+
+    def link_done(self, apartment_url):
+        if self.lastmod_service is not None:
+            self.lastmod_service.mark_done(apartment_url)
+
     def get_apartment_links(self):
         if self.finished_with_sitemap:
             return []
@@ -57,4 +91,55 @@ class BnakaranSitemapScrapingPipeline(ApartmentScrapingPipeline):
             return self.links
 
     def get_base_link(self) -> str:
-        return "https://www.bnakaran.com"
\ No newline at end of file
+        return "https://www.bnakaran.com"
+
+    def __read_sitemap(self, sitemap_url):
+        """
+        Streams the (URL, lastmod) pairs of a sitemap, following the sitemaps of a sitemap index.
+        The sitemaps of an index whose lastmod did not change since they were last read are skipped.
+        """
+        response = self.http_client.get(sitemap_url, stream = True)
+        if response.status_code != 200:
+            response.close()
+            raise Exception(f"bnakaran | Failed to fetch the sitemap. Status code: {response.status_code}, {sitemap_url}")
+
+        # Decompress the transfer encoding while streaming, and gzipped sitemap files
+        response.raw.decode_content = True
+        stream = response.raw
+        if sitemap_url.endswith(".gz"):
+            stream = gzip.GzipFile(fileobj = stream)
+
+        child_sitemaps = []
+        try:
+            root = None
+            for event, element in ET.iterparse(stream, events = ("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = element
+                    continue
+                if element.tag == SITEMAP_NAMESPACE + "url":
+                    url = (element.findtext(SITEMAP_NAMESPACE + "loc") or "").strip()
+                    lastmod = (element.findtext(SITEMAP_NAMESPACE + "lastmod") or "").strip() or None
+                    if url:
+                        yield url, lastmod
+                    # Parsed entries are dropped, so the memory does not grow with the sitemap
+                    root.clear()
+                elif element.tag == SITEMAP_NAMESPACE + "sitemap":
+                    url = (element.findtext(SITEMAP_NAMESPACE + "loc") or "").strip()
+                    lastmod = (element.findtext(SITEMAP_NAMESPACE + "lastmod") or "").strip() or None
+                    if url:
+                        child_sitemaps.append((url, lastmod))
+                    root.clear()
+        finally:
+            response.close()
+
+        for child_url, child_lastmod in child_sitemaps:
+            if (
+                self.lastmod_service is not None
+                and child_lastmod is not None
+                and self.lastmod_service.sitemap_lastmod(child_url) == child_lastmod
+            ):
+                logging.info(f"bnakaran | sitemap {child_url} unchanged since {child_lastmod}, skipping")
+                continue
+            yield from self.__read_sitemap(child_url)
+            self.read_sitemaps.append((child_url, child_lastmod))
@@ -1,91 +1,388 @@
 import concurrent.futures
-from Protocols import ApartmentScrapingPipeline
+import functools
+import asyncio
+import queue
+import threading
+import time
+from Protocols import ApartmentScrapingPipeline, AsyncApartmentScrapingPipeline, WorkQueue
+from ConcreteScrapers.AsyncScrapingPipeline import AsyncScrapingPipeline
 import logging
-from Services import ScrapingLogService
+from Services import ScrapingLogService, AsyncHTTPClient, URLFrontier, CrawlQueue
 import traceback
 
+class WorkQueueFeeder:
+    """
+    Takes the place of the links queue of the page walker in coordinator mode.
+    The links put while walking a page are handed to `flush` when the walker
+    waits for the page to be done.
+    """
+
+    def __init__(self, flush):
+        self.flush = flush
+        self.links = []
+
+    def put(self, link: str):
+        self.links.append(link)
+
+    def join(self):
+        links, self.links = self.links, []
+        if links:
+            self.flush(links)
+
 class GlobalScrapingPipeline:
     """
     Manages and executes multiple apartment scraping pipelines concurrently.
+    Every pipeline gets its own bounded pool of workers that scrape the
+    detail pages found by `get_apartment_links`.
     """
-    
-    def __init__(self, pipelines: list[ApartmentScrapingPipeline], log_service: ScrapingLogService):
+
+    def __init__(
+        self,
+        pipelines: list[ApartmentScrapingPipeline],
+        log_service: ScrapingLogService,
+        workers_per_source: dict[str, int] = None,
+        default_workers: int = 4,
+        prefetch_depth: int = 2,
+        max_repeated_pages: int = 3,
+        fan_out: bool = False,
+        max_listing_requests: int = 8,
+        frontier: URLFrontier = None,
+        crawl_queue: CrawlQueue = None
+    ):
         """
         Initializes the GlobalScrapingPipeline with a list of scraping pipelines and a log service.
 
         :param pipelines: List of ApartmentScrapingPipeline instances to manage.
         :param log_service: Instance of ScrapingLogService for logging.
+        :param workers_per_source: Number of concurrent detail-page workers per source identifier, e.g. {"bars": 2}.
+        :param default_workers: Number of workers for sources missing from `workers_per_source`.
+        :param prefetch_depth: Number of listing pages fetched ahead of the page being scraped.
+        :param max_repeated_pages: Number of consecutive pages repeating the previous links after which a pipeline stops.
+        :param fan_out: Load all listing pages at the same time for the pipelines that support it, instead of walking them in order.
+        :param max_listing_requests: Number of listing pages of a pipeline loaded at the same time when fanning out.
+        :param frontier: The detail pages claimed during the run, shared by all pipelines. A new one if None.
+        :param crawl_queue: Durable state of the crawl, the pipelines continue from it where the last run stopped.
         """
         self.pipelines: list[ApartmentScrapingPipeline] = pipelines
         self.log_service: ScrapingLogService = log_service
-        self.scraped_hashes = set()
-    
-    def run_pipeline(self, pipeline: ApartmentScrapingPipeline):
+        self.workers_per_source: dict[str, int] = workers_per_source or {}
+        self.default_workers: int = default_workers
+        self.prefetch_depth: int = max(0, prefetch_depth)
+        self.max_repeated_pages: int = max_repeated_pages
+        self.fan_out: bool = fan_out
+        self.max_listing_requests: int = max(1, max_listing_requests)
+        self.frontier: URLFrontier = frontier or URLFrontier()
+        self.crawl_queue: CrawlQueue = crawl_queue
+        self.skipped_lock = threading.Lock()
+
+    def workers_for(self, source: str) -> int:
         """
-        Runs a single scraping pipeline, iterating through apartment links and managing logging.
+        Returns the concurrency level configured for a source.
 
-        :param pipeline: An ApartmentScrapingPipeline instance to run.
+        :param source: Source identifier of the pipeline.
+        """
+        return max(1, self.workers_per_source.get(source, self.default_workers))
+
+    def scrape_link(self, pipeline: ApartmentScrapingPipeline, link: str) -> bool:
+        """
+        Scrapes a single detail page and records the outcome in the log service.
+
+        :param pipeline: The pipeline the link belongs to.
+        :param link: URL of the apartment page.
+        :return: False if the link was already scraped (or is being scraped by another worker), True otherwise.
         """
         source = pipeline.apartment_scraper.source_identifier()
-        
-        # Get apartments for the current page
-        links = pipeline.get_apartment_links()
-        tupled_list = tuple(links)
-        list_hash = hash(tupled_list)
-        
-        skipped_links_count = 0
-        for link in links:
-            
-            if self.log_service.did_scrape(link):
-                skipped_links_count += 1
-                continue
-            
-            self.log_service.start(
+        pipeline_id = pipeline.pipeline_identifier()
+
+        # Claiming happens atomically, so two workers (or two pipelines sharing a source)
+        # never scrape the same page, whatever the form of its URL. The log then skips the
+        # pages of previous runs, except the changed ones.
+        if not self.frontier.claim(link):
+            self.__track(pipeline_id, link, success = True)
+            return False
+        if not self.log_service.claim(source = source, webpage = link, rescrape = pipeline.is_update(link)):
+            pipeline.link_done(link)
+            self.__track(pipeline_id, link, success = True)
+            return False
+
+        self.__track(pipeline_id, link)
+        try:
+            pipeline.scrape_apartment(link)
+        except Exception as e:
+            self.__stored(pipeline, source, link, e)
+            return True
+        # Recorded as scraped once the storage wrote the apartment, a killed run scrapes it again
+        pipeline.when_stored(functools.partial(self.__stored, pipeline, source, link))
+        return True
+
+    def __stored(self, pipeline, source: str, link: str, error: Exception = None):
+        """
+        Records the outcome of a scraped link: success once its apartment is written by the
+        storage, or the error of the scraping or of the write.
+        """
+        pipeline_id = pipeline.pipeline_identifier()
+        if error is None:
+            self.log_service.success(
                 source = source,
                 webpage = link
             )
-            
+            pipeline.link_done(link)
+            self.__track(pipeline_id, link, success = True)
+        else:
+            self.log_service.error(
+                source = source,
+                webpage = link,
+                error = str(error)
+            )
+            self.__track(pipeline_id, link, success = False)
+
+    def __track(self, pipeline_id: str, link: str, success: bool = None):
+        """
+        Records in the crawl queue that a link is being scraped (`success` None) or is done with.
+        """
+        if self.crawl_queue is None:
+            return
+        if success is None:
+            self.crawl_queue.start(pipeline_id, link)
+        else:
+            self.crawl_queue.finish(pipeline_id, link, success)
+
+    def __resume(self, pipeline: ApartmentScrapingPipeline, enqueue) -> int | None:
+        """
+        Queues the links the last run found but did not scrape, and returns the last
+        listing page whose links it recorded, None when there is nothing to resume.
+        """
+        pipeline_id = pipeline.pipeline_identifier()
+        pending = self.crawl_queue.pending(pipeline_id)
+        cursor = self.crawl_queue.cursor(pipeline_id)
+        if pending or cursor is not None:
+            logging.info(f"{pipeline_id} | resuming after page {cursor} with {len(pending)} pending links")
+        for link in pending:
+            enqueue(link)
+        return cursor
+
+    def __worker(self, pipeline: ApartmentScrapingPipeline, links_queue: queue.Queue, skipped: list):
+        """
+        Consumes links from the queue until it receives the `None` sentinel.
+        """
+        while True:
+            link = links_queue.get()
             try:
-                pipeline.scrape_apartment(link)
-                self.log_service.success(
-                    source = source,
-                    webpage = link
-                )
+                if link is None:
+                    return
+                if not self.scrape_link(pipeline, link):
+                    with self.skipped_lock:
+                        skipped[0] += 1
             except Exception as e:
-                self.log_service.error(
-                    source = source,
-                    webpage = link,
-                    error = str(e)
-                )
-        
-        if skipped_links_count != 0:
-            logging.info(source + f" | Skipped {len(links)}/{skipped_links_count} links from this page")
-        
-        if len(links) != 0:
-            # Navigate to next page
-            try:
-                pipeline.navigate_to_next_page()
-            except:
-                logging.critical(source + " | failed to navigate")
-                return
-                
-            logging.info(source + f"| Navigated to page {pipeline.page}")
-            self.run_pipeline(pipeline)
-            
-        else:
-            logging.critical(source + " | no more links")
-    
+                logging.error(f"{pipeline.apartment_scraper.source_identifier()} | worker error {e}")
+            finally:
+                links_queue.task_done()
+
+    def run_pipeline(self, pipeline: ApartmentScrapingPipeline):
+        """
+        Runs a single scraping pipeline, feeding the apartment links of every page
+        to a pool of workers and navigating until there are no more links.
+
+        :param pipeline: An ApartmentScrapingPipeline instance to run.
+        """
+        source = pipeline.apartment_scraper.source_identifier()
+        worker_count = self.workers_for(source)
+
+        # Bounded, so the page walker does not run far ahead of the workers
+        links_queue = queue.Queue(maxsize = worker_count * 2)
+        skipped = [0]
+        workers = [
+            threading.Thread(
+                target = self.__worker,
+                args = (pipeline, links_queue, skipped),
+                name = f"{source}-worker-{i}",
+                daemon = True
+            ) for i in range(worker_count)
+        ]
+        for worker in workers:
+            worker.start()
+
+        completed = False
+        try:
+            cursor = None
+            if self.crawl_queue is not None:
+                cursor = self.__resume(pipeline, links_queue.put)
+
+            ended = True
+            if self.fan_out and pipeline.supports_fan_out():
+                # The cursor of a fan out is only recorded once all pages are
+                if cursor is None:
+                    self.__fan_out_pages(pipeline, links_queue, skipped)
+            elif cursor is not None and pipeline.supports_prefetch():
+                # Continue after the last recorded page, without loading the ones before it
+                try:
+                    pipeline.set_page(cursor + 1, pipeline.load_page(cursor + 1))
+                except Exception as e:
+                    logging.critical(source + f" | failed to navigate to page {cursor + 1} {e}")
+                    ended = False
+                else:
+                    ended = self.__walk_pages(pipeline, links_queue, skipped)
+            else:
+                ended = self.__walk_pages(pipeline, links_queue, skipped)
+            links_queue.join()
+            # After a failed navigation the cursor is kept, the next run continues from it
+            completed = ended
+        finally:
+            for _ in workers:
+                links_queue.put(None)
+            for worker in workers:
+                worker.join()
+            # The outcomes of the last links, before the state of the pipeline is removed
+            pipeline.wait_stored()
+
+        if completed and self.crawl_queue is not None:
+            self.crawl_queue.finish_pipeline(pipeline.pipeline_identifier())
+
+    def __walk_pages(self, pipeline: ApartmentScrapingPipeline, links_queue: queue.Queue, skipped: list) -> bool:
+        """
+        Walks the listing pages of a pipeline in a loop, putting the links of every
+        page into the queue. Pipelines that support it have the next `prefetch_depth`
+        pages fetched in the background while the current page is being scraped.
+
+        Returns True when the listing ended (no more links, or repeated pages),
+        False when navigating to the next page failed.
+        """
+        source = pipeline.apartment_scraper.source_identifier()
+        prefetch_depth = self.prefetch_depth if pipeline.supports_prefetch() else 0
+
+        prefetcher = concurrent.futures.ThreadPoolExecutor(
+            max_workers = max(1, prefetch_depth),
+            thread_name_prefix = f"{source}-prefetch"
+        )
+        prefetched: dict[int, concurrent.futures.Future] = {}
+        previous_links = None
+        repeated_pages = 0
+
+        try:
+            while True:
+                # Get apartments for the current page
+                links = pipeline.get_apartment_links()
+
+                # Start loading the next pages while this one is being scraped
+                for page in range(pipeline.page + 1, pipeline.page + prefetch_depth + 1):
+                    if page not in prefetched:
+                        prefetched[page] = prefetcher.submit(pipeline.load_page, page)
+
+                if len(links) == 0:
+                    logging.critical(source + " | no more links")
+                    return True
+
+                # Some sites serve the last page again when going past it
+                list_hash = hash(frozenset(links))
+                if list_hash == previous_links:
+                    repeated_pages += 1
+                    if repeated_pages >= self.max_repeated_pages:
+                        logging.critical(source + f" | links repeated on {repeated_pages} pages, stopping")
+                        return True
+                    logging.info(source + f" | page {pipeline.page} repeats the previous one")
+                else:
+                    repeated_pages = 0
+                    previous_links = list_hash
+
+                    if self.crawl_queue is not None:
+                        self.crawl_queue.push(pipeline.pipeline_identifier(), links, page = pipeline.page)
+
+                    skipped[0] = 0
+                    for link in links:
+                        links_queue.put(link)
+
+                    # Waiting for the page to be done keeps `pipeline.page` in sync with the
+                    # links being scraped, which the logs below rely on
+                    links_queue.join()
+
+                    if skipped[0] != 0:
+                        logging.info(source + f" | Skipped {skipped[0]}/{len(links)} links from this page")
+
+                # Navigate to next page
+                try:
+                    if prefetch_depth > 0:
+                        next_page = pipeline.page + 1
+                        soup = prefetched.pop(next_page).result()
+                        pipeline.set_page(next_page, soup)
+                    else:
+                        pipeline.navigate_to_next_page()
+                except Exception as e:
+                    logging.critical(source + f" | failed to navigate {e}")
+                    return False
+
+                logging.info(source + f"| Navigated to page {pipeline.page}")
+        finally:
+            for future in prefetched.values():
+                future.cancel()
+            prefetcher.shutdown(wait = False)
+
+    def __fan_out_pages(self, pipeline: ApartmentScrapingPipeline, links_queue: queue.Queue, skipped: list):
+        """
+        Finds the last listing page of a pipeline, then loads all of its pages with up to
+        `max_listing_requests` at the same time, putting every link into the queue once.
+        """
+        source = pipeline.apartment_scraper.source_identifier()
+        start = time.monotonic()
+
+        links_by_page = {}
+        last_page = pipeline.discover_last_page(links_by_page)
+        logging.info(source + f" | last page is {last_page}, found with {len(links_by_page)} pages loaded")
+
+        seen = set()
+        def enqueue(links: list[str]):
+            links = [link for link in links if link not in seen]
+            seen.update(links)
+            if self.crawl_queue is not None:
+                self.crawl_queue.push(pipeline.pipeline_identifier(), links)
+            for link in links:
+                links_queue.put(link)
+
+        # The pages loaded while searching are not loaded again
+        for page in sorted(links_by_page):
+            if page <= last_page:
+                enqueue(links_by_page[page])
+
+        failed_pages = 0
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers = self.max_listing_requests,
+            thread_name_prefix = f"{source}-listing"
+        ) as executor:
+            futures = {
+                executor.submit(pipeline.load_page, page): page
+                for page in range(1, last_page + 1)
+                if page not in links_by_page
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    enqueue(pipeline.links_from_page(future.result()))
+                except Exception as e:
+                    failed_pages += 1
+                    logging.error(source + f" | failed to load page {futures[future]} {e}")
+
+        logging.info(
+            source + f" | {len(seen)} unique links on {last_page} pages in {time.monotonic() - start:.1f}s"
+            f", {failed_pages} pages failed"
+        )
+        if self.crawl_queue is not None:
+            self.crawl_queue.push(pipeline.pipeline_identifier(), [], page = last_page)
+
+        links_queue.join()
+        if skipped[0] != 0:
+            logging.info(source + f" | Skipped {skipped[0]}/{len(seen)} links")
+
     def run(self):
         """
         Executes all scraping pipelines concurrently.
         """
-        with concurrent.futures.ThreadPoolExecutor() as executor:
+        if self.crawl_queue is not None:
+            self.crawl_queue.recover()
+        with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, len(self.pipelines))) as executor:
             futures = [
                 executor.submit(self.run_pipeline, pipeline) for pipeline in self.pipelines
             ]
             # Wait for all futures to complete
-            concurrent.futures.wait(futures) 
-            
+            concurrent.futures.wait(futures)
+
             # Check for errors in each future
             for future in futures:
                 error = future.exception()
@@ -93,4 +390,288 @@ class GlobalScrapingPipeline:
                     # Handle or log the error here
                     print(f"Error in future: {error}")
                     logging.error(error)
-                    traceback.print_exc()
\ No newline at end of file
+                    traceback.print_exc()
+        self.frontier.log_stats()
+
+    def run_coordinator(self, work_queue: WorkQueue, wait: bool = True, poll_interval: float = 5):
+        """
+        Walks the listing pages of all pipelines and puts their links into the work queue,
+        for workers (`run_worker`) in other processes to scrape. While waiting for them,
+        records their outcomes in the log service, the only process writing it.
+
+        :param work_queue: The queue shared with the workers.
+        :param wait: Wait until every queued link is scraped.
+        :param poll_interval: Seconds between two checks of the queue.
+        """
+        pipelines_by_id = {pipeline.pipeline_identifier(): pipeline for pipeline in self.pipelines}
+
+        def fill(pipeline: ApartmentScrapingPipeline):
+            source = pipeline.apartment_scraper.source_identifier()
+            pipeline_id = pipeline.pipeline_identifier()
+
+            def flush(links: list[str]):
+                new_links = []
+                changed_links = []
+                for link in links:
+                    if not self.frontier.claim(link):
+                        continue
+                    if pipeline.is_update(link):
+                        changed_links.append(link)
+                    elif self.log_service.did_scrape(link):
+                        pipeline.link_done(link)
+                    else:
+                        new_links.append(link)
+                added = work_queue.put(pipeline_id, source, new_links)
+                added += work_queue.put(pipeline_id, source, changed_links, requeue = True)
+                logging.info(source + f" | queued {added}/{len(links)} links")
+
+            feeder = WorkQueueFeeder(flush)
+            if self.fan_out and pipeline.supports_fan_out():
+                self.__fan_out_pages(pipeline, feeder, [0])
+            else:
+                self.__walk_pages(pipeline, feeder, [0])
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, len(self.pipelines))) as executor:
+            futures = [executor.submit(fill, pipeline) for pipeline in self.pipelines]
+            while True:
+                self.__report_results(work_queue, pipelines_by_id)
+                filling = not all(future.done() for future in futures)
+                counts = work_queue.counts()
+                remaining = counts.get("pending", 0) + counts.get("leased", 0)
+                if not filling and (not wait or remaining == 0):
+                    break
+                logging.info(f"Coordinator | {counts}")
+                time.sleep(poll_interval)
+
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    print(f"Error in future: {error}")
+                    logging.error(error)
+        self.__report_results(work_queue, pipelines_by_id)
+        self.frontier.log_stats()
+
+    def __report_results(self, work_queue: WorkQueue, pipelines_by_id: dict):
+        """
+        Records the outcomes of the links scraped by the workers in the log service.
+        """
+        while True:
+            results = work_queue.take_results()
+            if not results:
+                return
+            for result in results:
+                # Claimed with rescrape, the log may have the link from a previous run
+                self.log_service.claim(source = result["source"], webpage = result["url"], rescrape = True)
+                if result["success"]:
+                    self.log_service.success(source = result["source"], webpage = result["url"])
+                    pipeline = pipelines_by_id.get(result["pipeline"])
+                    if pipeline is not None:
+                        pipeline.link_done(result["url"])
+                else:
+                    self.log_service.error(source = result["source"], webpage = result["url"], error = result["error"])
+
+    def run_worker(
+        self,
+        work_queue: WorkQueue,
+        worker_id: str,
+        threads: int = 4,
+        lease_seconds: float = 300,
+        idle_timeout: float = 60,
+        poll_interval: float = 2
+    ):
+        """
+        Leases links from the work queue and scrapes them with the `scrape_apartment` of the
+        pipelines, until the queue stays empty for `idle_timeout` seconds. A link goes to the
+        pipeline that found it, or to one of the same source.
+
+        :param work_queue: The queue filled by the coordinator.
+        :param worker_id: Identifier of the worker, e.g. host and process id.
+        :param threads: Number of links scraped at the same time.
+        :param lease_seconds: Time after which a link is handed to another worker if this one did not complete it.
+        :param idle_timeout: Seconds without links after which the worker stops.
+        :param poll_interval: Seconds between two leases while the queue is empty.
+        """
+        pipelines_by_id = {pipeline.pipeline_identifier(): pipeline for pipeline in self.pipelines}
+        pipelines_by_source = {pipeline.apartment_scraper.source_identifier(): pipeline for pipeline in self.pipelines}
+        counts = {"scraped": 0, "failed": 0}
+        counts_lock = threading.Lock()
+
+        def complete(thread_id: str, item: dict, error: Exception = None):
+            # Completed once the storage wrote the apartment, otherwise the lease expires and it is scraped again
+            if error is None:
+                work_queue.complete(item["id"], thread_id, success = True)
+                outcome = "scraped"
+            else:
+                logging.error(f"{item['source']} | {item['url']} {error}")
+                work_queue.complete(item["id"], thread_id, success = False, error = str(error))
+                outcome = "failed"
+            with counts_lock:
+                counts[outcome] += 1
+
+        def work(thread_id: str):
+            idle_since = None
+            while True:
+                items = work_queue.lease(
+                    worker = thread_id,
+                    sources = list(pipelines_by_source),
+                    lease_seconds = lease_seconds
+                )
+                if not items:
+                    if idle_since is None:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since > idle_timeout:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                idle_since = None
+
+                for item in items:
+                    pipeline = pipelines_by_id.get(item["pipeline"]) or pipelines_by_source[item["source"]]
+                    try:
+                        pipeline.scrape_apartment(item["url"])
+                    except Exception as e:
+                        complete(thread_id, item, e)
+                        continue
+                    pipeline.when_stored(functools.partial(complete, thread_id, item))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, threads), thread_name_prefix = worker_id) as executor:
+            list(executor.map(work, [f"{worker_id}-{i}" for i in range(max(1, threads))]))
+        for pipeline in self.pipelines:
+            pipeline.wait_stored()
+        logging.info(f"Worker {worker_id} | {counts['scraped']} scraped, {counts['failed']} failed, queue is empty")
+
+    async def scrape_link_async(self, pipeline: AsyncApartmentScrapingPipeline, link: str) -> bool:
+        """
+        asyncio counterpart of `scrape_link`.
+
+        :param pipeline: The async pipeline the link belongs to.
+        :param link: URL of the apartment page.
+        :return: False if the link was already scraped (or is being scraped by another task), True otherwise.
+        """
+        source = pipeline.source_identifier()
+        pipeline_id = pipeline.pipeline_identifier()
+        if not self.frontier.claim(link):
+            self.__track(pipeline_id, link, success = True)
+            return False
+        if not self.log_service.claim(source = source, webpage = link, rescrape = pipeline.is_update(link)):
+            pipeline.link_done(link)
+            self.__track(pipeline_id, link, success = True)
+            return False
+
+        self.__track(pipeline_id, link)
+        try:
+            await pipeline.scrape_apartment(link)
+        except Exception as e:
+            self.__stored(pipeline, source, link, e)
+            return True
+        pipeline.when_stored(functools.partial(self.__stored, pipeline, source, link))
+        return True
+
+    async def run_pipeline_async(self, pipeline: AsyncApartmentScrapingPipeline, in_flight: asyncio.Semaphore):
+        """
+        Walks the listing pages of an async pipeline, requesting the next `prefetch_depth`
+        pages ahead and scraping every link as its own task.
+
+        :param pipeline: An AsyncApartmentScrapingPipeline instance to run.
+        :param in_flight: Semaphore bounding the number of apartments being scraped at the same time.
+        """
+        source = pipeline.source_identifier()
+        pipeline_id = pipeline.pipeline_identifier()
+        pages: dict[int, asyncio.Task] = {}
+        tasks = set()
+        page = 1
+        previous_links = None
+        repeated_pages = 0
+        completed = False
+
+        async def scrape(link):
+            try:
+                await self.scrape_link_async(pipeline, link)
+            finally:
+                in_flight.release()
+
+        async def schedule(links):
+            for link in links:
+                # Waits here when too many apartments are in flight
+                await in_flight.acquire()
+                task = asyncio.create_task(scrape(link))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        try:
+            if self.crawl_queue is not None:
+                pending = self.crawl_queue.pending(pipeline_id)
+                cursor = self.crawl_queue.cursor(pipeline_id)
+                if pending or cursor is not None:
+                    logging.info(f"{pipeline_id} | resuming after page {cursor} with {len(pending)} pending links")
+                await schedule(pending)
+                if cursor is not None:
+                    page = cursor + 1
+
+            while True:
+                for next_page in range(page, page + self.prefetch_depth + 1):
+                    if next_page not in pages:
+                        pages[next_page] = asyncio.create_task(pipeline.get_apartment_links(next_page))
+
+                try:
+                    links = await pages.pop(page)
+                except Exception as e:
+                    # Not an end of the listing, the cursor is kept for the next run
+                    logging.critical(source + f" | failed to navigate {e}")
+                    return
+
+                if len(links) == 0:
+                    logging.critical(source + " | no more links")
+                    completed = True
+                    return
+
+                list_hash = hash(frozenset(links))
+                if list_hash == previous_links:
+                    repeated_pages += 1
+                    if repeated_pages >= self.max_repeated_pages:
+                        logging.critical(source + f" | links repeated on {repeated_pages} pages, stopping")
+                        completed = True
+                        return
+                else:
+                    repeated_pages = 0
+                    previous_links = list_hash
+                    if self.crawl_queue is not None:
+                        self.crawl_queue.push(pipeline_id, links, page = page)
+                    await schedule(links)
+
+                page += 1
+                logging.info(source + f"| Navigated to page {page}")
+        finally:
+            for task in pages.values():
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions = True)
+            await pipeline.wait_stored()
+            if completed and self.crawl_queue is not None:
+                self.crawl_queue.finish_pipeline(pipeline_id)
+
+    async def run_async(self, http_client: AsyncHTTPClient, max_in_flight: int = 1000):
+        """
+        Executes all scraping pipelines on the running event loop. Listing pages, detail
+        pages and images share one session, limited per host by the client.
+
+        :param http_client: An open AsyncHTTPClient.
+        :param max_in_flight: Maximum number of apartments being scraped at the same time, over all pipelines.
+        """
+        if self.crawl_queue is not None:
+            self.crawl_queue.recover()
+        in_flight = asyncio.Semaphore(max_in_flight)
+        results = await asyncio.gather(
+            *[
+                self.run_pipeline_async(AsyncScrapingPipeline(pipeline, http_client), in_flight)
+                for pipeline in self.pipelines
+            ],
+            return_exceptions = True
+        )
+
+        for error in results:
+            if isinstance(error, BaseException):
+                print(f"Error in pipeline: {error}")
+                logging.error(error)
+                traceback.print_exception(error)
+        self.frontier.log_stats()
@@ -1,23 +1,46 @@
 import re
 import logging
-import requests
-from bs4 import BeautifulSoup
 from Protocols import ApartmentScraper
+from Services.HTTPClient import HTTPClient
+from Services.HTMLParser import HTMLParser
 
 class MyRealtyApartmentScraper(ApartmentScraper):
+
+    parse_targets = [
+        "div.item-view-id",
+        "div.item-view-price-params",
+        "div.pl-0",
+        "div#yandex_map_item_view",
+        "div.item-view-address",
+        "div.col-auto.mb-1",
+        "span.item-view-count",
+        "li.col-sm-6.col-lg-4.col-xl-3.mb-1",
+        "li.row.d-flex.align-items-center.no-gutters",
+        "img.owl-lazy",
+        "img.lazy-loaded"
+    ]
     
-    def __init__(self, webpage: str):
+    def __init__(self, webpage: str, http_client: HTTPClient = None, html: str | bytes = None):
         
         self.webpage = webpage
-        # Send a GET request to the website
-        response = requests.get(webpage)
+        if html is None:
+            # Send a GET request to the website
+            http_client = http_client or HTTPClient.shared()
+            response = http_client.get(webpage)
 
-        # Check if the page is empty or not found, and break the loop if so
-        if response.status_code != 200 or not response.text.strip():
-            print("Failed", response.status_code)
+            # Check if the page is empty or not found, the pipeline records the failure
+            if response.status_code != 200 or not response.text.strip():
+                error = f"Failed to fetch the webpage. Status code: {response.status_code}, {webpage}"
+                logging.error(error)
+                raise Exception(error)
+            html = response.text
+        elif not html.strip():
+            error = f"Empty webpage, {webpage}"
+            logging.error(error)
+            raise Exception(error)
 
         # Parse the HTML content of the page with BeautifulSoup
-        self.soup = BeautifulSoup(response.text, 'html.parser')
+        self.soup = HTMLParser.parse(html, self.parse_targets)
         
         self.id = None
         self.price = None
@@ -1,26 +1,35 @@
-import requests
-from bs4 import BeautifulSoup
 from ConcreteScrapers.MyRealty.MyRealtyApartmentScraper import MyRealtyApartmentScraper
 from Protocols import ApartmentScrapingPipeline
-from Services import ImageLoader
+from Services import ImageLoader, HTTPClient, ParseStage, HTMLParser
 from Protocols import Storage
+from ConcreteStorages.HTMLArchive import HTMLArchive
 import logging
 import pandas as pd
 
 class MyRealtyScrapingPipeline(ApartmentScrapingPipeline):
 
-    def __init__(self, base_url: str, storage: Storage, image_loader: ImageLoader):
+    # Elements of the listing pages read by `links_from_page` and `last_page_from_pager`
+    listing_targets = ["a.item-more-btn", "ul.pagination"]
+
+    def __init__(self, base_url: str, storage: Storage, image_loader: ImageLoader, http_client: HTTPClient = None, parse_stage: ParseStage = None, archive: HTMLArchive = None):
         self.base_url = base_url
         self.page = 1
         self.storage = storage
         self.image_loader = image_loader
+        self.http_client = http_client or HTTPClient.shared()
+        self.parse_stage = parse_stage
+        self.archive = archive
         
-        self.__set_soup(base_url)
         super().__init__(MyRealtyApartmentScraper)
+        self.__set_soup(self.page)
+
+    def __set_soup(self, page: int):
+        self.soup = self.__fetch_soup(page)
 
-    def __set_soup(self, url: str):
+    def __fetch_soup(self, page: int):
+        url = self.__page_url(page)
         # Send a GET request to the website
-        response = requests.get(url)
+        response = self.http_client.get(url)
 
         # Check if the page is empty or not found, and break the loop if so
         if response.status_code != 200 or not response.text.strip():
@@ -28,42 +37,57 @@ class MyRealtyScrapingPipeline(ApartmentScrapingPipeline):
             logging.critical(error)
             raise Exception(error)
 
-        # Parse the HTML content of the page with BeautifulSoup
-        self.soup = BeautifulSoup(response.text, 'html.parser')
+        self.archive_page(url, response.content, "listing", page)
+        return self.parse_page(response.text)
+
+    def __page_url(self, page: int) -> str:
+        if page == 1:
+            return self.base_url
+        return f"{self.base_url}?page={page}"
 
     def navigate_to_next_page(self):
         self.page += 1
-        self.__set_soup(f"{self.base_url}?page={self.page}")
+        self.__set_soup(self.page)
+
+    def supports_prefetch(self) -> bool:
+        return True
+
+    def supports_fan_out(self) -> bool:
+        return True
+
+    def load_page(self, page: int):
+        return self.__fetch_soup(page)
+
+    def page_request(self, page: int) -> dict:
+        return {"method": "GET", "url": self.__page_url(page), "data": None}
+
+    def parse_page(self, html):
+        # Parse the HTML content of the page with BeautifulSoup
+        return HTMLParser.parse(html, self.listing_targets)
 
     def scrape_apartment(self, apartment_url):
         
-        id = self.apartment_scraper.get_id(apartment_url)
-        
-        # Create an instance of ApartmentScraper with the provided URL
-        apartment_scraper: MyRealtyApartmentScraper = self.apartment_scraper(apartment_url)
-        
-        # Call the scrape method of the ApartmentScraper
-        apartment_scraper.scrape()
-        apartment_data = apartment_scraper.values()
+        # Download the page here, parse it in the parse stage
+        html = self.fetch_apartment(apartment_url)
+        apartment_data, images_links, apartment_id = self.parse_apartment(apartment_url, html)
 
         # Store or process the scraped data as needed
         self.storage.append(apartment_data)  # Replace with your storage mechanism
         
         # download images
-        images_links = apartment_scraper.images_links()
         if self.image_loader:
             self.image_loader.download_images(
                 links = images_links,
                 source = MyRealtyApartmentScraper.source_identifier(),
-                apartment_id = apartment_scraper.id
+                apartment_id = apartment_id
             )
 
     def get_apartment_links(self, page_url=None):
-        if page_url is None:
-            page_url = self.base_url
+        return self.links_from_page(self.soup)
 
+    def links_from_page(self, soup) -> list[str]:
         # Find all 'a' elements with the specific class
-        a_elements = self.soup.find_all('a', class_='btn btn-pink-transparent btn-cs text-uppercase item-more-btn ml-auto')
+        a_elements = soup.find_all('a', class_='btn btn-pink-transparent btn-cs text-uppercase item-more-btn ml-auto')
 
         # Iterate over the found 'a' elements and navigate to their links
         links = []
@@ -1,10 +1,23 @@
+import io
 import os
 import csv
+import time
+import queue
 from Protocols.Storage import Storage
+from ConcreteStorages.PendingWrites import PendingWrites
 import threading
 import logging
 
 class CSVStorage(Storage):
+    """
+    Appends the scraped apartments to a CSV file.
+
+    `append` only renders the row and queues it, a background writer thread writes the queued
+    rows in batches and flushes every `flush_batch_count` rows or `flush_interval` seconds.
+    The callbacks of `when_written` are called by the writer once the batch of their rows is
+    flushed, which is when the scraping pipeline records the apartments as scraped.
+    The queue is written out by `close_file`, or `close_all` for all the storages not closed.
+    """
     fieldnames = [
         "source", 
         "webpage",
@@ -20,14 +33,23 @@ class CSVStorage(Storage):
         'details', 'longitude', 'flooring', 'entrance_door', 'construction_type', 
         'renovation', 'windows', 'heating', 'parking', 'cooling']
 
-    # Flush each 5 datapoints
-    flush_batch_count: int = 1
+    # Flush each 100 datapoints, or each second
+    flush_batch_count: int = 100
+    flush_interval: float = 1.0
+
+    # Queued by `wait_written` to have the writer flush at once, at the end of a run
+    flush_now = object()
+
+    # Storages with a writer thread, see `close_all`
+    open_storages = set()
 
     def __init__(self, file_path):
         self.file_path = file_path
         self.file_handle = None
         self.threadLock = threading.Lock()
-        self.current_count = 0
+        self.rows = queue.Queue()
+        self.writer = None
+        self.pending_writes = PendingWrites()
 
     def initialize(self):
         # Check if the directory exists, and if not, create it
@@ -52,23 +74,92 @@ class CSVStorage(Storage):
                 return
         # Open the file for writing and store the file handle
         self.file_handle = open(self.file_path, mode='a+', newline='')
+        self.writer = threading.Thread(target = self.__write_loop, name = f"csv-writer-{os.path.basename(self.file_path)}", daemon = True)
+        self.writer.start()
+        CSVStorage.open_storages.add(self)
 
     def close_file(self):
-        # Close the file when done
+        # Write the queued rows, then close the file
+        with self.threadLock:
+            writer = self.writer
+            self.writer = None
+        if writer is not None:
+            self.rows.put(None)
+            writer.join()
         if self.file_handle is not None:
             self.file_handle.close()
+            self.file_handle = None
+        CSVStorage.open_storages.discard(self)
 
     def append(self, data_dict):
         # Append data in the CSV file
         if self.file_handle is not None:
-            writer = csv.DictWriter(self.file_handle, fieldnames=self.fieldnames)
-            # self.threadLock.acquire()
+            # The row is rendered here and written by the writer thread, never waiting for the disk
+            row = io.StringIO()
+            writer = csv.DictWriter(row, fieldnames=self.fieldnames)
             writer.writerow(data_dict)
-            self.current_count += 1
-            if self.current_count == self.flush_batch_count:
-                self.current_count = 0
-                self.file_handle.flush()  # Flush to write data immediately
-            # self.threadLock.release()
+            # Counted in the order of the queue
+            with self.threadLock:
+                self.pending_writes.append()
+                self.rows.put(row.getvalue())
+
+    def when_written(self, callback):
+        self.pending_writes.add(callback)
+
+    def wait_written(self):
+        # Have the writer flush now instead of at the end of its interval
+        with self.threadLock:
+            if self.writer is None:
+                return
+            self.rows.put(CSVStorage.flush_now)
+        self.pending_writes.wait()
+
+    def __write_loop(self):
+        batch = []
+        last_flush = time.monotonic()
+        closing = False
+        while not closing:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            requested = False
+            try:
+                row = self.rows.get(timeout = timeout)
+                while True:
+                    if row is None:
+                        closing = True
+                    elif row is CSVStorage.flush_now:
+                        requested = True
+                    else:
+                        batch.append(row)
+                    # Take everything queued meanwhile
+                    if closing or len(batch) >= self.flush_batch_count:
+                        break
+                    row = self.rows.get_nowait()
+            except queue.Empty:
+                pass
+
+            if batch and (closing or requested or len(batch) >= self.flush_batch_count or time.monotonic() - last_flush >= self.flush_interval):
+                error = None
+                try:
+                    # One write per batch, with the file in append mode several
+                    # worker processes can share it without interleaving their rows
+                    self.file_handle.write("".join(batch))
+                    self.file_handle.flush()
+                except Exception as e:
+                    logging.error(f"CSVStorage | failed to write {len(batch)} rows to {self.file_path}: {e}")
+                    error = e
+                self.pending_writes.write(len(batch), error)
+                batch = []
+                last_flush = time.monotonic()
+            elif not batch:
+                last_flush = time.monotonic()
+
+    @staticmethod
+    def close_all():
+        """
+        Writes the queued rows of every storage not closed yet.
+        """
+        for storage in list(CSVStorage.open_storages):
+            storage.close_file()
 
     def path(self):
         return self.file_path
\ No newline at end of file
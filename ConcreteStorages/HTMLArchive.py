@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    import gzip
+
+class HTMLArchive:
+    """
+    Append-only archive of the fetched pages, so that they can be parsed again without the network.
+
+    Bodies are stored once per content, compressed, under `objects/<2 first hex>/<sha256>.zst`
+    (`.gz` when `zstandard` is not installed). Every fetch appends a line to `index.jsonl`
+    with the URL, source, kind ("listing" or "detail"), listing page, fetch time and the
+    hash of the body, so the same URL fetched twice keeps both versions.
+    """
+
+    def __init__(self, archive_dir: str, compression_level: int = 10):
+        """
+        Args:
+            archive_dir (str): Directory of the archive, created if missing.
+            compression_level (int): zstd compression level.
+        """
+        self.archive_dir = archive_dir
+        self.objects_dir = os.path.join(archive_dir, "objects")
+        self.index_path = os.path.join(archive_dir, "index.jsonl")
+        self.extension = ".zst" if zstandard is not None else ".gz"
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self.index_handle = None
+        if zstandard is None:
+            logging.warning("HTML archive | zstandard is not installed, compressing with gzip")
+
+    def initialize(self):
+        os.makedirs(self.objects_dir, exist_ok = True)
+        self.index_handle = open(self.index_path, mode = 'a', encoding = 'utf-8')
+
+    def close_file(self):
+        with self.lock:
+            if self.index_handle is not None:
+                self.index_handle.close()
+                self.index_handle = None
+
+    def path(self):
+        return self.archive_dir
+
+    def put(self, url: str, body: bytes, source: str, kind: str, page: int = None) -> str:
+        """
+        Archives a fetched page.
+
+        Args:
+            url (str): The URL the page was fetched from.
+            body (bytes): The raw content of the page.
+            source (str): Source identifier of the pipeline that fetched it.
+            kind (str): "listing" or "detail".
+            page (int, optional): Number of the listing page.
+
+        Returns:
+            str: The sha256 of the body.
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self.object_path(digest)
+
+        # Content-addressed, an unchanged page is stored once
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok = True)
+            temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(self.__compress(body))
+            os.replace(temp_path, object_path)
+
+        entry = {
+            "url": url,
+            "source": source,
+            "kind": kind,
+            "page": page,
+            "fetched_at": time.time(),
+            "sha256": digest,
+            "size": len(body)
+        }
+        with self.lock:
+            if self.index_handle is None:
+                self.initialize()
+            self.index_handle.write(json.dumps(entry) + "\n")
+            self.index_handle.flush()
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """
+        Returns the raw content of an archived page by its sha256.
+        """
+        with open(self.object_path(digest), 'rb') as file:
+            return self.__decompress(file.read())
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest + self.extension)
+
+    def entries(self, kind: str = None, source: str = None, latest: bool = True) -> list[dict]:
+        """
+        Reads the index of the archive.
+
+        Args:
+            kind (str, optional): Only entries of this kind.
+            source (str, optional): Only entries of this source.
+            latest (bool): Only the last fetch of every URL (and listing page).
+
+        Returns:
+            list[dict]: Index entries, in the order they were fetched.
+        """
+        if not os.path.exists(self.index_path):
+            return []
+
+        entries = []
+        with open(self.index_path, encoding = 'utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut by a crash
+                    continue
+                if kind is not None and entry["kind"] != kind:
+                    continue
+                if source is not None and entry["source"] != source:
+                    continue
+                entries.append(entry)
+
+        if latest:
+            by_url = {}
+            for entry in entries:
+                by_url[(entry["url"], entry.get("page"))] = entry
+            entries = sorted(by_url.values(), key = lambda entry: entry["fetched_at"])
+        return entries
+
+    def __compress(self, body: bytes) -> bytes:
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level = self.compression_level).compress(body)
+        return gzip.compress(body)
+
+    def __decompress(self, data: bytes) -> bytes:
+        if zstandard is not None:
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
@@ -1,44 +1,270 @@
 import os
+import json
+import uuid
+import time
+import shutil
+import hashlib
+import logging
 import pandas as pd
 import threading
+from urllib.parse import urlparse
 
 class ImageStorage:
+    """
+    Saves the images of the apartments as `images_path/source/apartment_id/index.ext`.
+    Images are written to a temporary file and renamed to their path once complete.
+
+    With `content_addressed`, every distinct image is stored once in `objects_path`, named by
+    the SHA-256 of its bytes, and the apartment paths are hardlinks to it: a photo reposted
+    in several listings, or on several sources, takes the disk space of one. The objects are
+    kept outside of `images_path`, so the tree of the apartments stays the same.
+
+    With a `resizer` (`ImageResizer`), every saved image is also handed to it, to write its
+    training sized variants in the background. Without `keep_originals`, only the variants are kept.
+
+    Failed images are appended to `image_error_log_path` as JSON lines, buffered and written every
+    `error_flush_size` errors or `error_flush_interval` seconds, and on `close`. The log is
+    rotated when it grows over `error_log_max_bytes`, keeping `error_log_backups` files (`.1` the newest).
+    """
+
+    error_flush_size = 100
+    error_flush_interval = 5
+    error_log_max_bytes = 10 * 1024 ** 2
+    error_log_backups = 5
     
-    def __init__(self, images_path, image_error_log_path):
+    def __init__(self, images_path, image_error_log_path, content_addressed = False, objects_path = None, resizer = None, keep_originals = True):
         self.images_path = images_path
         self.image_error_log_path = image_error_log_path
-        self.flash_interval = 10
+        self.content_addressed = content_addressed
+        self.objects_path = objects_path or images_path.rstrip("/") + "_objects/"
+        self.resizer = resizer
+        self.keep_originals = keep_originals or resizer is None
         self.lock = threading.Lock()
-        self.image_error_log = pd.DataFrame(columns = [
-            "source", "url", "apartment_id", "index", "error"
-        ])
+        # Taken before `lock`, so errors are logged while the buffer is written
+        self.error_io_lock = threading.Lock()
+        self.error_buffer = []
+        self.error_counts = {}
+        self.last_error_flush = time.monotonic()
+        self.dedupe_stats = {"images": 0, "duplicates": 0, "bytes": 0, "bytes_saved": 0, "copies": 0}
+        self.digests = set()
     
     def save_image(self, image, image_name):
+        temporary_path = self.temporary_path(image_name)
+        with open(temporary_path, 'wb') as f:
+            f.write(image)
+        self.commit_image(temporary_path, image_name, hashlib.sha256(image).hexdigest() if self.content_addressed else None)
+
+    def temporary_path(self, image_name):
+        """
+        Returns a temporary file, next to the image, to write it before `commit_image`.
+        Readers of the images skip the `.tmp` files.
+        """
         dir_path = os.path.dirname(self.images_path + image_name)
-        if not os.path.exists(dir_path):
-            os.makedirs(dir_path)
+        # `exist_ok`, since concurrent workers may create the same directory
+        os.makedirs(dir_path, exist_ok = True)
+        return f"{self.images_path}{image_name}.{os.getpid()}.{threading.get_ident()}.tmp"
 
-        with open(self.images_path + image_name, 'wb') as f:
-            f.write(image)
-            
-    def log_error(self, source, url, apartment_id, index, error):
-        print(error)
-        new_row = pd.DataFrame({
-            "source" : [source],
-            "url" : [url],
-            "apartment_id" : [apartment_id],
-            "index" : [index],
-            "error" : [error]
-        })
-        
+    def commit_image(self, temporary_path, image_name, digest = None):
+        """
+        Moves a completely written image from its temporary file (see `temporary_path`) to its
+        path in one rename, so a partial image is never seen there.
+
+        Args:
+            temporary_path (str): The temporary file of the image, removed or renamed.
+            image_name (str): The path of the image, `source/apartment_id/index.ext`.
+            digest (str, optional): The SHA-256 of the image, computed from the file when content
+                addressed and not given.
+        """
+        try:
+            if self.resizer is not None and not self.keep_originals:
+                # Staged under a name of its own, the resizer removes it once the variants are written
+                staged_path = f"{self.images_path}{image_name}.{uuid.uuid4().hex}.staged.tmp"
+                os.replace(temporary_path, staged_path)
+                self.resizer.submit(staged_path, self.images_path, image_name, remove = True)
+                return
+
+            if self.content_addressed:
+                self.__save_linked(temporary_path, image_name, digest or self.__file_digest(temporary_path))
+            else:
+                os.replace(temporary_path, self.images_path + image_name)
+            # Handed over as a file, the resizer reads it in its own process
+            if self.resizer is not None:
+                self.resizer.submit(self.images_path + image_name, self.images_path, image_name)
+        finally:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+
+    def variant_paths(self, image_name) -> list:
+        """
+        Returns the files of the resized variants of an image, none without a resizer.
+        """
+        if self.resizer is None:
+            return []
+        return list(self.resizer.variant_paths(self.images_path, image_name).values())
+
+    def __save_linked(self, temporary_path, image_name, digest):
+        size = os.path.getsize(temporary_path)
+        extension = os.path.splitext(image_name)[1].lower()
+        object_path = os.path.join(self.objects_path, digest[:2], digest + extension)
+        os.makedirs(os.path.dirname(object_path), exist_ok = True)
+
+        duplicate = os.path.exists(object_path)
+        if not duplicate:
+            # A concurrent save of the same image replaces it with the same bytes
+            try:
+                os.replace(temporary_path, object_path)
+            except OSError:
+                # Objects on another device
+                temporary_object = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                shutil.copyfile(temporary_path, temporary_object)
+                os.replace(temporary_object, object_path)
+
+        # Linked under a temporary name and renamed, so an image saved again replaces the old link
+        path = self.images_path + image_name
+        copied = False
+        if not (os.path.exists(path) and os.path.samefile(path, object_path)):
+            temporary_link = f"{path}.{os.getpid()}.{threading.get_ident()}.link.tmp"
+            try:
+                os.link(object_path, temporary_link)
+            except OSError:
+                # File systems without hardlinks, or objects on another device
+                shutil.copyfile(object_path, temporary_link)
+                copied = True
+            os.replace(temporary_link, path)
+            # Left when a concurrent save linked the same object to the path meanwhile
+            if os.path.exists(temporary_link):
+                os.unlink(temporary_link)
+
+        with self.lock:
+            self.dedupe_stats["images"] += 1
+            self.dedupe_stats["bytes"] += size
+            self.dedupe_stats["copies"] += copied
+            self.digests.add(digest)
+            if duplicate:
+                self.dedupe_stats["duplicates"] += 1
+                if not copied:
+                    self.dedupe_stats["bytes_saved"] += size
+
+    @staticmethod
+    def __file_digest(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def stats(self) -> dict:
+        """
+        Returns the deduplication counters of the images saved by this run: `images`, `distinct`
+        images among them, `duplicates` (images whose bytes were already stored), `bytes`, `bytes_saved`,
+        `copies` (no hardlink possible) and the `dedupe_ratio`, images saved per distinct image.
+        """
         with self.lock:
-            self.image_error_log = pd.concat([self.image_error_log, new_row])
-            self.__increment_and_save()
+            stats = dict(self.dedupe_stats)
+            stats["distinct"] = len(self.digests)
+        stats["dedupe_ratio"] = stats["images"] / stats["distinct"] if stats["distinct"] else 1.0
+        return stats
+
+    def log_stats(self):
+        if not self.content_addressed:
+            return
+        stats = self.stats()
+        logging.info(
+            f"Images | {stats['images']} saved, {stats['distinct']} distinct, dedupe ratio {stats['dedupe_ratio']:.2f}, "
+            f"{stats['bytes_saved'] / 1024 ** 2:.1f} MB saved"
+        )
             
-    def __increment_and_save(self):
-        self.flash_interval += 1
-        if self.flash_interval > 3:
-            self.__save_log()
-        
-    def __save_log(self):
-        self.image_error_log.to_csv(self.image_error_log_path)
\ No newline at end of file
+    def log_error(self, source, url, apartment_id, index, error, status_code = None):
+        """
+        Records a failed image, buffered and appended to the error log, see the class.
+
+        Args:
+            source (str): The source of the apartment.
+            url (str): The URL of the image.
+            apartment_id (str): The identifier of the apartment.
+            index (int): The index of the image in the sequence of apartment images.
+            error (str | Exception): The failure.
+            status_code (int, optional): The HTTP status of the response, if there was one.
+        """
+        record = {
+            "time" : time.time(),
+            "source" : source,
+            "host" : urlparse(url).netloc,
+            "url" : url,
+            "apartment_id" : str(apartment_id),
+            "index" : index,
+            "status_code" : status_code,
+            "error" : str(error) or type(error).__name__
+        }
+        with self.lock:
+            self.error_buffer.append(record)
+            self.error_counts[source] = self.error_counts.get(source, 0) + 1
+            flush = len(self.error_buffer) >= self.error_flush_size or time.monotonic() - self.last_error_flush >= self.error_flush_interval
+        if flush:
+            self.flush_errors()
+
+    def flush_errors(self):
+        """
+        Appends the buffered errors to the error log.
+        """
+        with self.error_io_lock:
+            with self.lock:
+                records = self.error_buffer
+                self.error_buffer = []
+                self.last_error_flush = time.monotonic()
+            if not records:
+                return
+            directory = os.path.dirname(self.image_error_log_path)
+            if directory:
+                os.makedirs(directory, exist_ok = True)
+            with open(self.image_error_log_path, 'a') as f:
+                f.write("".join(json.dumps(record, ensure_ascii = False) + "\n" for record in records))
+                size = f.tell()
+            if size > self.error_log_max_bytes:
+                self.__rotate_error_log()
+
+    def close(self):
+        """
+        Writes the buffered errors and logs the number of errors of every source.
+        """
+        self.flush_errors()
+        with self.lock:
+            counts = dict(self.error_counts)
+        if counts:
+            logging.info(f"Images | errors {counts}, in {self.image_error_log_path}")
+
+    @classmethod
+    def summarize_errors(cls, image_error_log_path, by = ("source", "host", "status_code")) -> pd.DataFrame:
+        """
+        Aggregates an error log and its rotated files.
+
+        Args:
+            image_error_log_path (str): The error log of an ImageStorage.
+            by (tuple): The fields the errors are grouped by.
+
+        Returns:
+            DataFrame: For every group, the number of `errors` and of `apartments`, the `first` and `last`
+                time (UTC) and the most frequent `error`, the most frequent groups first.
+        """
+        paths = [f"{image_error_log_path}.{number}" for number in range(cls.error_log_backups, 0, -1)] + [image_error_log_path]
+        frames = [pd.read_json(path, lines = True, dtype = False) for path in paths if os.path.exists(path) and os.path.getsize(path) > 0]
+        if not frames:
+            return pd.DataFrame(columns = [*by, "errors", "apartments", "first", "last", "error"])
+        errors = pd.concat(frames, ignore_index = True)
+        errors["time"] = pd.to_datetime(errors["time"], unit = "s")
+        # Requests without a response have no status code
+        errors["status_code"] = errors["status_code"].astype("Int64")
+        summary = errors.groupby(list(by), dropna = False).agg(
+            errors = ("url", "size"),
+            apartments = ("apartment_id", "nunique"),
+            first = ("time", "min"),
+            last = ("time", "max"),
+            error = ("error", lambda values: values.value_counts().index[0])
+        )
+        return summary.sort_values("errors", ascending = False).reset_index()
+
+    def __rotate_error_log(self):
+        for number in range(self.error_log_backups - 1, 0, -1):
+            if os.path.exists(f"{self.image_error_log_path}.{number}"):
+                os.replace(f"{self.image_error_log_path}.{number}", f"{self.image_error_log_path}.{number + 1}")
+        os.replace(self.image_error_log_path, f"{self.image_error_log_path}.1")
@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import logging
+import threading
+from Protocols.Storage import Storage
+from ConcreteStorages.PendingWrites import PendingWrites
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+class ParquetStorage(Storage):
+    """
+    Stores the scraped apartments as a Parquet dataset: a directory of part files that
+    `pd.read_parquet(path, columns = [...])` reads whole, loading only the requested columns.
+
+    Rows are buffered and written as typed row groups of `row_group_size` rows. List fields
+    (e.g. `facilities`) are stored as lists of strings and dictionaries (`room_details`) as maps,
+    instead of their Python representation. The schema is set by the source of the first row,
+    see `source_fields`, and a value that does not fit its column is an error rather than a NULL.
+
+    A part file is written under a hidden temporary name and renamed once complete, every
+    `rows_per_file` rows and on `close_file`, so readers never see a partial file and every run
+    (or worker process) adds its own parts. Rows are only written once their part is renamed,
+    so that is when the callbacks of `when_written` are called.
+    """
+
+    list_fields = ["facilities", "additional_features", "utilities"]
+    map_fields = ["room_details", "details"]
+    float_fields = ["price", "area", "latitude", "longitude"]
+    int_fields = ["rooms", "floor", "storeys", "bedrooms", "view_count", "visit_count"]
+    # Text in every source
+    string_fields = [
+        "source", "webpage", "id", "location", "building_type", "condition",
+        "added_in_date", "flooring", "entrance_door", "construction_type",
+        "renovation", "windows", "heating", "parking", "cooling"
+    ]
+    # Numbers in some sources and text in others (e.g. `ceiling_height` is 2.8 on Bars and
+    # "2.8 M" on MyRealty), typed like the CSV of the source reads them. Text elsewhere.
+    source_fields = {
+        "bars": {"ceiling_height": "float", "bathroom_count": "int"},
+        "myrealty": {"ceiling_height": "string", "bathroom_count": "string"}
+    }
+    mixed_fields = ["ceiling_height", "bathroom_count"]
+
+    def __init__(self, file_path, row_group_size: int = 5000, rows_per_file: int = 50000, compression: str = "zstd"):
+        """
+        Args:
+            file_path (str): The directory of the dataset, e.g. `bars_apartments.parquet`.
+            row_group_size (int): Number of rows buffered before they are written as a row group.
+            rows_per_file (int): Number of rows after which a part file is completed.
+            compression (str): Parquet compression codec.
+        """
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        self.compression = compression
+        self.threadLock = threading.Lock()
+        self.schema = None
+        self.writer = None
+        self.part_path = None
+        self.part_rows = 0
+        self.part_count = 0
+        self.columns = None
+        self.buffered = 0
+        self.pending_writes = PendingWrites()
+
+    def initialize(self):
+        if pa is None:
+            raise Exception("ParquetStorage needs pyarrow, install it or use CSVStorage")
+        os.makedirs(self.file_path, exist_ok = True)
+        self.columns = {}
+
+    def close_file(self):
+        with self.threadLock:
+            if self.schema is None:
+                return
+            self.__write_row_group()
+            self.__commit_part()
+
+    def append(self, data_dict):
+        if self.columns is None:
+            return
+        with self.threadLock:
+            if self.schema is None:
+                self.schema = self.__schema(data_dict.get("source"))
+                self.columns = {name: [] for name in self.schema.names}
+        unknown = set(data_dict) - set(self.schema.names)
+        if unknown:
+            raise Exception(f"ParquetStorage | unknown fields {sorted(unknown)}")
+        row = {name: self.__convert(name, data_dict.get(name)) for name in self.schema.names}
+        with self.threadLock:
+            for name, value in row.items():
+                self.columns[name].append(value)
+            self.buffered += 1
+            self.pending_writes.append()
+            if self.buffered >= self.row_group_size:
+                self.__write_row_group()
+                if self.part_rows >= self.rows_per_file:
+                    self.__commit_part()
+
+    def when_written(self, callback):
+        self.pending_writes.add(callback)
+
+    def wait_written(self):
+        # Completes the current part, at the end of a run
+        with self.threadLock:
+            if self.schema is not None:
+                self.__write_row_group()
+                self.__commit_part()
+        self.pending_writes.wait()
+
+    def path(self):
+        return self.file_path
+
+    def __schema(self, source: str):
+        types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64()}
+        mixed = self.source_fields.get(source, {})
+        fields = []
+        fields += [pa.field(name, pa.string()) for name in self.string_fields]
+        fields += [pa.field(name, types[mixed.get(name, "string")]) for name in self.mixed_fields]
+        fields += [pa.field(name, pa.float64()) for name in self.float_fields]
+        fields += [pa.field(name, pa.int64()) for name in self.int_fields]
+        fields += [pa.field(name, pa.list_(pa.string())) for name in self.list_fields]
+        fields += [pa.field(name, pa.map_(pa.string(), pa.string())) for name in self.map_fields]
+        return pa.schema(fields)
+
+    def __convert(self, name: str, value):
+        """
+        Converts a scraped value to the type of its column. Numbers scraped as text are
+        cleaned of thousands separators (e.g. "1,234" visits on Bnakaran), anything else
+        that does not fit raises, so that no value is silently stored as NULL.
+        """
+        if value is None:
+            return None
+        column_type = self.schema.field(name).type
+        try:
+            if name in self.list_fields:
+                return [str(item) for item in value]
+            if name in self.map_fields:
+                return [(str(key), None if item is None else str(item)) for key, item in dict(value).items()]
+            if pa.types.is_string(column_type):
+                return str(value)
+            if isinstance(value, str):
+                value = re.sub(r"[,\s]", "", value)
+            if pa.types.is_floating(column_type):
+                return float(value)
+            number = float(value)
+            if not number.is_integer():
+                raise ValueError(f"{number} is not an integer")
+            return int(number)
+        except (TypeError, ValueError) as e:
+            raise Exception(f"ParquetStorage | {name} value {value!r} is not a {column_type}: {e}")
+
+    def __write_row_group(self):
+        if not self.buffered:
+            return
+        batch = pa.RecordBatch.from_pydict(self.columns, schema = self.schema)
+        if self.writer is None:
+            self.part_count += 1
+            name = f"part-{int(time.time())}-{os.getpid()}-{self.part_count}.parquet"
+            self.part_path = os.path.join(self.file_path, name)
+            # A leading dot hides the file from dataset readers until it is renamed
+            self.writer = pq.ParquetWriter(
+                os.path.join(self.file_path, "." + name + ".tmp"),
+                self.schema,
+                compression = self.compression
+            )
+        self.writer.write_batch(batch, row_group_size = self.buffered)
+        self.part_rows += self.buffered
+        self.columns = {name: [] for name in self.schema.names}
+        self.buffered = 0
+
+    def __commit_part(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        name = os.path.basename(self.part_path)
+        os.replace(os.path.join(self.file_path, "." + name + ".tmp"), self.part_path)
+        logging.info(f"ParquetStorage | wrote {self.part_rows} rows to {self.part_path}")
+        self.pending_writes.write(self.part_rows)
+        self.writer = None
+        self.part_rows = 0
@@ -0,0 +1,69 @@
+import logging
+import threading
+import collections
+
+class PendingWrites:
+    """
+    Callbacks of a storage waiting for its rows to be written, see `Storage.when_written`.
+
+    Rows are counted as they are appended, and a callback is due once the rows appended
+    before it was added are written, so the rows are acknowledged in batches, as they are
+    written, without the storage writing any sooner.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.appended = 0
+        self.written = 0
+        # Written rows whose callbacks ran, `wait` waits for them
+        self.acknowledged = 0
+        self.callbacks = collections.deque()
+
+    def append(self, count: int = 1):
+        """
+        Counts appended rows, in the order the storage writes them.
+        """
+        with self.condition:
+            self.appended += count
+
+    def add(self, callback):
+        """
+        Calls `callback` with None once the rows appended so far are written, or with the
+        exception that prevented it. At once if they are written already.
+        """
+        with self.condition:
+            if self.written < self.appended:
+                self.callbacks.append((self.appended, callback))
+                return
+        self.__call(callback, None)
+
+    def write(self, count: int, error: Exception = None):
+        """
+        Counts written rows and calls the callbacks that are due, with the `error` that
+        prevented the rows from being written, if any. Called by one thread at a time.
+        """
+        due = []
+        with self.condition:
+            self.written += count
+            while self.callbacks and self.callbacks[0][0] <= self.written:
+                due.append(self.callbacks.popleft()[1])
+            written = self.written
+        for callback in due:
+            self.__call(callback, error)
+        with self.condition:
+            self.acknowledged = written
+            self.condition.notify_all()
+
+    def wait(self):
+        """
+        Waits until the rows appended so far are written and their callbacks ran.
+        """
+        with self.condition:
+            target = self.appended
+            self.condition.wait_for(lambda: self.acknowledged >= target)
+
+    def __call(self, callback, error):
+        try:
+            callback(error)
+        except Exception as e:
+            logging.error(f"Storage | write callback failed: {e}")
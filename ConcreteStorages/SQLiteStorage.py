@@ -0,0 +1,188 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import pandas as pd
+from Protocols.Storage import Storage
+from ConcreteStorages.CSVStorage import CSVStorage
+from ConcreteStorages.PendingWrites import PendingWrites
+
+class SQLiteStorage(Storage):
+    """
+    Stores the scraped apartments of all sources in one sqlite database (WAL mode), one row per
+    `(source, id)`: scraping an apartment again updates its row instead of adding a duplicate.
+
+    Every row keeps `first_seen`, `last_seen` and `changed_at` (unix timestamps). `changed_at`
+    moves only when a scraped value changed, counters like `view_count` are not compared,
+    so the prepare stage can read just the apartments changed since its last run.
+
+    Rows are buffered and upserted in one transaction every `batch_size` rows (or `flush_interval`
+    seconds), and on `close_file`. The callbacks of `when_written` are called once the transaction
+    of their rows is committed. One instance can be shared by all pipelines and their threads,
+    and several processes can write to the same database.
+    """
+
+    fieldnames = CSVStorage.fieldnames
+    # Stored as JSON
+    json_fields = ["facilities", "additional_features", "utilities", "room_details", "details"]
+    # Change on every visit of the page, not a change of the apartment
+    volatile_fields = ["view_count", "visit_count"]
+
+    def __init__(self, file_path, batch_size: int = 100, flush_interval: float = 5):
+        """
+        Args:
+            file_path (str): The file path of the database, created if missing.
+            batch_size (int): Number of rows upserted in one transaction.
+            flush_interval (float): Longest time in seconds a row stays buffered, checked when rows are appended.
+        """
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.threadLock = threading.Lock()
+        self.connection = None
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.pending_writes = PendingWrites()
+
+    def initialize(self):
+        if self.connection is not None:
+            return
+        self.connection = sqlite3.connect(self.file_path, timeout = 60, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        columns = ", ".join(
+            f'"{name}" TEXT' if name in self.json_fields else f'"{name}"'
+            for name in self.fieldnames if name not in ("source", "id")
+        )
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS apartments (
+                source TEXT,
+                id TEXT,
+                {columns},
+                fingerprint TEXT,
+                first_seen REAL,
+                last_seen REAL,
+                changed_at REAL,
+                PRIMARY KEY (source, id)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS apartments_changed_at ON apartments (changed_at)")
+        self.connection.commit()
+
+    def close_file(self):
+        with self.threadLock:
+            if self.connection is None:
+                return
+            self.__flush()
+            self.connection.close()
+            self.connection = None
+
+    def append(self, data_dict):
+        if self.connection is None:
+            return
+        unknown = set(data_dict) - set(self.fieldnames)
+        if unknown:
+            raise Exception(f"SQLiteStorage | unknown fields {sorted(unknown)}")
+        row = self.__row(data_dict)
+        with self.threadLock:
+            self.buffer.append(row)
+            self.pending_writes.append()
+            if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.__flush()
+
+    def flush(self):
+        """
+        Upserts the buffered rows.
+        """
+        with self.threadLock:
+            if self.connection is not None:
+                self.__flush()
+
+    def when_written(self, callback):
+        self.pending_writes.add(callback)
+
+    def wait_written(self):
+        # Upserts the buffer at once, at the end of a run
+        self.flush()
+        self.pending_writes.wait()
+
+    def path(self):
+        return self.file_path
+
+    @classmethod
+    def read(cls, file_path, source: str = None, changed_since: float = None, columns: list = None) -> pd.DataFrame:
+        """
+        Reads apartments from a database written by SQLiteStorage.
+
+        Args:
+            file_path (str): The file path of the database.
+            source (str, optional): Only the apartments of this source.
+            changed_since (float, optional): Only the apartments whose values changed after this unix timestamp.
+            columns (list, optional): Only these columns (besides the timestamps).
+
+        Returns:
+            DataFrame: The apartments, with the JSON fields decoded, and their `first_seen`, `last_seen` and `changed_at`.
+        """
+        columns = columns or cls.fieldnames
+        selected = ", ".join(f'"{name}"' for name in [*columns, "first_seen", "last_seen", "changed_at"])
+        conditions = []
+        parameters = []
+        if source is not None:
+            conditions.append("source = ?")
+            parameters.append(source)
+        if changed_since is not None:
+            conditions.append("changed_at > ?")
+            parameters.append(changed_since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = sqlite3.connect(file_path, timeout = 60)
+        try:
+            data = pd.read_sql_query(
+                f"SELECT {selected} FROM apartments {where} ORDER BY first_seen", connection, params = parameters
+            )
+        finally:
+            connection.close()
+        for name in cls.json_fields:
+            if name in data:
+                data[name] = data[name].apply(lambda value: json.loads(value) if isinstance(value, str) else None)
+        return data
+
+    def __row(self, data_dict: dict) -> tuple:
+        values = []
+        for name in self.fieldnames:
+            value = data_dict.get(name)
+            if name in ("source", "id") and value is not None:
+                value = str(value)
+            elif name in self.json_fields and value is not None:
+                value = json.dumps(value, ensure_ascii = False)
+            elif value is not None and not isinstance(value, (int, float, str)):
+                value = str(value)
+            values.append(value)
+        compared = {
+            name: value for name, value in zip(self.fieldnames, values) if name not in self.volatile_fields
+        }
+        fingerprint = hashlib.sha1(json.dumps(compared, sort_keys = True, default = str).encode()).hexdigest()
+        return (*values, fingerprint)
+
+    def __flush(self):
+        if not self.buffer:
+            self.last_flush = time.monotonic()
+            return
+        now = time.time()
+        names = [*self.fieldnames, "fingerprint"]
+        quoted = ", ".join(f'"{name}"' for name in names)
+        placeholders = ", ".join("?" for _ in names)
+        updates = ", ".join(f'"{name}" = excluded."{name}"' for name in names if name not in ("source", "id"))
+        with self.connection:
+            self.connection.executemany(f"""
+                INSERT INTO apartments ({quoted}, first_seen, last_seen, changed_at)
+                VALUES ({placeholders}, ?, ?, ?)
+                ON CONFLICT (source, id) DO UPDATE SET
+                    changed_at = CASE WHEN fingerprint IS excluded.fingerprint THEN changed_at ELSE excluded.last_seen END,
+                    {updates},
+                    last_seen = excluded.last_seen
+            """, [(*row, now, now, now) for row in self.buffer])
+        self.pending_writes.write(len(self.buffer))
+        self.buffer = []
+        self.last_flush = time.monotonic()
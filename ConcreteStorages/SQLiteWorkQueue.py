@@ -0,0 +1,140 @@
+import time
+import sqlite3
+import threading
+from Protocols.WorkQueue import WorkQueue
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    WorkQueue in a sqlite database, shared by the processes of one machine (sqlite locking
+    is not reliable over network file systems). Leases are taken in `BEGIN IMMEDIATE`
+    transactions, so two processes never lease the same item.
+
+    A URL is queued once, its item keeps its outcome across runs. An item whose lease expired
+    `max_attempts` times is marked as failed instead of being handed out again.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        Args:
+            path (str): The file path of the database, created if missing.
+            max_attempts (int): Number of leases of an item after which it is given up.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout = 60, isolation_level = None, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT UNIQUE,
+                source TEXT,
+                pipeline TEXT,
+                state TEXT,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                finished_at REAL,
+                reported INTEGER DEFAULT 0
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS items_state ON items (state, source)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS items_reported ON items (reported, state)")
+
+    def put(self, pipeline: str, source: str, urls: list[str], requeue: bool = False) -> int:
+        rows = [(url, source, pipeline) for url in urls]
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                before = self.connection.total_changes
+                self.connection.executemany("""
+                    INSERT OR IGNORE INTO items (url, source, pipeline, state)
+                    VALUES (?, ?, ?, 'pending')
+                """, rows)
+                if requeue:
+                    self.connection.executemany("""
+                        UPDATE items SET state = 'pending', attempts = 0, error = NULL, reported = 0
+                        WHERE url = ? AND state IN ('done', 'failed')
+                    """, [(url,) for url, _, _ in rows])
+                added = self.connection.total_changes - before
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        return added
+
+    def lease(self, worker: str, sources: list[str] = None, count: int = 1, lease_seconds: float = 300) -> list[dict]:
+        now = time.time()
+        source_filter = ""
+        parameters = [now]
+        if sources:
+            source_filter = f"AND source IN ({', '.join('?' for _ in sources)})"
+            parameters += list(sources)
+
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Items of dead workers that were already handed out too many times are given up
+                self.connection.execute("""
+                    UPDATE items SET state = 'failed', error = 'lease expired', finished_at = ?
+                    WHERE state = 'leased' AND lease_until < ? AND attempts >= ?
+                """, (now, now, self.max_attempts))
+                rows = self.connection.execute(f"""
+                    SELECT id, url, source, pipeline FROM items
+                    WHERE (state = 'pending' OR (state = 'leased' AND lease_until < ?)) {source_filter}
+                    ORDER BY id LIMIT ?
+                """, parameters + [count]).fetchall()
+                self.connection.executemany("""
+                    UPDATE items SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1
+                    WHERE id = ?
+                """, [(worker, now + lease_seconds, row[0]) for row in rows])
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return [
+            {"id": item_id, "url": url, "source": source, "pipeline": pipeline}
+            for item_id, url, source, pipeline in rows
+        ]
+
+    def complete(self, item_id: int, worker: str, success: bool, error: str = None):
+        with self.lock:
+            # Ignored if the lease expired and the item was leased to, or completed by, another worker
+            self.connection.execute("""
+                UPDATE items SET state = ?, error = ?, finished_at = ?
+                WHERE id = ? AND state = 'leased' AND worker = ?
+            """, ("done" if success else "failed", error, time.time(), item_id, worker))
+
+    def take_results(self, limit: int = 1000) -> list[dict]:
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.connection.execute("""
+                    SELECT id, url, source, pipeline, state, error FROM items
+                    WHERE reported = 0 AND state IN ('done', 'failed')
+                    ORDER BY finished_at LIMIT ?
+                """, (limit,)).fetchall()
+                self.connection.executemany(
+                    "UPDATE items SET reported = 1 WHERE id = ?", [(row[0],) for row in rows]
+                )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return [
+            {"id": item_id, "url": url, "source": source, "pipeline": pipeline, "success": state == "done", "error": error}
+            for item_id, url, source, pipeline, state, error in rows
+        ]
+
+    def counts(self) -> dict[str, int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -1,2 +1,6 @@
 from .CSVStorage import CSVStorage
-from .ImageStorage import ImageStorage
\ No newline at end of file
+from .ParquetStorage import ParquetStorage
+from .SQLiteStorage import SQLiteStorage
+from .ImageStorage import ImageStorage
+from .HTMLArchive import HTMLArchive
+from .SQLiteWorkQueue import SQLiteWorkQueue
\ No newline at end of file
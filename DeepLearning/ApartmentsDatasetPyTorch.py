@@ -6,12 +6,14 @@ from torchvision import transforms
 import torch
 
 class ApartmentsDatasetPyTorch(Dataset):
-    def __init__(self, device, dataframe, images_dir, transform=None):
+    def __init__(self, device, dataframe, images_dir, transform=None, unique_images=True):
         """
         Args:
             root_dir (string): Directory with all the images.
             transform (callable, optional): Optional transform to be applied
                 on a sample.
+            unique_images (bool): Take the hardlinks of one image (content addressed
+                `ImageStorage`, the same photo in several listings) only once.
         """
         
         self.images_dir = images_dir
@@ -20,11 +22,17 @@ class ApartmentsDatasetPyTorch(Dataset):
         self.df = dataframe
         self.device = device
         
+        seen_files = set()
         for subdir, dirs, files in os.walk(images_dir):
             for file in files:
                 if file.endswith(".jpg") or file.endswith(".JPG") or file.endswith(".jpeg"):
                     img_path = os.path.join(subdir, file)
-                    if os.path.getsize(img_path) > 0:
+                    stat = os.stat(img_path)
+                    if stat.st_size > 0:
+                        if unique_images and stat.st_nlink > 1:
+                            if (stat.st_dev, stat.st_ino) in seen_files:
+                                continue
+                            seen_files.add((stat.st_dev, stat.st_ino))
                         self.image_paths.append(img_path)
                     
         self.error_log = {}
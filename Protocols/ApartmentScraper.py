@@ -1,6 +1,11 @@
 from abc import ABC, abstractmethod
 
 class ApartmentScraper(ABC):
+
+    # Selectors of the elements `scrape` and `images_links` read, see `Services.HTMLParser`.
+    # None parses the whole page.
+    parse_targets: list[str] = None
+
     @abstractmethod
     def scrape(self):
         """
@@ -28,4 +33,31 @@ class ApartmentScraper(ABC):
     
     @abstractmethod
     def get_id(webpage: str) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    @classmethod
+    def from_html(cls, webpage: str, html):
+        """
+        Creates a scraper for a page that was already downloaded, without sending any request.
+
+        Args:
+            webpage (str): The URL the page was downloaded from.
+            html (str | bytes): The content of the page.
+        """
+        return cls(webpage, html = html)
+
+    @classmethod
+    def parse(cls, webpage: str, html) -> tuple[dict, list[str], str]:
+        """
+        Scrapes a page that was already downloaded.
+
+        Args:
+            webpage (str): The URL the page was downloaded from.
+            html (str | bytes): The content of the page.
+
+        Returns:
+            tuple: The scraped values, the links of the images and the id of the apartment.
+        """
+        apartment_scraper = cls.from_html(webpage, html)
+        apartment_scraper.scrape()
+        return apartment_scraper.values(), apartment_scraper.images_links(), apartment_scraper.id
\ No newline at end of file
@@ -1,7 +1,13 @@
+import re
+import time
+import logging
 from abc import ABC, abstractmethod
 from Protocols import ApartmentScraper
 
 class ApartmentScrapingPipeline(ABC):
+
+    # Times a blocked page (see `is_blocked_page`) is fetched again before giving up
+    blocked_retries = 3
     
     def __init__(self, apartment_scraper: ApartmentScraper):
         """
@@ -50,8 +56,291 @@ class ApartmentScrapingPipeline(ABC):
         """
         self.page_count += 1
 
+    def fetch_apartment(self, apartment_url: str) -> bytes:
+        """
+        Downloads an individual apartment page with the `http_client` of the pipeline.
+        Only does I/O, the page is parsed by `parse_apartment`. A blocked page slows the
+        source down through `http_client.penalize` and is fetched again after the pause.
+
+        Args:
+            apartment_url (str): The URL of the apartment page.
+
+        Returns:
+            bytes: The content of the page.
+        """
+        for attempt in range(self.blocked_retries + 1):
+            response = self.http_client.get(apartment_url)
+            if response.status_code != 200 or not response.content.strip():
+                raise Exception(f"Failed to fetch the webpage. Status code: {response.status_code}, {apartment_url}")
+            if not self.is_blocked_page(response.content):
+                break
+            if attempt == self.blocked_retries:
+                raise Exception(f"Blocked page, {apartment_url}")
+            delay = self.http_client.penalize(apartment_url)
+            logging.warning(f"{self.apartment_scraper.source_identifier()} | blocked page, retrying in {delay:.0f}s, {apartment_url}")
+            time.sleep(delay)
+
+        self.archive_page(apartment_url, response.content, "detail")
+        return response.content
+
+    def is_blocked_page(self, html: bytes) -> bool:
+        """
+        Check if a fetched page is served instead of the requested one because the scraper
+        was detected, e.g. a captcha. Pipelines of sources without one always return False.
+
+        Args:
+            html (bytes): The content of the page.
+        """
+        return False
+
+    def archive_page(self, url: str, body: bytes, kind: str, page: int = None):
+        """
+        Saves a fetched page to the `archive` (an HTMLArchive) of the pipeline, if it has one.
+
+        Args:
+            url (str): The URL the page was fetched from.
+            body (bytes): The raw content of the page.
+            kind (str): "listing" or "detail".
+            page (int, optional): Number of the listing page.
+        """
+        archive = getattr(self, "archive", None)
+        if archive is not None:
+            archive.put(
+                url = url,
+                body = body,
+                source = self.apartment_scraper.source_identifier(),
+                kind = kind,
+                page = page
+            )
+
+    def parse_apartment(self, apartment_url: str, html: bytes) -> tuple[dict, list[str], str]:
+        """
+        Scrapes a downloaded apartment page, in the `parse_stage` process pool of the pipeline when it has one.
+
+        Args:
+            apartment_url (str): The URL the page was downloaded from.
+            html (bytes): The content of the page.
+
+        Returns:
+            tuple: The scraped values, the links of the images and the id of the apartment.
+        """
+        parse_stage = getattr(self, "parse_stage", None)
+        if parse_stage is not None:
+            return parse_stage.parse(self.apartment_scraper, apartment_url, html)
+        return self.apartment_scraper.parse(apartment_url, html)
+
+    def supports_prefetch(self) -> bool:
+        """
+        Whether the pipeline can load listing pages by number through `load_page`.
+        Such pipelines are walked with the next pages being fetched in the background.
+        """
+        return False
+
+    def load_page(self, page: int):
+        """
+        Fetches and parses the listing page with the given number, without changing
+        the current position of the pipeline. Must be safe to call from another thread.
+        Pipelines that override it must also override `supports_prefetch`, it is only
+        called on pipelines whose `supports_prefetch` or `supports_fan_out` is True.
+
+        Args:
+            page (int): The number of the listing page, starting from 1.
+
+        Returns:
+            The parsed page, to be passed to `set_page`.
+        """
+        pass
+
+    def page_request(self, page: int) -> dict:
+        """
+        Describes the request that fetches a listing page, so that it can be sent by
+        another HTTP client (e.g. the asyncio mode of `GlobalScrapingPipeline`).
+
+        Args:
+            page (int): The number of the listing page, starting from 1.
+
+        Returns:
+            dict: `method`, `url` and form `data` of the request, or None if the pipeline has no numbered pages.
+        """
+        return None
+
+    def parse_page(self, html):
+        """
+        Parses the content of a listing page requested with `page_request`.
+        Pipelines that override `page_request` must also override it.
+
+        Args:
+            html (str | bytes): The content of the listing page.
+
+        Returns:
+            The parsed page, to be passed to `links_from_page` or `set_page`.
+        """
+        pass
+
+    def links_from_page(self, soup) -> list[str]:
+        """
+        Extracts the links to individual apartments from a parsed listing page.
+        Pipelines that override `parse_page` or `load_page` must also override it.
+
+        Args:
+            soup: The parsed page returned by `parse_page` or `load_page`.
+
+        Returns:
+            list: A list of apartment URLs, empty by default so the listing ends.
+        """
+        return []
+
+    def set_page(self, page: int, soup):
+        """
+        Moves the pipeline to a listing page that was loaded with `load_page`.
+
+        Args:
+            page (int): The number of the listing page.
+            soup: The parsed page returned by `load_page`.
+        """
+        self.page = page
+        self.soup = soup
+        self.page_count += 1
+
+    def pipeline_identifier(self) -> str:
+        """
+        Identifies the pipeline among the pipelines of a run, e.g. in the state of the crawl queue.
+        Several pipelines may share a source identifier.
+        """
+        return f"{self.apartment_scraper.source_identifier()}:{type(self).__name__}"
+
+    def supports_fan_out(self) -> bool:
+        """
+        Whether all listing pages can be loaded at the same time, once the last one is known.
+        Requires `load_page` and `links_from_page`.
+        """
+        return False
+
+    def last_page_from_pager(self, soup) -> int | None:
+        """
+        Reads the highest page number linked from a listing page, e.g. by its pager.
+        Only a hint for `discover_last_page`, which checks it.
+
+        Args:
+            soup: The parsed listing page.
+
+        Returns:
+            int: The highest `page=N` linked from the page, None if there is none.
+        """
+        pages = []
+        for a_element in soup.find_all('a', href = True):
+            match = re.search(r"[?&]page=(\d+)", a_element.get('href'))
+            if match:
+                pages.append(int(match.group(1)))
+        return max(pages) if pages else None
+
+    def discover_last_page(self, links_by_page: dict = None, max_page: int = 10000) -> int:
+        """
+        Finds the last listing page that has links of its own. Starts from the pager of the
+        first page if it has one, then probes pages at doubling distances until one is past
+        the end, and binary searches between the last good and the first bad page.
+
+        A page is past the end when it has no links, or when it repeats the links of the page
+        before it or of the first page, as some sites serve those instead of an empty page.
+
+        Args:
+            links_by_page (dict, optional): Filled with the links of every page loaded while searching, by page number.
+            max_page (int): Upper limit of the search.
+
+        Returns:
+            int: The number of the last page, 0 if even the first page has no links.
+        """
+        links_by_page = links_by_page if links_by_page is not None else {}
+        source = self.apartment_scraper.source_identifier()
+
+        def links(page: int) -> list[str]:
+            if page not in links_by_page:
+                try:
+                    if page == self.page:
+                        soup = self.soup
+                    else:
+                        soup = self.load_page(page)
+                    links_by_page[page] = self.links_from_page(soup)
+                except Exception as e:
+                    logging.warning(f"{source} | page {page} failed while looking for the last page: {e}")
+                    links_by_page[page] = []
+            return links_by_page[page]
+
+        def has_links(page: int) -> bool:
+            page_links = set(links(page))
+            if not page_links:
+                return False
+            if page > 1 and (page_links == set(links(page - 1)) or page_links == set(links(1))):
+                return False
+            return True
+
+        if not has_links(1):
+            return 0
+
+        last_good = 1
+        pager_page = self.last_page_from_pager(self.soup if self.page == 1 else self.load_page(1))
+        if pager_page is not None and 1 < pager_page <= max_page and has_links(pager_page):
+            last_good = pager_page
+
+        # Doubling steps until a page past the end
+        step = 1
+        first_bad = last_good + step
+        while first_bad <= max_page and has_links(first_bad):
+            last_good = first_bad
+            step *= 2
+            first_bad = last_good + step
+        first_bad = min(first_bad, max_page + 1)
+
+        while first_bad - last_good > 1:
+            middle = (last_good + first_bad) // 2
+            if has_links(middle):
+                last_good = middle
+            else:
+                first_bad = middle
+        return last_good
+
+    def is_update(self, apartment_url: str) -> bool:
+        """
+        Check if an apartment that was scraped before changed since, so it has to be scraped again.
+        Pipelines that cannot tell always return False.
+
+        Args:
+            apartment_url (str): The URL of the apartment page.
+        """
+        return False
+
+    def link_done(self, apartment_url: str):
+        """
+        Called once an apartment is scraped, or skipped because the log already has it.
+
+        Args:
+            apartment_url (str): The URL of the apartment page.
+        """
+        pass
+
+    def when_stored(self, callback):
+        """
+        Calls `callback` once the apartments scraped so far are written by the storage of
+        the pipeline, see `Storage.when_written`. They are recorded as scraped from it.
+
+        Args:
+            callback: Called with None or the exception that prevented the write.
+        """
+        storage = getattr(self, "storage", None)
+        if storage is None:
+            callback(None)
+        else:
+            storage.when_written(callback)
+
+    def wait_stored(self):
+        """
+        Writes the apartments scraped so far and waits for the callbacks of `when_stored`,
+        see `Storage.wait_written`. Called once the pipeline is done.
+        """
+        storage = getattr(self, "storage", None)
+        if storage is not None:
+            storage.wait_written()
 
-    
     def scrape_links(self, links):
         for link in links:
             self.scrape_apartment(link)
\ No newline at end of file
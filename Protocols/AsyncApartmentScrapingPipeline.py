@@ -0,0 +1,69 @@
+from abc import ABC, abstractmethod
+
+class AsyncApartmentScrapingPipeline(ABC):
+    """
+    asyncio variant of ApartmentScrapingPipeline. Listing pages are addressed by
+    their number, so several of them can be requested at the same time.
+    """
+
+    @abstractmethod
+    def source_identifier(self) -> str:
+        """
+        Abstract method for returning the source identifier of the scraped apartments.
+        """
+        pass
+
+    @abstractmethod
+    async def get_apartment_links(self, page: int) -> list[str]:
+        """
+        Abstract method for getting links to individual apartments on a listing page.
+        Subclasses must implement this method.
+
+        Args:
+            page (int): The number of the listing page, starting from 1.
+
+        Returns:
+            list: A list of apartment URLs, empty when there are no more pages.
+        """
+        pass
+
+    @abstractmethod
+    async def scrape_apartment(self, apartment_url: str):
+        """
+        Abstract method for scraping, storing and downloading the images of an individual apartment.
+        Subclasses must implement this method.
+
+        Args:
+            apartment_url (str): The URL of the apartment page to scrape.
+        """
+        pass
+
+    def pipeline_identifier(self) -> str:
+        """
+        See `ApartmentScrapingPipeline.pipeline_identifier`.
+        """
+        return self.source_identifier()
+
+    def is_update(self, apartment_url: str) -> bool:
+        """
+        See `ApartmentScrapingPipeline.is_update`.
+        """
+        return False
+
+    def link_done(self, apartment_url: str):
+        """
+        See `ApartmentScrapingPipeline.link_done`.
+        """
+        pass
+
+    def when_stored(self, callback):
+        """
+        See `ApartmentScrapingPipeline.when_stored`.
+        """
+        callback(None)
+
+    async def wait_stored(self):
+        """
+        See `ApartmentScrapingPipeline.wait_stored`.
+        """
+        pass
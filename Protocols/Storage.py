@@ -25,6 +25,23 @@ class Storage(ABC):
         """
         pass
 
+    def when_written(self, callback):
+        """
+        Calls `callback` once the data appended so far is written, with None, or with the
+        exception that prevented it. Storages that write in `append` call it at once.
+
+        Args:
+            callback: Called with None or an exception, possibly from another thread.
+        """
+        callback(None)
+
+    def wait_written(self):
+        """
+        Writes the data appended so far and waits until it is, and until the callbacks
+        of `when_written` ran. Storages that write in `append` return at once.
+        """
+        pass
+
     @abstractmethod
     def path(self):
         """
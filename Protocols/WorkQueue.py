@@ -0,0 +1,78 @@
+from abc import ABC, abstractmethod
+
+class WorkQueue(ABC):
+    """
+    Queue of apartment URLs shared by a coordinator, which puts the links of the listing pages,
+    and workers, which lease and scrape them. A leased URL that is not completed before its lease
+    expires (e.g. its worker died) is handed out again.
+
+    Items are dictionaries with `id`, `url`, `source` and `pipeline` (the identifier of the
+    pipeline that found the URL).
+    """
+
+    @abstractmethod
+    def put(self, pipeline: str, source: str, urls: list[str], requeue: bool = False) -> int:
+        """
+        Abstract method for adding URLs. A URL already in the queue is not added again.
+
+        Args:
+            pipeline (str): Identifier of the pipeline that found the URLs.
+            source (str): Source identifier of the URLs.
+            urls (list[str]): The URLs to scrape.
+            requeue (bool): Hand out the URLs again even if they were completed, e.g. because they changed.
+
+        Returns:
+            int: The number of URLs added (or requeued).
+        """
+        pass
+
+    @abstractmethod
+    def lease(self, worker: str, sources: list[str] = None, count: int = 1, lease_seconds: float = 300) -> list[dict]:
+        """
+        Abstract method for taking URLs to scrape.
+
+        Args:
+            worker (str): Identifier of the worker taking them.
+            sources (list[str], optional): Only URLs of these sources.
+            count (int): Maximum number of URLs.
+            lease_seconds (float): Time after which the URLs are handed out again if not completed.
+
+        Returns:
+            list[dict]: The leased items, empty when there is nothing to scrape.
+        """
+        pass
+
+    @abstractmethod
+    def complete(self, item_id: int, worker: str, success: bool, error: str = None):
+        """
+        Abstract method for reporting the outcome of a leased item. Ignored if the item is not
+        leased to `worker` anymore, e.g. its lease expired and it was handed to another one.
+
+        Args:
+            item_id (int): The `id` of the item.
+            worker (str): Identifier of the worker that leased it.
+            success (bool): Whether it was scraped.
+            error (str, optional): The error if it was not.
+        """
+        pass
+
+    @abstractmethod
+    def take_results(self, limit: int = 1000) -> list[dict]:
+        """
+        Abstract method for taking the outcomes not taken yet, each of them is returned once.
+
+        Returns:
+            list[dict]: Items with `success` and `error`.
+        """
+        pass
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """
+        Abstract method for getting the number of items in every state.
+        """
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
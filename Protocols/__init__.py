@@ -1,3 +1,5 @@
 from .ApartmentScraper import ApartmentScraper
 from .ApartmentScrapingPipeline import ApartmentScrapingPipeline
-from .Storage import Storage
\ No newline at end of file
+from .Storage import Storage
+from .AsyncApartmentScrapingPipeline import AsyncApartmentScrapingPipeline
+from .WorkQueue import WorkQueue
\ No newline at end of file
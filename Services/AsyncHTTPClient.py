@@ -0,0 +1,227 @@
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+import aiohttp
+from Services.HTTPClient import ACCEPT_ENCODING
+from Services.HTTPCache import HTTPCache
+from Services.RateController import RateController
+
+class AsyncHTTPClient:
+    """
+    asyncio counterpart of `HTTPClient`, used by the asyncio scraping mode.
+    One `aiohttp.ClientSession` is shared by listing pages, detail pages and images,
+    and the number of requests in flight is bounded globally and per host.
+    Must be created and used inside a running event loop, preferably with `async with`.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 1000,
+        max_in_flight_per_host: int = 64,
+        timeout: float = 30,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30,
+        retry_statuses: tuple[int, ...] = (429, 500, 502, 503, 504),
+        headers: dict = None,
+        cache: HTTPCache = None,
+        rate_controller: RateController = None
+    ):
+        """
+        Initialize the AsyncHTTPClient.
+
+        Args:
+        max_in_flight (int): Maximum number of open connections of the whole process.
+        max_in_flight_per_host (int): Maximum number of requests in flight to a single host.
+        timeout (float): Total timeout of a request in seconds.
+        max_retries (int): How many times a failed request is retried.
+        backoff_base (float): Base of the exponential backoff in seconds.
+        backoff_max (float): Upper limit of a single backoff in seconds.
+        retry_statuses (tuple[int]): Status codes after which the request is retried.
+        headers (dict, optional): Headers sent with every request.
+        cache (HTTPCache, optional): Cache of the GET responses, revalidated with conditional requests.
+        rate_controller (RateController, optional): Adapts the number of requests in flight to every host, under `max_in_flight_per_host`.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_host = max_in_flight_per_host
+        self.timeout = aiohttp.ClientTimeout(total = timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = set(retry_statuses)
+        self.headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        if headers:
+            self.headers.update(headers)
+        self.cache = cache
+        self.rate_controller = rate_controller
+
+        self.session: aiohttp.ClientSession = None
+        self.semaphores: dict[str, asyncio.Semaphore] = {}
+        self.host_stats: dict[str, dict] = {}
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit = self.max_in_flight, limit_per_host = 0)
+            self.session = aiohttp.ClientSession(
+                connector = connector,
+                timeout = self.timeout,
+                headers = self.headers
+            )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Holds one of the request slots of the URL's host, for requests sent directly through `session`.
+
+        Args:
+        url (str): The URL that is going to be requested.
+        """
+        host = self.host(url)
+        semaphore = self.semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_in_flight_per_host)
+            self.semaphores[host] = semaphore
+            self.host_stats[host] = {
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0
+            }
+        async with semaphore:
+            yield
+
+    async def request(self, method: str, url: str, data: dict = None) -> tuple[int, bytes]:
+        """
+        Send a request, retrying connection errors and `retry_statuses`.
+
+        Args:
+        method (str): HTTP method, e.g. "GET".
+        url (str): The URL to request.
+        data (dict, optional): Form data of the request.
+
+        Returns:
+        tuple[int, bytes]: Status code and body of the last response, a 304 to a cached URL is returned as a 200 with the cached body.
+        Raises the last exception if every attempt failed without a response.
+        """
+        if self.cache is None or method != "GET":
+            status, body, _ = await self.__send(method, url, data)
+            return status, body
+
+        validators = self.cache.validators(url)
+        status, body, headers = await self.__send(method, url, data, validators)
+        if status == 304 and validators:
+            cached = self.cache.load(url)
+            if cached is not None:
+                return 200, cached[0]
+            # The cached body is gone, download it again
+            status, body, headers = await self.__send(method, url, data)
+
+        if status == 200:
+            self.cache.store(url, body, headers)
+        return status, body
+
+    async def __send(self, method: str, url: str, data: dict = None, headers: dict = None) -> tuple[int, bytes, dict]:
+        host = self.host(url)
+        attempt = 0
+        while True:
+            status = None
+            body = None
+            response_headers = None
+            error = None
+            retry_after = None
+            async with self.slot(url):
+                if self.rate_controller is not None:
+                    await self.rate_controller.acquire_async(host)
+                start = time.monotonic()
+                try:
+                    async with self.session.request(method, url, data = data, headers = headers) as response:
+                        status = response.status
+                        body = await response.read()
+                        response_headers = response.headers
+                        retry_after = response.headers.get("Retry-After")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+                finally:
+                    latency = time.monotonic() - start
+                    if self.rate_controller is not None:
+                        self.rate_controller.release(host, latency, status)
+                self.__record(host, latency, status)
+
+            retryable = error is not None or status in self.retry_statuses
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return status, body, response_headers
+
+            delay = self.__backoff(attempt, retry_after)
+            logging.warning(f"{host} | retrying {url} in {delay:.1f}s ({error or status})")
+            self.host_stats[host]["retries"] += 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str) -> tuple[int, bytes]:
+        return await self.request("GET", url)
+
+    async def post(self, url: str, data: dict = None) -> tuple[int, bytes]:
+        return await self.request("POST", url, data = data)
+
+    def penalize(self, url: str) -> float:
+        """
+        Reports that the host of a URL served a blocked page, in the way of `HTTPClient.penalize`.
+
+        Returns:
+        float: Seconds to wait before requesting the page again.
+        """
+        if self.rate_controller is not None:
+            return self.rate_controller.penalize(self.host(url))
+        return random.uniform(self.backoff_max / 2, self.backoff_max)
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Returns the request and latency counters of every host, in the format of `HTTPClient.stats`.
+        """
+        result = {}
+        for host, stats in self.host_stats.items():
+            count = stats["requests"]
+            result[host] = {
+                "requests": count,
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "mean_latency": stats["total_latency"] / count if count else 0.0,
+                "max_latency": stats["max_latency"]
+            }
+        return result
+
+    def __backoff(self, attempt: int, retry_after: str) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(self.backoff_max, float(retry_after))
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(cap / 2, cap)
+
+    def __record(self, host: str, latency: float, status: int):
+        stats = self.host_stats[host]
+        stats["requests"] += 1
+        stats["total_latency"] += latency
+        stats["max_latency"] = max(stats["max_latency"], latency)
+        if status is None or status >= 400:
+            stats["errors"] += 1
@@ -0,0 +1,143 @@
+import time
+import sqlite3
+import logging
+import threading
+
+class CrawlQueue:
+    """
+    Durable state of a crawl, so that a run that died continues where it stopped.
+
+    Keeps, for every pipeline, the apartment URLs found on its listing pages with their state
+    ("pending", "in_flight", "done" or "failed") and the last listing page whose links were all
+    recorded (its cursor). Stored in a sqlite database in WAL mode, every change is committed
+    at once. When a pipeline finishes its listing pages and its URLs, its state is removed,
+    so the next run starts from its first page again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the CrawlQueue with a path for its sqlite database.
+
+        Args:
+        path (str): The file path of the database, created if missing.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                pipeline TEXT,
+                url TEXT,
+                state TEXT,
+                updated_at REAL,
+                PRIMARY KEY (pipeline, url)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS urls_state ON urls (pipeline, state)")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS cursors (
+                pipeline TEXT PRIMARY KEY,
+                page INTEGER,
+                updated_at REAL
+            )
+        """)
+        self.connection.commit()
+
+    def recover(self) -> int:
+        """
+        Puts the URLs that were being scraped when the previous run stopped back to pending.
+
+        Returns:
+        int: The number of recovered URLs.
+        """
+        with self.lock:
+            count = self.connection.execute(
+                "UPDATE urls SET state = 'pending', updated_at = ? WHERE state = 'in_flight'", (time.time(),)
+            ).rowcount
+            self.connection.commit()
+        if count:
+            logging.info(f"Crawl queue | {count} URLs in flight when the last run stopped are pending again")
+        return count
+
+    def push(self, pipeline: str, urls: list[str], page: int = None):
+        """
+        Records the URLs found by a pipeline as pending, and moves its cursor to the listing page
+        they were found on, in one transaction. URLs already known keep their state.
+
+        Args:
+        pipeline (str): Identifier of the pipeline.
+        urls (list[str]): The URLs found.
+        page (int, optional): The listing page they were found on.
+        """
+        now = time.time()
+        with self.lock:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO urls VALUES (?, ?, 'pending', ?)",
+                    [(pipeline, url, now) for url in urls]
+                )
+                if page is not None:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)", (pipeline, page, now)
+                    )
+
+    def pending(self, pipeline: str) -> list[str]:
+        """
+        Returns the URLs of a pipeline that were found but not scraped yet.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url FROM urls WHERE pipeline = ? AND state = 'pending' ORDER BY updated_at", (pipeline,)
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def cursor(self, pipeline: str) -> int | None:
+        """
+        Returns the last listing page of a pipeline whose links were all recorded, None if there is none.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT page FROM cursors WHERE pipeline = ?", (pipeline,)).fetchone()
+        return row[0] if row is not None else None
+
+    def start(self, pipeline: str, url: str):
+        self.__set_state(pipeline, url, "in_flight")
+
+    def finish(self, pipeline: str, url: str, success: bool = True):
+        self.__set_state(pipeline, url, "done" if success else "failed")
+
+    def finish_pipeline(self, pipeline: str):
+        """
+        Removes the state of a pipeline that went through all its listing pages and URLs.
+        """
+        with self.lock:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM urls WHERE pipeline = ? AND state IN ('done', 'failed')", (pipeline,)
+                )
+                self.connection.execute("DELETE FROM cursors WHERE pipeline = ?", (pipeline,))
+
+    def counts(self, pipeline: str = None) -> dict[str, int]:
+        """
+        Returns the number of URLs in every state, of one pipeline or of all of them.
+        """
+        with self.lock:
+            if pipeline is None:
+                rows = self.connection.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall()
+            else:
+                rows = self.connection.execute(
+                    "SELECT state, COUNT(*) FROM urls WHERE pipeline = ? GROUP BY state", (pipeline,)
+                ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __set_state(self, pipeline: str, url: str, state: str):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)", (pipeline, url, state, time.time())
+            )
+            self.connection.commit()
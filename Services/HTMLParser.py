@@ -0,0 +1,119 @@
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+class HTMLParser:
+    """
+    Builds the BeautifulSoup trees of the scrapers and pipelines with a configurable backend.
+
+    Backends:
+    "html.parser": Python's parser, the slowest, needs no extra packages.
+    "lxml": lxml's C parser.
+    "selectolax": Lexbor (through selectolax) finds the target elements of the page,
+        and only their HTML is parsed by lxml. Without targets it behaves like "lxml".
+
+    Targets are simple selectors, `tag`, `tag.class1.class2`, `tag#id` or `.class`, for the
+    elements a scraper reads. Everything outside of them is skipped while parsing. The matched
+    elements are kept whole and in document order, so `find`/`find_all` over the partial tree
+    return what they return over the whole document, as long as the targets cover every
+    element the scraper looks for.
+    """
+
+    BACKENDS = ("html.parser", "lxml", "selectolax")
+
+    # Shared by the whole process, and by the parse stage processes forked after it is set
+    backend = "html.parser"
+
+    @classmethod
+    def use(cls, backend: str):
+        """
+        Sets the backend used by all scrapers and pipelines.
+
+        Args:
+        backend (str): One of `HTMLParser.BACKENDS`.
+        """
+        if backend not in cls.BACKENDS:
+            raise Exception(f"Unknown parser backend {backend}, expected one of {cls.BACKENDS}")
+        if backend == "selectolax" and LexborHTMLParser is None:
+            raise Exception("The selectolax backend needs the `selectolax` package")
+        cls.backend = backend
+        logging.info(f"HTML parser | using {backend}")
+
+    @classmethod
+    def parse(cls, html, targets: list[str] = None, backend: str = None) -> BeautifulSoup:
+        """
+        Parses a page.
+
+        Args:
+        html (str | bytes): The content of the page.
+        targets (list[str], optional): Selectors of the elements to keep. The whole page is kept if None.
+        backend (str, optional): Overrides the backend set with `use`.
+
+        Returns:
+        BeautifulSoup: The parsed page.
+        """
+        backend = backend or cls.backend
+
+        if backend == "selectolax" and targets:
+            return BeautifulSoup(cls.__extract_targets(html, targets), "lxml")
+
+        if backend == "selectolax":
+            backend = "lxml"
+
+        parse_only = SoupStrainer(cls.__strainer(targets)) if targets else None
+        return BeautifulSoup(html, backend, parse_only = parse_only)
+
+    @staticmethod
+    def split_selector(selector: str) -> tuple[str, str, set[str]]:
+        """
+        Splits a simple selector into its tag name, id and classes, each of them may be empty.
+        """
+        tag_id = None
+        head, *classes = selector.split(".")
+        if "#" in head:
+            head, tag_id = head.split("#", 1)
+        return head or None, tag_id, set(classes)
+
+    @classmethod
+    def __strainer(cls, targets: list[str]):
+        selectors = [cls.split_selector(target) for target in targets]
+
+        def matches(name, attrs = None) -> bool:
+            # Called while parsing, with the attributes as they are in the markup.
+            # Newer versions of bs4 only pass the tag name, then only it is matched.
+            if attrs is None:
+                return any(tag is None or tag == name for tag, _, _ in selectors)
+            classes = attrs.get("class") or ""
+            if isinstance(classes, str):
+                classes = classes.split()
+            for tag, tag_id, tag_classes in selectors:
+                if tag is not None and tag != name:
+                    continue
+                if tag_id is not None and attrs.get("id") != tag_id:
+                    continue
+                if not tag_classes.issubset(classes):
+                    continue
+                return True
+            return False
+
+        return matches
+
+    @staticmethod
+    def __extract_targets(html, targets: list[str]) -> str:
+        tree = LexborHTMLParser(html)
+        nodes = tree.css(", ".join(targets))
+
+        # Nested matches are already part of their outermost match
+        selected = {node.mem_id for node in nodes}
+        outermost = []
+        for node in nodes:
+            parent = node.parent
+            while parent is not None and parent.mem_id not in selected:
+                parent = parent.parent
+            if parent is None:
+                outermost.append(node.html)
+        return "".join(outermost)
@@ -0,0 +1,205 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+
+class HTTPCache:
+    """
+    Disk-backed cache of GET responses, used by the HTTP clients to revalidate pages
+    with `If-None-Match`/`If-Modified-Since` instead of downloading them again.
+
+    Only responses with an `ETag` or a `Last-Modified` header are stored, since nothing
+    else can be revalidated. Bodies are files under `<cache_dir>/bodies/`, and a sqlite
+    index keeps the validators, size and last use of every URL. Entries older than
+    `ttl` are dropped, and the least recently used ones are evicted once the bodies
+    exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3, ttl: float = 30 * 24 * 3600):
+        """
+        Initialize the HTTPCache.
+
+        Args:
+        cache_dir (str): Directory of the cache, created if missing.
+        max_bytes (int): Maximum total size of the cached bodies.
+        ttl (float): Seconds after which an entry is not revalidated anymore but fetched again. No limit if None.
+        """
+        self.cache_dir = cache_dir
+        self.bodies_dir = os.path.join(cache_dir, "bodies")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(self.bodies_dir, exist_ok = True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                size INTEGER,
+                stored_at REAL,
+                used_at REAL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+        self.connection.commit()
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+        self.counters = {
+            "revalidated": 0,
+            "stored": 0,
+            "evicted": 0,
+            "expired": 0,
+            "bytes_saved": 0
+        }
+
+    def validators(self, url: str) -> dict:
+        """
+        Returns the conditional headers to send for a URL, empty when it is not cached.
+
+        Args:
+        url (str): The URL that is going to be requested.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified, stored_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return {}
+            etag, last_modified, stored_at = row
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                self.__delete(url)
+                self.counters["expired"] += 1
+                self.connection.commit()
+                return {}
+
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def load(self, url: str) -> tuple[bytes, dict] | None:
+        """
+        Returns the cached body and headers of a URL after a 304, or None if they are gone.
+
+        Args:
+        url (str): The revalidated URL.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT headers, size FROM entries WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self.__body_path(url), 'rb') as file:
+                    body = file.read()
+            except OSError:
+                # The body was removed from under the index
+                self.__delete(url)
+                self.connection.commit()
+                return None
+            self.connection.execute("UPDATE entries SET used_at = ? WHERE url = ?", (time.time(), url))
+            self.connection.commit()
+            self.counters["revalidated"] += 1
+            self.counters["bytes_saved"] += row[1]
+        return body, json.loads(row[0])
+
+    def store(self, url: str, body: bytes, headers) -> bool:
+        """
+        Stores a 200 response if it has validators.
+
+        Args:
+        url (str): The requested URL.
+        body (bytes): The content of the response.
+        headers (Mapping): The headers of the response.
+
+        Returns:
+        bool: Whether the response was stored.
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return False
+        if len(body) > self.max_bytes:
+            return False
+
+        kept_headers = {
+            name: headers[name]
+            for name in ("Content-Type", "ETag", "Last-Modified")
+            if headers.get(name)
+        }
+        path = self.__body_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(body)
+        os.replace(temp_path, path)
+
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                self.total_bytes -= row[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, json.dumps(kept_headers), len(body), now, now)
+            )
+            self.total_bytes += len(body)
+            self.counters["stored"] += 1
+            self.__evict()
+            self.connection.commit()
+        return True
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache, with its current `entries` and `bytes`.
+        """
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return dict(self.counters, entries = entries, bytes = self.total_bytes)
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"HTTP cache | {stats['entries']} entries, {stats['bytes'] / 1024 ** 2:.1f} MB, "
+            f"{stats['revalidated']} revalidated ({stats['bytes_saved'] / 1024 ** 2:.1f} MB saved), "
+            f"{stats['stored']} stored, {stats['evicted']} evicted, {stats['expired']} expired"
+        )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __body_path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.bodies_dir, digest[:2], digest)
+
+    def __delete(self, url: str):
+        row = self.connection.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return
+        self.connection.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self.total_bytes -= row[0]
+        try:
+            os.remove(self.__body_path(url))
+        except OSError:
+            pass
+
+    def __evict(self):
+        # Least recently used first, until the bodies fit again
+        while self.total_bytes > self.max_bytes:
+            rows = self.connection.execute("SELECT url FROM entries ORDER BY used_at LIMIT 100").fetchall()
+            if not rows:
+                break
+            for (url,) in rows:
+                self.__delete(url)
+                self.counters["evicted"] += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
@@ -0,0 +1,280 @@
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from Services.HTTPCache import HTTPCache
+from Services.RateController import RateController
+
+# urllib3 decodes brotli only when one of these packages is installed
+try:
+    import brotli
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+class HTTPClient:
+    """
+    HTTP client shared by the scrapers and the pipelines.
+    Keeps a keep-alive connection pool per host, negotiates compression,
+    retries failed requests with exponential backoff and jitter and counts
+    requests and latency per host.
+    With a cache, GET responses are revalidated and a 304 is answered with the cached body.
+    With a rate controller, the requests in flight to every host follow its adaptive limit.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        timeout: float | tuple[float, float] = (10, 30),
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30,
+        pool_maxsize: int = 32,
+        retry_statuses: tuple[int, ...] = (429, 500, 502, 503, 504),
+        headers: dict = None,
+        cache: HTTPCache = None,
+        rate_controller: RateController = None
+    ):
+        """
+        Initialize the HTTPClient.
+
+        Args:
+        timeout (float | tuple): Requests timeout, either a single value or (connect, read) in seconds.
+        max_retries (int): How many times a failed request is retried.
+        backoff_base (float): Base of the exponential backoff in seconds.
+        backoff_max (float): Upper limit of a single backoff in seconds.
+        pool_maxsize (int): Maximum number of keep-alive connections per host.
+        retry_statuses (tuple[int]): Status codes after which the request is retried.
+        headers (dict, optional): Headers sent with every request.
+        cache (HTTPCache, optional): Cache of the GET responses, revalidated with conditional requests.
+        rate_controller (RateController, optional): Adapts the number of requests in flight to every host.
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.retry_statuses = set(retry_statuses)
+        self.headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        if headers:
+            self.headers.update(headers)
+        self.cache = cache
+        self.rate_controller = rate_controller
+
+        self.sessions: dict[str, requests.Session] = {}
+        self.host_stats: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "HTTPClient":
+        """
+        Returns the default client used when none is injected.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc.lower()
+
+    def session(self, host: str) -> requests.Session:
+        """
+        Returns the session that holds the connection pool of a host.
+
+        Args:
+        host (str): Host name, as returned by `HTTPClient.host`.
+        """
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(self.headers)
+                self.sessions[host] = session
+                self.host_stats.setdefault(host, {
+                    "requests": 0,
+                    "errors": 0,
+                    "retries": 0,
+                    "total_latency": 0.0,
+                    "max_latency": 0.0
+                })
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying connection errors and `retry_statuses`.
+
+        Args:
+        method (str): HTTP method, e.g. "GET".
+        url (str): The URL to request.
+        **kwargs: Passed to `requests.Session.request`.
+
+        Returns:
+        requests.Response: The last response. Its status code is not checked, callers decide what a failure is.
+        A 304 to a cached URL is returned as a 200 with the cached body and an `X-Cache: revalidated` header.
+        Raises the last exception if every attempt failed without a response.
+        """
+        if self.cache is None or method != "GET" or kwargs.get("stream"):
+            return self.__send(method, url, **kwargs)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        validators = self.cache.validators(url)
+        response = self.__send(method, url, headers = dict(headers, **validators), **kwargs)
+
+        if response.status_code == 304 and validators:
+            cached = self.cache.load(url)
+            if cached is not None:
+                return self.__cached_response(response, *cached)
+            # The cached body is gone, download it again
+            response = self.__send(method, url, headers = headers, **kwargs)
+
+        if response.status_code == 200:
+            self.cache.store(url, response.content, response.headers)
+        return response
+
+    def __send(self, method: str, url: str, **kwargs) -> requests.Response:
+        host = self.host(url)
+        session = self.session(host)
+        kwargs.setdefault("timeout", self.timeout)
+
+        attempt = 0
+        while True:
+            if self.rate_controller is not None:
+                self.rate_controller.acquire(host)
+            start = time.monotonic()
+            response = None
+            error = None
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                error = e
+            finally:
+                latency = time.monotonic() - start
+                if self.rate_controller is not None:
+                    self.rate_controller.release(host, latency, response.status_code if response is not None else None)
+            self.__record(host, latency, response)
+
+            retryable = error is not None or response.status_code in self.retry_statuses
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self.__backoff(attempt, response)
+            logging.warning(f"{host} | retrying {url} in {delay:.1f}s ({error or response.status_code})")
+            with self.lock:
+                self.host_stats[host]["retries"] += 1
+            if response is not None:
+                # Give the connection back to the pool before waiting
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, data = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, data = data, **kwargs)
+
+    def penalize(self, url: str) -> float:
+        """
+        Reports that the host of a URL served a blocked page (e.g. a captcha), so that it is slowed down.
+
+        Args:
+        url (str): The URL of the blocked page.
+
+        Returns:
+        float: Seconds to wait before requesting the page again.
+        """
+        if self.rate_controller is not None:
+            return self.rate_controller.penalize(self.host(url))
+        return random.uniform(self.backoff_max / 2, self.backoff_max)
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Returns the request and latency counters of every host.
+
+        Returns:
+        dict: Host name to a dictionary with `requests`, `errors`, `retries`, `mean_latency` and `max_latency`.
+        """
+        with self.lock:
+            result = {}
+            for host, stats in self.host_stats.items():
+                count = stats["requests"]
+                result[host] = {
+                    "requests": count,
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "mean_latency": stats["total_latency"] / count if count else 0.0,
+                    "max_latency": stats["max_latency"]
+                }
+            return result
+
+    def log_stats(self):
+        for host, stats in self.stats().items():
+            logging.info(
+                f"{host} | {stats['requests']} requests, {stats['errors']} errors, {stats['retries']} retries, "
+                f"mean latency {stats['mean_latency']:.2f}s, max latency {stats['max_latency']:.2f}s"
+            )
+        if self.cache is not None:
+            self.cache.log_stats()
+        if self.rate_controller is not None:
+            self.rate_controller.log_stats()
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+    @staticmethod
+    def __cached_response(response: requests.Response, body: bytes, headers: dict) -> requests.Response:
+        """
+        Builds the 200 response of a revalidated URL from its cached body.
+        """
+        cached_response = requests.Response()
+        cached_response.status_code = 200
+        cached_response.reason = "OK"
+        cached_response._content = body
+        cached_response.headers = CaseInsensitiveDict(headers)
+        cached_response.headers["X-Cache"] = "revalidated"
+        cached_response.encoding = get_encoding_from_headers(cached_response.headers)
+        cached_response.url = response.url
+        cached_response.request = response.request
+        cached_response.elapsed = response.elapsed
+        return cached_response
+
+    def __backoff(self, attempt: int, response: requests.Response) -> float:
+        """
+        Exponential backoff with jitter, honouring `Retry-After` when the server sends it.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(self.backoff_max, float(retry_after))
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(cap / 2, cap)
+
+    def __record(self, host: str, latency: float, response: requests.Response):
+        with self.lock:
+            stats = self.host_stats[host]
+            stats["requests"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            if response is None or response.status_code >= 400:
+                stats["errors"] += 1
@@ -0,0 +1,188 @@
+import time
+import asyncio
+import logging
+import threading
+import aiohttp
+from ConcreteStorages import ImageStorage
+from Services.ImageLoader import ImageLoader
+from Services.ImageManifest import ImageManifest
+
+class ImageDownloadService(ImageLoader):
+    """
+    ImageLoader that downloads in the background: one event loop in its own thread, with one
+    pooled aiohttp session for the whole run. `download_images` only queues the images and
+    returns, so the pipelines go on scraping while the photos are transferred.
+
+    At most `max_in_flight` images are downloaded at the same time, and `max_in_flight_per_host`
+    from one host. At most `queue_size` images wait, the images of an apartment that does not
+    fit are logged as errors in the storage instead of blocking the pipeline.
+    """
+
+    def __init__(
+        self,
+        storage: ImageStorage,
+        manifest: ImageManifest = None,
+        max_in_flight: int = 64,
+        max_in_flight_per_host: int = 16,
+        queue_size: int = 20000,
+        timeout: float = 60,
+        max_bytes: int = 20 * 1024 ** 2
+    ):
+        """
+        Initialize the ImageDownloadService, `start` runs it.
+
+        Args:
+        storage (ImageStorage): An instance of ImageStorage to handle downloaded images.
+        manifest (ImageManifest, optional): Records the downloads, see `ImageLoader`.
+        max_in_flight (int): Images downloaded at the same time, over all hosts.
+        max_in_flight_per_host (int): Images downloaded at the same time from one host.
+        queue_size (int): Images waiting to be downloaded, above which new ones are refused.
+        timeout (float): Total timeout of one image download in seconds.
+        max_bytes (int): Largest image downloaded, larger ones are abandoned as errors.
+        """
+        super().__init__(storage, manifest, max_bytes = max_bytes, timeout = timeout)
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_host = max_in_flight_per_host
+        self.queue_size = queue_size
+
+        self.loop = None
+        self.thread = None
+        self.session = None
+        self.jobs = None
+        self.workers = []
+        self.lock = threading.Lock()
+        self.started_at = None
+        self.counters = {"queued": 0, "in_flight": 0, "done": 0, "failed": 0, "refused": 0}
+
+    def start(self):
+        """
+        Starts the event loop thread, with the session and the download workers.
+        """
+        if self.thread is not None:
+            return
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(self.__open())
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target = run, name = "image-downloads", daemon = True)
+        self.thread.start()
+        ready.wait()
+        self.started_at = time.monotonic()
+
+    def close(self, wait: bool = True):
+        """
+        Stops the service.
+
+        Args:
+        wait (bool): Download the queued images first, otherwise they are dropped.
+        """
+        if self.thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.__close(wait), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.thread = None
+        self.log_stats()
+
+    def submit(self, links, source, apartment_id) -> bool:
+        """
+        Queues the images of an apartment that need to be downloaded, without waiting.
+
+        Args:
+        links (list): A list of URLs for the images to download.
+        source (str): The source identifier for logging.
+        apartment_id (str): The identifier of the apartment for which the images are being downloaded.
+
+        Returns:
+        bool: False if the queue was full and the images were not queued.
+        """
+        if self.thread is None:
+            raise Exception("ImageDownloadService is not started")
+        images = self.pending_images(links, source, apartment_id)
+        with self.lock:
+            if self.counters["queued"] + len(images) > self.queue_size:
+                self.counters["refused"] += len(images)
+                refused = True
+            else:
+                self.counters["queued"] += len(images)
+                refused = False
+
+        if refused:
+            logging.error(f"{source} | image queue full, {len(images)} images of {apartment_id} not downloaded")
+            for index, url in images:
+                self.storage.log_error(source, url, apartment_id, index, "image queue full")
+            return False
+
+        for index, url in images:
+            self.loop.call_soon_threadsafe(self.jobs.put_nowait, (url, source, apartment_id, index))
+        return True
+
+    def download_images(self, links, source, apartment_id):
+        """
+        Queues the images of an apartment, see `submit`.
+        """
+        self.submit(links, source, apartment_id)
+
+    async def download_images_async(self, links, source, apartment_id, client = None):
+        """
+        Queues the images of an apartment from a coroutine, the images are downloaded by the service
+        and not on the calling loop, so `client` is not used.
+        """
+        self.submit(links, source, apartment_id)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of `queued` (waiting), `in_flight`, `done` (saved), `failed` and `refused`
+        images, and the `throughput` in images saved per second since the start.
+        """
+        with self.lock:
+            stats = dict(self.counters)
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0
+        stats["throughput"] = stats["done"] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"Images | {stats['done']} downloaded ({stats['throughput']:.1f}/s), {stats['failed']} failed, {stats['queued']} queued, "
+            f"{stats['in_flight']} in flight, {stats['refused']} refused"
+        )
+
+    async def __open(self):
+        self.jobs = asyncio.Queue()
+        self.session = aiohttp.ClientSession(
+            connector = aiohttp.TCPConnector(limit = self.max_in_flight, limit_per_host = self.max_in_flight_per_host),
+            timeout = aiohttp.ClientTimeout(total = self.timeout)
+        )
+        self.workers = [asyncio.create_task(self.__work()) for _ in range(self.max_in_flight)]
+
+    async def __close(self, wait: bool):
+        if wait:
+            await self.jobs.join()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions = True)
+        await self.session.close()
+
+    async def __work(self):
+        while True:
+            url, source, apartment_id, index = await self.jobs.get()
+            with self.lock:
+                self.counters["queued"] -= 1
+                self.counters["in_flight"] += 1
+            saved = False
+            try:
+                saved = await self.download_image(self.session, url, source, apartment_id, index)
+            except Exception as e:
+                logging.error(f"{source} | image {apartment_id} {index} failed: {e}")
+            finally:
+                with self.lock:
+                    self.counters["in_flight"] -= 1
+                    self.counters["done" if saved else "failed"] += 1
+                self.jobs.task_done()
@@ -1,26 +1,80 @@
+import os
 import aiohttp
 import asyncio
+import hashlib
 import logging
 from ConcreteStorages import ImageStorage
+from Services.ImageManifest import ImageManifest
+
+# Extensions of the Content-Types of images, used when the first bytes are not recognized
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/avif": "avif",
+    "image/heic": "heic",
+    "image/bmp": "bmp"
+}
+
+def image_extension(head: bytes, content_type: str = None) -> str | None:
+    """
+    Returns the extension of an image from its first bytes, or its Content-Type when they are not
+    recognized. None if it is not an image, e.g. an HTML error or captcha page.
+
+    Args:
+    head (bytes): The first 16 bytes (at least) of the content.
+    content_type (str, optional): The Content-Type header of the response.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPE_EXTENSIONS.get(content_type)
 
 class ImageLoader:
     """
     Service that is responsible for downloading images
     """
     
-    def __init__(self, storage: ImageStorage):
+    def __init__(
+        self,
+        storage: ImageStorage,
+        manifest: ImageManifest = None,
+        max_bytes: int = 20 * 1024 ** 2,
+        timeout: float = 60,
+        chunk_size: int = 64 * 1024
+    ):
         """
         Initialize the ImageLoader with an ImageStorage instance.
 
         Args:
         storage (ImageStorage): An instance of ImageStorage to handle downloaded images.
+        manifest (ImageManifest, optional): Records the downloads, so that the images already
+            downloaded are skipped and the failed ones retried after a backoff.
+        max_bytes (int): Largest image downloaded, larger ones are abandoned as errors.
+        timeout (float): Total timeout of one image download in seconds.
+        chunk_size (int): Bytes read from the response and written at once, the memory
+            an image takes while it is downloaded.
         """
         self.storage = storage
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.chunk_size = chunk_size
             
             
     async def download_image(self, session, url, source, apartment_id, index):
         """
         Asynchronously download an image from a given URL and save it using the ImageStorage.
+        The response is streamed into a temporary file of the storage, committed once complete,
+        and the extension is taken from the content, not from the URL.
 
         Args:
         session (aiohttp.ClientSession): The session object for making HTTP requests.
@@ -30,26 +84,73 @@ class ImageLoader:
         index (int): The index of the image in the sequence of apartment images.
 
         Returns:
-        None: This method does not return anything but saves the image or logs errors.
+        bool: True if the image was saved, False if the error was logged.
         """
+        temporary_path = None
         try:
-            async with session.get(url) as response:
+            async with session.get(url, timeout = aiohttp.ClientTimeout(total = self.timeout)) as response:
                 if response.status != 200:
-                    return
+                    self.storage.log_error(source, url, apartment_id, index, f"HTTP {response.status}", status_code = response.status)
+                    if self.manifest is not None:
+                        self.manifest.fail(source, apartment_id, index, f"HTTP {response.status}", response.status)
+                    return False
+                if response.content_length is not None and response.content_length > self.max_bytes:
+                    raise Exception(f"{response.content_length} bytes, more than {self.max_bytes}")
+
+                temporary_path = self.storage.temporary_path(f"{source}/{apartment_id}/{index}")
+                digest = hashlib.sha256()
+                size = 0
+                head = b""
+                with open(temporary_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise Exception(f"more than {self.max_bytes} bytes")
+                        if len(head) < 16:
+                            head += chunk[:16 - len(head)]
+                        digest.update(chunk)
+                        f.write(chunk)
 
-                extension = url.split(".")[-1]
+                extension = image_extension(head, response.headers.get("Content-Type"))
+                if extension is None:
+                    raise Exception(f"not an image, Content-Type {response.headers.get('Content-Type')}")
                 image_path = f"{source}/{apartment_id}/{index}.{extension}"
-                bytes = await response.read()
-                self.storage.save_image(bytes, image_path)
+                self.storage.commit_image(temporary_path, image_path, digest.hexdigest())
+            if self.manifest is not None:
+                # Without the original, the variants are what a repair checks
+                variants = None if self.storage.keep_originals else self.storage.variant_paths(image_path)
+                self.manifest.complete(source, apartment_id, index, image_path, size, digest.hexdigest(), variants)
+            return True
         except Exception as e:
-            self.storage.image_error_log(
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            self.storage.log_error(
                 source = source, 
                 url = url,
                 apartment_id = apartment_id,
                 index = index,
                 error = e
             )
+            if self.manifest is not None:
+                self.manifest.fail(source, apartment_id, index, e)
             logging.error(f"Can't download image {apartment_id} {index}")
+            return False
+
+    def pending_images(self, links, source, apartment_id) -> list[tuple[int, str]]:
+        """
+        Returns the images of an apartment that need to be downloaded, all of them without a manifest.
+
+        Args:
+        links (list): A list of URLs for the images of the apartment.
+        source (str): The source identifier for logging.
+        apartment_id (str): The identifier of the apartment.
+
+        Returns:
+        list: (index, URL) of the images to download.
+        """
+        if self.manifest is None:
+            return list(enumerate(links))
+        return self.manifest.register(source, apartment_id, links)
             
 
     async def __download_images(self, links, source, apartment_id):
@@ -64,11 +165,34 @@ class ImageLoader:
         Returns:
         None: This method does not return anything but orchestrates the downloading of images.
         """
+        images = self.pending_images(links, source, apartment_id)
+        if not images:
+            return
         async with aiohttp.ClientSession() as session:
-            tasks = [self.download_image(session, url, source, apartment_id, ind) for ind, url in enumerate(links)]
+            tasks = [self.download_image(session, url, source, apartment_id, ind) for ind, url in images]
             await asyncio.gather(*tasks)
 
 
+    async def download_images_async(self, links, source, apartment_id, client):
+        """
+        Download images for a specific apartment on the running event loop, sharing the
+        session and the per-host limits of an AsyncHTTPClient.
+
+        Args:
+        links (list): A list of URLs for the images to download.
+        source (str): The source identifier for logging.
+        apartment_id (str): The identifier of the apartment for which the images are being downloaded.
+        client (AsyncHTTPClient): The client whose session and request slots are used.
+
+        Returns:
+        None: This method does not return anything but downloads the images.
+        """
+        async def download(url, index):
+            async with client.slot(url):
+                await self.download_image(client.session, url, source, apartment_id, index)
+
+        await asyncio.gather(*[download(url, ind) for ind, url in self.pending_images(links, source, apartment_id)])
+
     def download_images(self, links, source, apartment_id):
         """
         Download images for a specific apartment, either asynchronously or synchronously based on the context.
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+class ImageManifest:
+    """
+    Durable record of the images of every apartment: their URL, path, byte size, SHA-256, status
+    ("pending", "done", "failed" or "gone") and download attempts, in a sqlite database in WAL mode.
+
+    Images already downloaded are not downloaded again when an apartment is scraped again, unless
+    their URL changed. Failed ones are retried after a backoff that doubles with every attempt,
+    at most `max_attempts` times, and images the server answered 404 or 410 for are not retried.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5, backoff: float = 60, backoff_max: float = 24 * 3600):
+        """
+        Initialize the ImageManifest with a path for its sqlite database.
+
+        Args:
+        path (str): The file path of the database, created if missing.
+        max_attempts (int): Failed downloads of an image after which it is not retried.
+        backoff (float): Seconds before the first retry of a failed image, doubled for every attempt.
+        backoff_max (float): Longest wait before a retry in seconds.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                source TEXT,
+                apartment_id TEXT,
+                "index" INTEGER,
+                url TEXT,
+                path TEXT,
+                size INTEGER,
+                sha256 TEXT,
+                variants TEXT,
+                status TEXT,
+                attempts INTEGER,
+                error TEXT,
+                next_attempt_at REAL,
+                updated_at REAL,
+                PRIMARY KEY (source, apartment_id, "index")
+            )
+        """)
+        # Manifests written before the variants were recorded
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(images)")]
+        if "variants" not in columns:
+            self.connection.execute("ALTER TABLE images ADD COLUMN variants TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS images_status ON images (status)")
+        self.connection.commit()
+
+    def register(self, source: str, apartment_id, links: list[str]) -> list[tuple[int, str]]:
+        """
+        Records the images of an apartment and returns the ones to download: new images, images whose
+        URL changed, and failed images whose backoff is over. The others are left as they are.
+
+        Args:
+        source (str): The source of the apartment.
+        apartment_id (str): The identifier of the apartment.
+        links (list[str]): The URLs of its images, in order.
+
+        Returns:
+        list[tuple[int, str]]: (index, URL) of the images to download.
+        """
+        now = time.time()
+        apartment_id = str(apartment_id)
+        with self.lock:
+            known = {
+                index: (url, status, attempts, next_attempt_at)
+                for index, url, status, attempts, next_attempt_at in self.connection.execute(
+                    'SELECT "index", url, status, attempts, next_attempt_at FROM images WHERE source = ? AND apartment_id = ?',
+                    (source, apartment_id)
+                )
+            }
+            images = []
+            new_rows = []
+            for index, url in enumerate(links):
+                if index not in known or known[index][0] != url:
+                    new_rows.append((source, apartment_id, index, url, "pending", 0, now))
+                    images.append((index, url))
+                    continue
+                _, status, attempts, next_attempt_at = known[index]
+                if status == "pending" or (status == "failed" and attempts < self.max_attempts and next_attempt_at <= now):
+                    images.append((index, url))
+            with self.connection:
+                self.connection.executemany("""
+                    INSERT OR REPLACE INTO images (source, apartment_id, "index", url, status, attempts, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, new_rows)
+        return images
+
+    def complete(self, source: str, apartment_id, index: int, path: str, size: int, sha256: str, variants: list[str] = None):
+        """
+        Records a downloaded image.
+
+        Args:
+        source (str): The source of the apartment.
+        apartment_id (str): The identifier of the apartment.
+        index (int): The index of the image in the sequence of apartment images.
+        path (str): The path of the image in the image storage, `source/apartment_id/index.ext`.
+        size (int): The number of bytes of the image.
+        sha256 (str): The SHA-256 of the image, in hexadecimal.
+        variants (list[str], optional): The files of the resized variants, when the original is not kept.
+        """
+        with self.lock:
+            self.connection.execute("""
+                UPDATE images SET path = ?, size = ?, sha256 = ?, variants = ?, status = 'done', error = NULL, updated_at = ?
+                WHERE source = ? AND apartment_id = ? AND "index" = ?
+            """, (path, size, sha256, json.dumps(variants) if variants else None, time.time(), source, str(apartment_id), index))
+            self.connection.commit()
+
+    def fail(self, source: str, apartment_id, index: int, error: str, status_code: int = None):
+        """
+        Records a failed download, and when the image may be retried.
+
+        Args:
+        source (str): The source of the apartment.
+        apartment_id (str): The identifier of the apartment.
+        index (int): The index of the image in the sequence of apartment images.
+        error (str): Description of the failure.
+        status_code (int, optional): The HTTP status of the response, if there was one.
+        """
+        now = time.time()
+        # Removed from the server, retrying would not bring it back
+        status = "gone" if status_code in (404, 410) else "failed"
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT attempts FROM images WHERE source = ? AND apartment_id = ? AND "index" = ?',
+                (source, str(apartment_id), index)
+            ).fetchone()
+            attempts = (row[0] or 0) + 1 if row is not None else 1
+            next_attempt_at = now + min(self.backoff * 2 ** (attempts - 1), self.backoff_max)
+            self.connection.execute("""
+                UPDATE images SET status = ?, attempts = ?, error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE source = ? AND apartment_id = ? AND "index" = ?
+            """, (status, attempts, str(error) or type(error).__name__, next_attempt_at, now, source, str(apartment_id), index))
+            self.connection.commit()
+
+    def to_repair(self, images_path: str, retry_now: bool = False) -> list[tuple[str, str, int, str]]:
+        """
+        Returns the images missing from the image storage: pending ones (the run stopped before
+        they were downloaded), failed ones whose backoff is over, and downloaded ones whose file
+        was removed or does not have the recorded size, or one of whose variants was removed when
+        the original was not kept.
+
+        Args:
+        images_path (str): The directory of the images of the ImageStorage.
+        retry_now (bool): Retry the failed images without waiting for their backoff.
+
+        Returns:
+        list[tuple[str, str, int, str]]: (source, apartment_id, index, URL) of the images.
+        """
+        now = time.time()
+        with self.lock:
+            rows = self.connection.execute("""
+                SELECT source, apartment_id, "index", url, path, size, variants, status, attempts, next_attempt_at
+                FROM images WHERE status != 'gone'
+            """).fetchall()
+        images = []
+        for source, apartment_id, index, url, path, size, variants, status, attempts, next_attempt_at in rows:
+            if status == "done" and variants:
+                if all(os.path.exists(variant) for variant in json.loads(variants)):
+                    continue
+            elif status == "done":
+                file_path = os.path.join(images_path, path)
+                if os.path.exists(file_path) and os.path.getsize(file_path) == size:
+                    continue
+            elif status == "failed":
+                if attempts >= self.max_attempts or (next_attempt_at > now and not retry_now):
+                    continue
+            images.append((source, apartment_id, index, url))
+        return images
+
+    def counts(self) -> dict:
+        """
+        Returns the number of images of every status.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT status, COUNT(*) FROM images GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
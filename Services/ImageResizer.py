@@ -0,0 +1,192 @@
+import os
+import queue
+import functools
+import logging
+import threading
+import concurrent.futures
+from PIL import Image
+from Services.ProcessPool import start_process_pool
+
+def resize_image(image_path: str, paths: dict[int, str], quality: int = 90, remove: bool = False) -> int:
+    """
+    Decodes an image file once and writes a square JPEG variant for every size.
+
+    Args:
+    image_path (str): The image file.
+    paths (dict): The file path of the variant of every size, in pixels.
+    quality (int): JPEG quality of the variants.
+    remove (bool): Remove the image file afterwards, e.g. a staged download whose original is not kept.
+
+    Returns:
+    int: The number of bytes written.
+    """
+    try:
+        return __write_variants(image_path, paths, quality)
+    finally:
+        if remove and os.path.exists(image_path):
+            os.unlink(image_path)
+
+def __write_variants(image_path: str, paths: dict[int, str], quality: int) -> int:
+    written = 0
+    with Image.open(image_path) as decoded:
+        # JPEGs are decoded at the smallest scale still larger than the biggest variant, much faster for large photos
+        largest = max(paths)
+        decoded.draft("RGB", (largest, largest))
+        decoded = decoded.convert("RGB")
+        for size, path in paths.items():
+            # Squared like `transforms.Resize((size, size))` in `train_model.py`, which then leaves them as they are
+            variant = decoded.resize((size, size), Image.LANCZOS)
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            variant.save(temporary_path, format = "JPEG", quality = quality)
+            os.replace(temporary_path, path)
+            written += os.path.getsize(path)
+    return written
+
+class ImageResizer:
+    """
+    Writes training sized variants of the images in a pool of processes, so the photos are
+    decoded and resized once when they are saved instead of on every epoch of the training.
+
+    The variant of size `n` of `images_path/source/apartment_id/index.ext` is the JPEG
+    `images_path_n/source/apartment_id/index.jpg`, the same tree as the originals, so it can be
+    given to `train_model.py -images` as is.
+
+    Images are handed over as files and `submit` never waits: a feeder thread passes them to the
+    pool, with at most `max_pending` of them being resized, so a busy pool does not hold back
+    the caller (e.g. the event loop of the downloads) nor keep images in memory.
+    """
+
+    def __init__(self, sizes: tuple = (256,), quality: int = 90, max_workers: int = None, max_pending: int = 256):
+        """
+        Initialize the ImageResizer.
+
+        Args:
+        sizes (tuple): Sides of the square variants, in pixels.
+        quality (int): JPEG quality of the variants.
+        max_workers (int, optional): Number of resizing processes. Defaults to the number of cores.
+        max_pending (int): Images in the pool at the same time, the others wait as paths in a queue.
+        """
+        self.sizes = tuple(sizes)
+        self.quality = quality
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor: concurrent.futures.ProcessPoolExecutor = None
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.jobs = queue.Queue()
+        self.feeder = None
+        self.lock = threading.Lock()
+        self.counters = {"resized": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    @staticmethod
+    def variants_path(images_path: str, size: int) -> str:
+        """
+        Returns the directory of the variants of a size, next to `images_path`.
+        """
+        return images_path.rstrip("/") + f"_{size}/"
+
+    def variant_paths(self, images_path: str, image_name: str) -> dict[int, str]:
+        """
+        Returns the file of the variant of every size of an image.
+
+        Args:
+        images_path (str): The directory of the originals, e.g. `scraping_results/images/`.
+        image_name (str): The path of the image in it, `source/apartment_id/index.ext`.
+        """
+        name = os.path.splitext(image_name)[0] + ".jpg"
+        return {size: self.variants_path(images_path, size) + name for size in self.sizes}
+
+    def start(self):
+        """
+        Starts the worker processes, see `start_process_pool`, and the thread that feeds them.
+        """
+        if self.executor is None:
+            self.executor = start_process_pool(self.max_workers)
+            self.feeder = threading.Thread(target = self.__feed, name = "image-resizer-feeder", daemon = True)
+            self.feeder.start()
+            logging.info(f"Image resizer | started {self.max_workers} processes, sizes {self.sizes}")
+
+    def submit(self, image_path: str, images_path: str, image_name: str, remove: bool = False) -> concurrent.futures.Future:
+        """
+        Schedules the variants of an image file, without waiting.
+
+        Args:
+        image_path (str): The image file, left in place until it is resized.
+        images_path (str): The directory of the originals, e.g. `scraping_results/images/`.
+        image_name (str): The path of the image in it, `source/apartment_id/index.ext`.
+        remove (bool): Remove `image_path` once resized.
+
+        Returns:
+        Future: Resolves to the number of bytes written, see `resize_image`.
+        """
+        self.start()
+        paths = self.variant_paths(images_path, image_name)
+        future = concurrent.futures.Future()
+        self.jobs.put((image_path, paths, remove, image_name, future))
+        return future
+
+    def resize(self, image_path: str, images_path: str, image_name: str) -> int:
+        """
+        Writes the variants of an image file in the pool and waits for them. See `submit`.
+        """
+        return self.submit(image_path, images_path, image_name).result()
+
+    def stats(self) -> dict:
+        """
+        Returns the number of `resized` and `failed` images, the `bytes_in` of their originals
+        and the `bytes_out` of their variants.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"Image resizer | {stats['resized']} resized, {stats['failed']} failed, "
+            f"{stats['bytes_in'] / 1024 ** 2:.1f} MB to {stats['bytes_out'] / 1024 ** 2:.1f} MB"
+        )
+
+    def close(self):
+        """
+        Resizes the submitted images, then stops the pool.
+        """
+        if self.executor is not None:
+            self.jobs.put(None)
+            self.feeder.join()
+            self.executor.shutdown(wait = True)
+            self.executor = None
+            self.log_stats()
+
+    def __feed(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            image_path, paths, remove, image_name, future = job
+            self.pending.acquire()
+            try:
+                size = os.path.getsize(image_path)
+                resized = self.executor.submit(resize_image, image_path, paths, self.quality, remove)
+            except Exception as e:
+                self.pending.release()
+                logging.error(f"Image resizer | {image_name}: {e}")
+                with self.lock:
+                    self.counters["failed"] += 1
+                future.set_exception(e)
+                continue
+            resized.add_done_callback(functools.partial(self.__done, image_name = image_name, size = size, future = future))
+
+    def __done(self, resized: concurrent.futures.Future, image_name: str, size: int, future: concurrent.futures.Future):
+        self.pending.release()
+        try:
+            written = resized.result()
+        except Exception as e:
+            logging.error(f"Image resizer | {image_name}: {e}")
+            with self.lock:
+                self.counters["failed"] += 1
+            future.set_exception(e)
+            return
+        with self.lock:
+            self.counters["resized"] += 1
+            self.counters["bytes_in"] += size
+            self.counters["bytes_out"] += written
+        future.set_result(written)
@@ -0,0 +1,68 @@
+import os
+import logging
+import concurrent.futures
+from Services.ProcessPool import start_process_pool
+
+def parse_apartment(scraper_class, webpage: str, html: bytes) -> tuple[dict, list[str], str]:
+    """
+    Runs an apartment scraper over a page that was already downloaded.
+
+    Args:
+    scraper_class (type): A subclass of ApartmentScraper.
+    webpage (str): The URL the page was downloaded from.
+    html (bytes): The content of the page.
+
+    Returns:
+    tuple: The scraped values, the links of the images and the id of the apartment.
+    """
+    return scraper_class.parse(webpage, html)
+
+class ParseStage:
+    """
+    Parses downloaded pages in a pool of processes, so that parsing is not
+    serialized by the GIL with the threads that download the pages.
+    """
+
+    def __init__(self, max_workers: int = None):
+        """
+        Initialize the ParseStage.
+
+        Args:
+        max_workers (int, optional): Number of parsing processes. Defaults to the number of cores.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor: concurrent.futures.ProcessPoolExecutor = None
+
+    def start(self):
+        """
+        Starts the worker processes, see `start_process_pool`.
+        """
+        if self.executor is None:
+            self.executor = start_process_pool(self.max_workers)
+            logging.info(f"Parse stage | started {self.max_workers} processes")
+
+    def submit(self, scraper_class, webpage: str, html: bytes) -> concurrent.futures.Future:
+        """
+        Schedules the parsing of a page.
+
+        Args:
+        scraper_class (type): A subclass of ApartmentScraper.
+        webpage (str): The URL the page was downloaded from.
+        html (bytes): The content of the page.
+
+        Returns:
+        Future: Resolves to the result of `parse_apartment`.
+        """
+        self.start()
+        return self.executor.submit(parse_apartment, scraper_class, webpage, html)
+
+    def parse(self, scraper_class, webpage: str, html: bytes) -> tuple[dict, list[str], str]:
+        """
+        Parses a page in the pool and waits for the result. See `parse_apartment`.
+        """
+        return self.submit(scraper_class, webpage, html).result()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait = True)
+            self.executor = None
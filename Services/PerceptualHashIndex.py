@@ -0,0 +1,267 @@
+import os
+import sqlite3
+import logging
+import itertools
+import concurrent.futures
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+def __dct_matrix(size: int) -> np.ndarray:
+    k = np.arange(size).reshape(-1, 1)
+    n = np.arange(size).reshape(1, -1)
+    return np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+
+DCT_32 = __dct_matrix(32)
+
+def image_hash(path: str, method: str = "phash") -> int:
+    """
+    Computes a 64 bit perceptual hash of an image file.
+
+    Args:
+    path (str): The image file.
+    method (str): "phash", the signs of the low frequencies of the DCT of the 32x32 grayscale
+        image, robust to resizing and recompression. Or "dhash", the gradients of the 9x8 image, faster.
+
+    Returns:
+    int: The hash, as an unsigned 64 bit integer.
+    """
+    with Image.open(path) as image:
+        # JPEGs are decoded at a reduced scale, much faster for large photos
+        image.draft("L", (64, 64))
+        image = image.convert("L")
+        if method == "dhash":
+            pixels = np.asarray(image.resize((9, 8), Image.LANCZOS), dtype = np.float64)
+            bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+        else:
+            pixels = np.asarray(image.resize((32, 32), Image.LANCZOS), dtype = np.float64)
+            low_frequencies = (DCT_32 @ pixels @ DCT_32.T)[:8, :8].flatten()
+            # The DC term is left out of the median, it only holds the brightness
+            bits = low_frequencies > np.median(low_frequencies[1:])
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def hash_files(paths: list[str], method: str = "phash") -> list[tuple[str, int | None]]:
+    """
+    Hashes a chunk of image files, None for the files that cannot be read.
+    """
+    hashes = []
+    for path in paths:
+        try:
+            hashes.append((path, image_hash(path, method)))
+        except Exception as e:
+            logging.error(f"Perceptual hash | {path}: {e}")
+            hashes.append((path, None))
+    return hashes
+
+class PerceptualHashIndex:
+    """
+    Index of the perceptual hashes of the downloaded images, to find the same photos
+    (resized, recompressed, or cropped a little) in the listings of different sources.
+
+    Hashes are kept in a sqlite database, so only new or modified files are hashed again, in
+    a process pool. Near duplicates are searched with multi-index hashing: the 64 bits are split
+    in `blocks` blocks with a table each, two hashes within `max_distance` bits of each other
+    have at least one block within `max_distance // blocks` bits, so a lookup only checks the
+    buckets of the block values around the query instead of every image.
+    """
+
+    def __init__(self, path: str, method: str = "phash", blocks: int = 4):
+        """
+        Initialize the PerceptualHashIndex with a path for its sqlite database.
+
+        Args:
+        path (str): The file path of the database, created if missing.
+        method (str): "phash" or "dhash", see `image_hash`.
+        blocks (int): Number of blocks of the multi-index, 64 must be a multiple of it.
+        """
+        if 64 % blocks:
+            raise Exception(f"Perceptual hash | 64 bits cannot be split in {blocks} blocks")
+        self.path = path
+        self.method = method
+        self.blocks = blocks
+        self.block_bits = 64 // blocks
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT PRIMARY KEY,
+                source TEXT,
+                apartment_id TEXT,
+                hash INTEGER,
+                size INTEGER,
+                mtime REAL
+            )
+        """)
+        self.connection.commit()
+
+        self.hashes: list[int] = []
+        self.keys: list[tuple[str, str]] = []
+        self.tables: list[dict[int, list[int]]] = []
+
+    def update(self, images_dir: str, workers: int = None, chunk_size: int = 256) -> int:
+        """
+        Hashes the images of `images_dir` (`source/apartment_id/index.ext`) that are new or were
+        modified since they were hashed, and forgets the files that were removed.
+
+        Args:
+        images_dir (str): The directory of the images of an ImageStorage.
+        workers (int, optional): Number of hashing processes. Defaults to the number of cores.
+        chunk_size (int): Number of files sent to a process at once.
+
+        Returns:
+        int: The number of hashed files.
+        """
+        known = {
+            path: (size, mtime)
+            for path, size, mtime in self.connection.execute("SELECT path, size, mtime FROM hashes")
+        }
+        found = {}
+        for directory, _, files in os.walk(images_dir):
+            for file in files:
+                if not file.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(directory, file)
+                stat = os.stat(path)
+                if stat.st_size > 0:
+                    found[path] = (stat.st_size, stat.st_mtime)
+
+        removed = [(path,) for path in known if path not in found]
+        changed = [path for path, signature in found.items() if known.get(path) != signature]
+        logging.info(f"Perceptual hash | {len(changed)} images to hash, {len(removed)} removed")
+
+        chunks = [changed[start:start + chunk_size] for start in range(0, len(changed), chunk_size)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers or os.cpu_count()) as executor:
+            futures = [executor.submit(hash_files, chunk, self.method) for chunk in chunks]
+            for future in concurrent.futures.as_completed(futures):
+                rows = []
+                for path, value in future.result():
+                    if value is None:
+                        continue
+                    source, apartment_id = self.__apartment(images_dir, path)
+                    size, mtime = found[path]
+                    # sqlite integers are signed
+                    rows.append((path, source, apartment_id, value - (1 << 64) if value >= 1 << 63 else value, size, mtime))
+                with self.connection:
+                    self.connection.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", rows)
+        with self.connection:
+            self.connection.executemany("DELETE FROM hashes WHERE path = ?", removed)
+        return len(changed)
+
+    def load(self):
+        """
+        Builds the multi-index tables from the database.
+        """
+        self.hashes, self.keys = [], []
+        self.tables = [{} for _ in range(self.blocks)]
+        rows = self.connection.execute("SELECT source, apartment_id, hash FROM hashes ORDER BY rowid")
+        for position, (source, apartment_id, value) in enumerate(rows):
+            value &= (1 << 64) - 1
+            self.hashes.append(value)
+            self.keys.append((source, apartment_id))
+            for block, table in enumerate(self.tables):
+                table.setdefault(self.__block(value, block), []).append(position)
+        logging.info(f"Perceptual hash | {len(self.hashes)} images indexed")
+
+    def search(self, value: int, max_distance: int = 8) -> list[tuple[int, int]]:
+        """
+        Finds the indexed images within `max_distance` bits of a hash.
+
+        Returns:
+        list: (position, distance) of the matches, positions index `hashes` and `keys`.
+        """
+        radius = max_distance // self.blocks
+        candidates = set()
+        for block, table in enumerate(self.tables):
+            block_value = self.__block(value, block)
+            for flips in range(radius + 1):
+                for bits in itertools.combinations(range(self.block_bits), flips):
+                    probe = block_value
+                    for bit in bits:
+                        probe ^= 1 << bit
+                    candidates.update(table.get(probe, ()))
+        matches = []
+        for position in candidates:
+            distance = (self.hashes[position] ^ value).bit_count()
+            if distance <= max_distance:
+                matches.append((position, distance))
+        return matches
+
+    def clusters(self, max_distance: int = 8, min_shared: int = 2, max_apartments_per_image: int = 5) -> pd.DataFrame:
+        """
+        Groups the apartments that share near duplicate photos, e.g. one flat listed on several sites.
+
+        Args:
+        max_distance (int): Largest Hamming distance between the hashes of the same photo.
+        min_shared (int): Photos two apartments must have in common to be grouped.
+        max_apartments_per_image (int): Photos found in more apartments than this (logos, building
+            renders, stock photos) do not group apartments.
+
+        Returns:
+        DataFrame: `cluster`, `source`, `id`, `sources` (of the cluster) and `shared_images`, for the
+            apartments grouped with at least one other, `cluster` numbered from 0.
+        """
+        if not self.tables:
+            self.load()
+
+        # Photos of an apartment that are found in another one
+        found_in: dict[tuple, int] = {}
+        for position, value in enumerate(self.hashes):
+            apartments = {self.keys[match] for match, _ in self.search(value, max_distance)}
+            if len(apartments) < 2 or len(apartments) > max_apartments_per_image:
+                continue
+            key = self.keys[position]
+            for other in apartments:
+                if other != key:
+                    found_in[(key, other)] = found_in.get((key, other), 0) + 1
+
+        parents: dict[tuple, tuple] = {}
+
+        def find(key):
+            parents.setdefault(key, key)
+            while parents[key] != key:
+                parents[key] = parents[parents[key]]
+                key = parents[key]
+            return key
+
+        shared_images: dict[tuple, int] = {}
+        for (first, second), count in found_in.items():
+            if first > second:
+                continue
+            # Photos in common, counted from the side that has fewer of them
+            count = min(count, found_in.get((second, first), 0))
+            if count >= min_shared:
+                parents[find(first)] = find(second)
+                for key in (first, second):
+                    shared_images[key] = max(shared_images.get(key, 0), count)
+
+        groups: dict[tuple, list] = {}
+        for key in shared_images:
+            groups.setdefault(find(key), []).append(key)
+
+        rows = []
+        for cluster, members in enumerate(sorted(groups.values(), key = lambda members: sorted(members))):
+            sources = ",".join(sorted({source for source, _ in members}))
+            for source, apartment_id in sorted(members):
+                rows.append({
+                    "cluster": cluster,
+                    "source": source,
+                    "id": apartment_id,
+                    "sources": sources,
+                    "shared_images": shared_images[(source, apartment_id)]
+                })
+        return pd.DataFrame(rows, columns = ["cluster", "source", "id", "sources", "shared_images"])
+
+    def close(self):
+        self.connection.close()
+
+    def __block(self, value: int, block: int) -> int:
+        return (value >> (block * self.block_bits)) & ((1 << self.block_bits) - 1)
+
+    @staticmethod
+    def __apartment(images_dir: str, path: str) -> tuple[str, str]:
+        parts = os.path.relpath(path, images_dir).split(os.sep)
+        if len(parts) < 3:
+            return None, None
+        return parts[-3], parts[-2]
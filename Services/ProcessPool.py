@@ -0,0 +1,23 @@
+import os
+import multiprocessing
+import concurrent.futures
+
+def start_process_pool(max_workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Starts a pool of processes forked from the current one, where the start method exists:
+    spawned processes would import and run the calling script again. All of them are started
+    before it returns, so it should be called before any other thread is started.
+
+    Args:
+    max_workers (int): Number of processes.
+
+    Returns:
+    ProcessPoolExecutor: The started pool.
+    """
+    mp_context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers = max_workers, mp_context = mp_context)
+    # With fork, all the processes are launched by the first submission
+    executor.submit(os.getpid).result()
+    return executor
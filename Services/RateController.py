@@ -0,0 +1,221 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+
+class RateController:
+    """
+    Adaptive limit of the requests in flight to every host (one host per source), with
+    additive increase and multiplicative decrease (AIMD), like TCP congestion control.
+
+    Every healthy response raises the limit of its host by `increase / limit`, so about
+    `increase` per round of requests. A 429, a 5xx, a connection error, a blocked page
+    (`penalize`) or a latency over `latency_tolerance` times the baseline cuts it by
+    `decrease_factor`, at most once per round trip, so one burst of errors counts once.
+    Latencies are only taken from full (200) responses, so fast answers like 304 revalidations
+    do not lower the baseline, which is the best latency of the last one or two `baseline_window`.
+    Blocked pages also pause the host, for longer after every consecutive one.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 2,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        increase: float = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 3.0,
+        baseline_window: float = 60,
+        penalty_base: float = 30,
+        penalty_max: float = 600
+    ):
+        """
+        Initialize the RateController.
+
+        Args:
+        initial_limit (float): Requests in flight allowed to a host before anything is known about it.
+        min_limit (float): Lowest limit, at least one request is always allowed.
+        max_limit (float): Highest limit.
+        increase (float): Growth of the limit per round of healthy requests.
+        decrease_factor (float): Factor the limit is multiplied by on congestion.
+        latency_tolerance (float): Latency, relative to the baseline of the host, above which the host counts as congested.
+        baseline_window (float): Seconds after which the best latency of the host is forgotten, so the baseline follows the host.
+        penalty_base (float): Pause of a host after a blocked page, in seconds, doubled for every consecutive one.
+        penalty_max (float): Longest pause.
+        """
+        self.initial_limit = initial_limit
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.baseline_window = baseline_window
+        self.penalty_base = penalty_base
+        self.penalty_max = penalty_max
+
+        self.hosts: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+
+    def __host(self, host: str) -> dict:
+        state = self.hosts.get(host)
+        if state is None:
+            state = {
+                "limit": float(self.initial_limit),
+                "in_flight": 0,
+                "paused_until": 0.0,
+                "penalties": 0,
+                "last_decrease": 0.0,
+                "latency": None,
+                # Best latencies of the current and of the previous baseline window
+                "best_latency": None,
+                "previous_best_latency": None,
+                "baseline_start": time.monotonic(),
+                "requests": 0,
+                "decreases": 0,
+                "window_start": time.monotonic(),
+                "window_count": 0,
+                "rate": 0.0
+            }
+            self.hosts[host] = state
+        return state
+
+    def __can_start(self, state: dict) -> bool:
+        return state["in_flight"] < int(state["limit"]) and time.monotonic() >= state["paused_until"]
+
+    def acquire(self, host: str):
+        """
+        Waits until a request to the host is allowed. Must be followed by `release`.
+        """
+        with self.condition:
+            state = self.__host(host)
+            while not self.__can_start(state):
+                pause = state["paused_until"] - time.monotonic()
+                self.condition.wait(timeout = pause if pause > 0 else None)
+            state["in_flight"] += 1
+
+    def try_acquire(self, host: str) -> bool:
+        """
+        Takes a request slot of the host if one is free, without waiting.
+        """
+        with self.lock:
+            state = self.__host(host)
+            if not self.__can_start(state):
+                return False
+            state["in_flight"] += 1
+            return True
+
+    async def acquire_async(self, host: str, poll_interval: float = 0.05):
+        """
+        asyncio counterpart of `acquire`.
+        """
+        while not self.try_acquire(host):
+            await asyncio.sleep(poll_interval)
+
+    def release(self, host: str, latency: float, status: int = None):
+        """
+        Gives the slot back and adapts the limit of the host to the outcome of the request.
+
+        Args:
+        host (str): The host of the request.
+        latency (float): Duration of the request in seconds.
+        status (int, optional): Status code of the response, None if there was none.
+        """
+        with self.condition:
+            state = self.__host(host)
+            state["in_flight"] -= 1
+            state["requests"] += 1
+            self.__count(state)
+
+            congested = status is None or status == 429 or status >= 500
+            reason = f"status {status}" if status is not None else "no response"
+            if status == 200:
+                baseline = self.__baseline(state, latency)
+                state["latency"] = latency if state["latency"] is None else 0.8 * state["latency"] + 0.2 * latency
+                if state["latency"] > baseline * self.latency_tolerance:
+                    congested = True
+                    reason = f"latency {state['latency']:.2f}s over {baseline:.2f}s"
+
+            if congested:
+                self.__decrease(host, state, reason)
+            else:
+                state["penalties"] = 0
+                state["limit"] = min(self.max_limit, state["limit"] + self.increase / state["limit"])
+            self.condition.notify_all()
+
+    def penalize(self, host: str) -> float:
+        """
+        Slows a host down after it served a blocked page, e.g. a captcha.
+
+        Returns:
+        float: Seconds the host is paused for, to wait before retrying.
+        """
+        with self.condition:
+            state = self.__host(host)
+            self.__decrease(host, state, "blocked page", force = True)
+            pause = min(self.penalty_max, self.penalty_base * (2 ** state["penalties"]))
+            pause = random.uniform(pause / 2, pause)
+            state["penalties"] += 1
+            state["paused_until"] = max(state["paused_until"], time.monotonic() + pause)
+            self.condition.notify_all()
+            return pause
+
+    def __baseline(self, state: dict, latency: float) -> float:
+        """
+        Records the latency of a full response and returns the best one of the last one or two windows.
+        """
+        now = time.monotonic()
+        if now - state["baseline_start"] >= self.baseline_window:
+            state["previous_best_latency"] = state["best_latency"]
+            state["best_latency"] = None
+            state["baseline_start"] = now
+        state["best_latency"] = latency if state["best_latency"] is None else min(state["best_latency"], latency)
+        if state["previous_best_latency"] is None:
+            return state["best_latency"]
+        return min(state["best_latency"], state["previous_best_latency"])
+
+    def __decrease(self, host: str, state: dict, reason: str, force: bool = False):
+        now = time.monotonic()
+        round_trip = state["latency"] or 1.0
+        if not force and now - state["last_decrease"] < round_trip:
+            return
+        state["last_decrease"] = now
+        state["decreases"] += 1
+        state["limit"] = max(self.min_limit, state["limit"] * self.decrease_factor)
+        logging.info(f"{host} | {reason}, limit lowered to {state['limit']:.1f} requests in flight")
+
+    def __count(self, state: dict):
+        # Requests per second over windows of 10 seconds
+        now = time.monotonic()
+        state["window_count"] += 1
+        elapsed = now - state["window_start"]
+        if elapsed >= 10:
+            state["rate"] = state["window_count"] / elapsed
+            state["window_start"] = now
+            state["window_count"] = 0
+
+    def stats(self) -> dict[str, dict]:
+        """
+        Returns the current `limit`, `in_flight`, `rate` (requests per second), mean `latency`,
+        `requests` and `decreases` of every host.
+        """
+        with self.lock:
+            return {
+                host: {
+                    "limit": state["limit"],
+                    "in_flight": state["in_flight"],
+                    "rate": state["rate"],
+                    "latency": state["latency"] or 0.0,
+                    "requests": state["requests"],
+                    "decreases": state["decreases"]
+                }
+                for host, state in self.hosts.items()
+            }
+
+    def log_stats(self):
+        for host, stats in self.stats().items():
+            logging.info(
+                f"{host} | limit {stats['limit']:.1f} in flight, {stats['rate']:.1f} requests/s, "
+                f"latency {stats['latency']:.2f}s, {stats['requests']} requests, {stats['decreases']} slowdowns"
+            )
@@ -1,40 +1,76 @@
-import pandas as pd
+import os
+import json
+import time
+import logging
 import threading
+import pandas as pd
 
 class ScrapingLogService:
     """
     A service for logging the results of web scraping operations.
 
+    The rows are kept in memory with an index by webpage, so every check and update is O(1).
+    Changes are appended as events to a journal next to the CSV log (`<path>.journal`),
+    written by a background thread in groups, at most `commit_interval` seconds apart.
+    The journal is periodically compacted into the CSV log, which keeps its format,
+    and replayed over it when the service starts after a run that did not close it.
+    Webpages that were being scraped when the previous run stopped (started, with no outcome)
+    are removed when the log is loaded, so that they are scraped again.
+
     Attributes:
     path (str): The file path for the CSV log.
-    log_df (DataFrame): A pandas DataFrame to hold log data.
-    flash_interval (int): Counter for saving the DataFrame to CSV.
+    journal_path (str): The file path for the journal of the changes not compacted yet.
+    rows (list[dict]): The rows of the log, in the order they were added.
+    index (dict[str, list[dict]]): The rows of every webpage.
     lock (threading.Lock): A lock for thread-safe operations.
     """
 
-    
-    def __init__(self, path):
+    columns = ["source", "webpage", "success", "error", "skipped"]
+
+    def __init__(self, path, commit_interval = 0.5, compact_every = 50000, compact_interval = 300):
         """
         Initialize the ScrapingLogService with a path for the log file.
 
         Args:
         path (str): The file path for the CSV log.
+        commit_interval (float): Longest time in seconds a change waits before being written to the journal.
+        compact_every (int): Number of journal events after which the journal is compacted into the CSV log.
+        compact_interval (float): Longest time in seconds between two compactions, while there are changes.
         """
-        
+
         self.path = path
-        try:
-            self.log_df = pd.read_csv(path, index_col=0)
-        except:
-            self.log_df = pd.DataFrame(columns=[
-                "source",
-                "webpage",
-                "success",
-                "error",
-                "skipped"
-            ])
-        self.flash_interval = 0
+        self.journal_path = path + ".journal"
+        self.commit_interval = commit_interval
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+
+        self.rows: list[dict] = []
+        self.index: dict[str, list[dict]] = {}
         self.lock = threading.Lock()
-        
+        # Held while writing files, always taken before `lock`
+        self.io_lock = threading.Lock()
+        self.pending_events: list[str] = []
+        self.journal_events = 0
+        self.last_compaction = time.monotonic()
+        self.closed = False
+
+        unfinished = self.__load()
+        if self.journal_events or unfinished:
+            self.save()
+        self.journal = open(self.journal_path, "a", encoding = "utf-8")
+
+        self.wake = threading.Event()
+        self.flusher = threading.Thread(target = self.__flush_loop, name = "scraping-log-journal", daemon = True)
+        self.flusher.start()
+
+    @property
+    def log_df(self) -> pd.DataFrame:
+        """
+        The log as a DataFrame, in the format of the CSV log.
+        """
+        with self.lock:
+            return pd.DataFrame([dict(row) for row in self.rows], columns = self.columns)
+
     def did_scrape(self, webpage):
         """
         Check if a webpage has been successfully scraped before.
@@ -46,14 +82,8 @@ class ScrapingLogService:
         bool: True if the webpage was successfully scraped, False otherwise.
         """
         with self.lock:
-            # Check if the webpage exists in the log and if it was successfully scraped
-            predicate = self.log_df['webpage'] == webpage
-            same_webpage = self.log_df[predicate]
-            if not same_webpage.empty:
-                return True
-            else:
-                return False
-        
+            return webpage in self.index
+
     def start(self, source, webpage):
         """
         Log the start of a scraping operation for a webpage.
@@ -62,17 +92,33 @@ class ScrapingLogService:
         source (str): The source identifier of the scraping operation.
         webpage (str): The URL of the webpage being scraped.
         """
-        new_row = pd.DataFrame({
-            "source": [source],
-            "webpage": [webpage],
-            "success": [None],
-            "error": [None],
-            "skipped": [None]
-        })
-        
         with self.lock:
-            self.log_df = pd.concat([self.log_df, new_row], ignore_index=True)
-        
+            self.__record({"op": "add", "source": source, "webpage": webpage, "skipped": None})
+
+    def claim(self, source, webpage, rescrape = False):
+        """
+        Atomically check that a webpage was not scraped yet and log the start of its scraping.
+        Used by concurrent workers, so that two of them never scrape the same webpage.
+
+        Args:
+        source (str): The source identifier of the scraping operation.
+        webpage (str): The URL of the webpage to claim.
+        rescrape (bool): Claim the webpage even if it was scraped before, e.g. because it changed since.
+            It is still not claimed while it is being scraped.
+
+        Returns:
+        bool: True if the webpage was claimed by the caller, False if it is already in the log.
+        """
+        with self.lock:
+            rows = self.index.get(webpage)
+            if rows:
+                if not rescrape or any(row["success"] is None for row in rows):
+                    return False
+                self.__record({"op": "set", "webpage": webpage, "success": None, "error": None})
+                return True
+            self.__record({"op": "add", "source": source, "webpage": webpage, "skipped": None})
+            return True
+
     def success(self, source, webpage):
         """
         Log the success of a scraping operation.
@@ -82,9 +128,8 @@ class ScrapingLogService:
         webpage (str): The URL of the successfully scraped webpage.
         """
         with self.lock:
-            self.log_df.loc[(self.log_df['webpage'] == webpage), 'success'] = True
-            self.__increment_and_save()
-        
+            self.__record({"op": "set", "webpage": webpage, "success": True})
+
     def error(self, source, webpage, error):
         """
         Log an error in a scraping operation.
@@ -95,8 +140,7 @@ class ScrapingLogService:
         error (str): The error message.
         """
         with self.lock:
-            self.log_df.loc[(self.log_df['webpage'] == webpage), ['success', 'error']] = [False, error]
-            self.__increment_and_save()
+            self.__record({"op": "set", "webpage": webpage, "success": False, "error": str(error)})
 
     def skipped(self, source, webpage):
         """
@@ -106,28 +150,142 @@ class ScrapingLogService:
         source (str): The source identifier of the scraping operation.
         webpage (str): The URL of the skipped webpage.
         """
-        new_row = pd.DataFrame({
-            "source": [source],
-            "webpage": [webpage],
-            "success": [None],
-            "error": [None],
-            "skipped": [True]
-        })
-        
         with self.lock:
-            self.log_df = pd.concat([self.log_df, new_row], ignore_index=True)
+            self.__record({"op": "add", "source": source, "webpage": webpage, "skipped": True})
 
-    def __increment_and_save(self):
+    def flush(self):
         """
-        Increment the save counter and save the log if necessary.
+        Write the changes waiting for the next group commit to the journal.
         """
-        self.flash_interval += 1
-        if self.flash_interval > 0:
-            self.flash_interval = 0
-            self.save()
-        
+        with self.io_lock:
+            with self.lock:
+                events = self.pending_events
+                self.pending_events = []
+            if events and not self.journal.closed:
+                self.journal.write("".join(events))
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+
     def save(self):
         """
-        Save the current state of the log to a CSV file.
+        Compact the log: save its current state to the CSV file and empty the journal.
+        """
+        with self.io_lock:
+            with self.lock:
+                rows = [dict(row) for row in self.rows]
+                # The waiting events are part of the rows saved now
+                self.pending_events = []
+                self.journal_events = 0
+                self.last_compaction = time.monotonic()
+
+            # Replaced at once, so readers (e.g. `prepare_data.py`) never see a partial file
+            temporary_path = self.path + ".tmp"
+            pd.DataFrame(rows, columns = self.columns).to_csv(temporary_path)
+            os.replace(temporary_path, self.path)
+            journal = getattr(self, "journal", None)
+            if journal is not None and not journal.closed:
+                journal.truncate(0)
+            else:
+                open(self.journal_path, "w").close()
+
+    def close(self):
+        """
+        Write the remaining changes and compact the journal into the CSV log.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.flusher.join()
+        self.flush()
+        if self.journal_events:
+            self.save()
+        self.journal.close()
+
+    def __record(self, event: dict):
+        """
+        Apply an event to the rows and queue it for the journal. Called with the lock held.
         """
-        self.log_df.to_csv(self.path)
+        self.__apply(event)
+        self.pending_events.append(json.dumps(event) + "\n")
+        self.journal_events += 1
+        if len(self.pending_events) >= 1000:
+            self.wake.set()
+
+    def __apply(self, event: dict):
+        if event["op"] == "add":
+            row = {
+                "source": event["source"],
+                "webpage": event["webpage"],
+                "success": None,
+                "error": None,
+                "skipped": event["skipped"]
+            }
+            self.rows.append(row)
+            self.index.setdefault(row["webpage"], []).append(row)
+        else:
+            # Only the columns in the event are set
+            for row in self.index.get(event["webpage"], []):
+                for column in ("success", "error"):
+                    if column in event:
+                        row[column] = event[column]
+
+    def __load(self) -> int:
+        """
+        Read the CSV log, then replay the journal of the previous run over it, and remove
+        the rows left without an outcome. Returns the number of removed rows.
+        """
+        try:
+            log_df = pd.read_csv(self.path, index_col=0, low_memory = False)
+        except:
+            log_df = pd.DataFrame(columns = self.columns)
+        for record in log_df.to_dict("records"):
+            row = {column: self.__value(record.get(column)) for column in self.columns}
+            self.rows.append(row)
+            self.index.setdefault(row["webpage"], []).append(row)
+
+        if os.path.exists(self.journal_path):
+            self.__replay()
+
+        # Started by a run that stopped before their outcome, not claimed by anyone anymore
+        unfinished = [row for row in self.rows if row["success"] is None and not row["skipped"]]
+        if unfinished:
+            self.rows = [row for row in self.rows if row["success"] is not None or row["skipped"]]
+            self.index = {}
+            for row in self.rows:
+                self.index.setdefault(row["webpage"], []).append(row)
+            logging.info(f"Scraping log | {len(unfinished)} webpages without an outcome will be scraped again")
+        return len(unfinished)
+
+    def __replay(self):
+        with open(self.journal_path, encoding = "utf-8") as journal:
+            for line in journal:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # The last line of a run that died while writing it
+                    logging.warning(f"Scraping log | ignored an incomplete journal line: {line[:100]}")
+                    continue
+                self.__apply(event)
+                self.journal_events += 1
+        if self.journal_events:
+            logging.info(f"Scraping log | replayed {self.journal_events} journal events")
+
+    @staticmethod
+    def __value(value):
+        if isinstance(value, float) and pd.isna(value):
+            return None
+        return value
+
+    def __flush_loop(self):
+        while not self.closed:
+            self.wake.wait(timeout = self.commit_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+                if self.journal_events >= self.compact_every or (
+                    self.journal_events and time.monotonic() - self.last_compaction >= self.compact_interval
+                ):
+                    self.save()
+            except Exception as e:
+                logging.error(f"Scraping log | failed to write the journal: {e}")
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+
+class SitemapLastmodService:
+    """
+    Persists the `lastmod` of every URL listed in the sitemaps, and the `lastmod` it had when it
+    was last scraped, so that a crawl only queues the URLs that are new or changed since.
+
+    The `lastmod` of the sitemaps of a sitemap index is kept as well, so that the unchanged
+    ones are not downloaded again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the SitemapLastmodService with a path for its sqlite database.
+
+        Args:
+        path (str): The file path of the database, created if missing.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread = False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        # `done_lastmod` is the lastmod ('' if there is none) at the last successful scrape
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                lastmod TEXT,
+                done_lastmod TEXT
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS sitemaps (
+                url TEXT PRIMARY KEY,
+                lastmod TEXT
+            )
+        """)
+        self.connection.commit()
+
+    def see(self, entries: list[tuple[str, str]]):
+        """
+        Records the URLs read from a sitemap, with their current lastmod.
+
+        Args:
+        entries (list[tuple[str, str]]): (URL, lastmod) pairs, lastmod may be None.
+        """
+        with self.lock:
+            self.connection.executemany("""
+                INSERT INTO urls (url, lastmod) VALUES (?, ?)
+                ON CONFLICT (url) DO UPDATE SET lastmod = excluded.lastmod
+            """, entries)
+            self.connection.commit()
+
+    def pending(self) -> list[str]:
+        """
+        Returns the URLs that were never scraped, or whose lastmod changed since they were.
+        """
+        with self.lock:
+            rows = self.connection.execute("""
+                SELECT url FROM urls
+                WHERE done_lastmod IS NULL OR done_lastmod != COALESCE(lastmod, '')
+            """).fetchall()
+        return [url for (url,) in rows]
+
+    def is_update(self, url: str) -> bool:
+        """
+        Check if a URL was scraped before and changed since.
+
+        Args:
+        url (str): The URL to check.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT lastmod, done_lastmod FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None or row[1] is None:
+            return False
+        return row[1] != (row[0] or '')
+
+    def mark_done(self, url: str):
+        """
+        Records that a URL was scraped at its current lastmod.
+
+        Args:
+        url (str): The scraped URL.
+        """
+        with self.lock:
+            self.connection.execute("UPDATE urls SET done_lastmod = COALESCE(lastmod, '') WHERE url = ?", (url,))
+            self.connection.commit()
+
+    def sitemap_lastmod(self, url: str) -> str | None:
+        """
+        Returns the lastmod a sitemap had when it was last read completely, None if it never was.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT lastmod FROM sitemaps WHERE url = ?", (url,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_sitemap_lastmod(self, url: str, lastmod: str):
+        with self.lock:
+            self.connection.execute("""
+                INSERT INTO sitemaps (url, lastmod) VALUES (?, ?)
+                ON CONFLICT (url) DO UPDATE SET lastmod = excluded.lastmod
+            """, (url, lastmod))
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,172 @@
+import sys
+import math
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that do not change the page
+NOISE_QUERY_PARAMETERS = {"fbclid", "gclid", "yclid", "ref", "from", "_ga"}
+NOISE_QUERY_PREFIXES = ("utm_",)
+
+# Language prefixes of the paths, e.g. /en/apartment-d1 and /ru/apartment-d1 are the same listing
+LANGUAGE_PREFIXES = {"en", "ru", "hy", "am"}
+
+def canonicalize(url: str) -> str:
+    """
+    Returns the key identifying the page of a URL: https, lowercase host without `www.`,
+    no language prefix, no trailing slash, no fragment and no tracking parameters,
+    the other query parameters sorted.
+
+    The key is only meant to compare URLs, the page is still fetched from the original URL.
+
+    Args:
+    url (str): An absolute URL.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host.endswith(":443") or host.endswith(":80"):
+        host = host.rsplit(":", 1)[0]
+
+    segments = [segment for segment in parts.path.split("/") if segment]
+    if segments and segments[0].lower() in LANGUAGE_PREFIXES:
+        segments = segments[1:]
+    path = "/" + "/".join(segments)
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values = True)
+        if key.lower() not in NOISE_QUERY_PARAMETERS and not key.lower().startswith(NOISE_QUERY_PREFIXES)
+    )
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+class BloomFilter:
+    """
+    Fixed-size set membership with false positives, about 2.4 MB per million items at a 1e-4 error rate.
+    Not thread safe, `URLFrontier` locks around it.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Args:
+        capacity (int): Number of items the error rate holds for.
+        error_rate (float): Probability that an item never added is reported as added.
+        """
+        self.bit_count = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+
+    def __positions(self, item: str):
+        # Double hashing, k positions out of two 64 bit hashes
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size = 16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.bit_count
+
+    def add(self, item: str) -> bool:
+        """
+        Adds an item.
+
+        Returns:
+        bool: True if it was (probably) added before.
+        """
+        present = True
+        for position in self.__positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+    def __contains__(self, item: str) -> bool:
+        for position in self.__positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def size_bytes(self) -> int:
+        return len(self.bits)
+
+class URLFrontier:
+    """
+    The detail pages claimed during a run, shared by all pipelines, so that a page listed
+    by two pipelines (or twice by one) is scraped once, whatever the form of its URL.
+
+    URLs are compared by `canonicalize`. With `exact = False` the claimed URLs are kept in
+    a Bloom filter of bounded size, so a small fraction (`error_rate`) of new URLs may be
+    taken for claimed ones and skipped. With `exact = True` 64 bit hashes are kept in a set,
+    without false positives but with about 100 bytes per URL.
+    """
+
+    def __init__(self, capacity: int = 5_000_000, error_rate: float = 1e-4, exact: bool = False):
+        """
+        Initialize the URLFrontier.
+
+        Args:
+        capacity (int): Expected number of URLs of a run, sizes the Bloom filter.
+        error_rate (float): False positive rate of the Bloom filter at `capacity` URLs.
+        exact (bool): Keep hashes in a set instead of a Bloom filter.
+        """
+        self.exact = exact
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        if exact:
+            self.claimed_hashes = set()
+        else:
+            self.bloom_filter = BloomFilter(capacity, error_rate)
+        self.claimed = 0
+        self.duplicates = 0
+
+    def claim(self, url: str) -> bool:
+        """
+        Atomically claims the page of a URL for the caller.
+
+        Args:
+        url (str): The URL of the page.
+
+        Returns:
+        bool: True if the page was not claimed before during this run.
+        """
+        key = canonicalize(url)
+        with self.lock:
+            if self.exact:
+                key_hash = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size = 8).digest(), "little")
+                present = key_hash in self.claimed_hashes
+                self.claimed_hashes.add(key_hash)
+            else:
+                present = self.bloom_filter.add(key)
+
+            if present:
+                self.duplicates += 1
+                return False
+            self.claimed += 1
+            if self.claimed == self.capacity + 1 and not self.exact:
+                logging.warning(f"URL frontier | over its capacity of {self.capacity} URLs, false positives will grow")
+            return True
+
+    def stats(self) -> dict:
+        """
+        Returns the number of `claimed` and `duplicates` URLs and the `bytes` used by the frontier.
+        """
+        with self.lock:
+            if self.exact:
+                # The set and the int objects it holds
+                size = sys.getsizeof(self.claimed_hashes) + len(self.claimed_hashes) * 32
+            else:
+                size = self.bloom_filter.size_bytes()
+            return {
+                "claimed": self.claimed,
+                "duplicates": self.duplicates,
+                "bytes": size
+            }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"URL frontier | {stats['claimed']} URLs claimed, {stats['duplicates']} duplicates skipped, "
+            f"{stats['bytes'] / 1024 ** 2:.1f} MB"
+        )
@@ -1,5 +1,18 @@
 from .ImageLoader import ImageLoader
+from .ImageDownloadService import ImageDownloadService
+from .ImageManifest import ImageManifest
 from .GeoService import GeoService
 from .AddressToCoordinateConverter import AddressToCoordinateConverter
 from .MapFeatureAggregator import MapFeatureAggregator
-from .ScrapingLogService import ScrapingLogService
\ No newline at end of file
+from .ScrapingLogService import ScrapingLogService
+from .SitemapLastmodService import SitemapLastmodService
+from .URLFrontier import URLFrontier
+from .CrawlQueue import CrawlQueue
+from .HTTPCache import HTTPCache
+from .RateController import RateController
+from .HTTPClient import HTTPClient
+from .AsyncHTTPClient import AsyncHTTPClient
+from .ParseStage import ParseStage
+from .HTMLParser import HTMLParser
+from .PerceptualHashIndex import PerceptualHashIndex
+from .ImageResizer import ImageResizer
\ No newline at end of file
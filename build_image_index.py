@@ -0,0 +1,33 @@
+import os
+import logging
+import argparse
+
+from Services.PerceptualHashIndex import PerceptualHashIndex
+
+# Hashes the downloaded images and groups the apartments that share photos,
+# e.g. the same flat listed on several sites. `prepare_data.py` keeps one
+# apartment of every group.
+
+parser = argparse.ArgumentParser(description='Image index arguments')
+parser.add_argument('-images_dir', type=str, default='scraping_results/images', help='Directory of the images of the apartments')
+parser.add_argument('-index', type=str, default='scraping_results/image_hashes.sqlite', help='Database of the image hashes, updated incrementally')
+parser.add_argument('-output', type=str, default='scraping_results/apartment_clusters.csv', help='Table of the apartment clusters')
+parser.add_argument('-method', type=str, default='phash', help='phash | dhash')
+parser.add_argument('-workers', type=int, default=os.cpu_count(), help='Number of hashing processes')
+parser.add_argument('-max_distance', type=int, default=8, help='Largest Hamming distance between the hashes of the same photo')
+parser.add_argument('-min_shared', type=int, default=2, help='Photos two apartments must have in common to be grouped')
+args = parser.parse_args()
+
+logging.basicConfig(level = logging.INFO)
+
+index = PerceptualHashIndex(args.index, method = args.method)
+hashed = index.update(args.images_dir, workers = args.workers)
+print(f"Hashed {hashed} new or modified images")
+
+clusters = index.clusters(max_distance = args.max_distance, min_shared = args.min_shared)
+clusters.to_csv(args.output, index = False)
+index.close()
+
+cross_source = clusters[clusters["sources"].str.contains(",")]
+print(f"{clusters['cluster'].nunique()} clusters of {len(clusters)} apartments, {cross_source['cluster'].nunique()} across sources")
+print(f"Saved to {args.output}")
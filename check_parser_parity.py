@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import logging
+import argparse
+
+from ConcreteScrapers.Bars.BarsApartmentScraper import BarsApartmentScraper
+from ConcreteScrapers.Bnakaran.BnakaranApartmentScraper import BnakaranApartmentScraper
+from ConcreteScrapers.MyRealty.MyRealtyApartmentScraper import MyRealtyApartmentScraper
+from Services import HTMLParser
+
+# Checks that every parser backend scrapes the same values as a full `html.parser`
+# parse of saved detail pages, and reports the parse time per page of each backend.
+#
+# The pages are expected as <pages_dir>/<source>/<any name>.html, e.g.
+# pages/bnakaran/apartment-d1234.html
+
+parser = argparse.ArgumentParser(description='Parser parity arguments')
+parser.add_argument('-pages_dir', type=str, help='Directory with saved pages, one subdirectory per source')
+parser.add_argument('-backends', type=str, default=",".join(HTMLParser.BACKENDS), help='Comma separated backends to check')
+args = parser.parse_args()
+
+if args.pages_dir is None:
+    print("Provide pages directory: -pages_dir")
+    exit()
+
+logging.basicConfig(level = logging.CRITICAL)
+scrapers = {
+    scraper.source_identifier(): scraper
+    for scraper in [BarsApartmentScraper, BnakaranApartmentScraper, MyRealtyApartmentScraper]
+}
+backends = args.backends.split(",")
+
+def scrape(scraper_class, webpage, html):
+    try:
+        return scraper_class.parse(webpage, html)[:2]
+    except Exception as e:
+        return f"raised {type(e).__name__}: {e}"
+
+timings = {backend: [] for backend in backends}
+mismatches = 0
+page_count = 0
+
+for source in sorted(os.listdir(args.pages_dir)):
+    scraper_class = scrapers.get(source)
+    source_dir = os.path.join(args.pages_dir, source)
+    if scraper_class is None or not os.path.isdir(source_dir):
+        print(f"Skipping {source_dir}, no scraper for it")
+        continue
+
+    # The reference parses the whole page, without targets
+    reference_class = type(scraper_class.__name__, (scraper_class,), {"parse_targets": None})
+
+    for file_name in sorted(os.listdir(source_dir)):
+        if not file_name.endswith(".html"):
+            continue
+        webpage = os.path.join(source_dir, file_name)
+        with open(webpage, "rb") as file:
+            html = file.read()
+        page_count += 1
+
+        expected = scrape(reference_class, webpage, html)
+        for backend in backends:
+            HTMLParser.use(backend)
+            start = time.perf_counter()
+            result = scrape(scraper_class, webpage, html)
+            timings[backend].append(time.perf_counter() - start)
+            HTMLParser.use("html.parser")
+
+            if result != expected:
+                mismatches += 1
+                print(f"MISMATCH | {backend} | {webpage}")
+                print(f"    expected: {expected}")
+                print(f"    got:      {result}")
+
+print(f"Checked {page_count} pages")
+baseline = timings.get("html.parser")
+for backend, times in timings.items():
+    if not times:
+        continue
+    mean = sum(times) / len(times)
+    line = f"{backend:>12} | {mean * 1000:.1f} ms per page"
+    if baseline and backend != "html.parser":
+        line += f" | x{(sum(baseline) / len(baseline)) / mean:.1f} faster than html.parser"
+    print(line)
+
+if mismatches:
+    print(f"{mismatches} mismatches")
+    sys.exit(1)
@@ -0,0 +1,33 @@
+import os
+import argparse
+
+from ConcreteStorages import ImageStorage
+
+# Moves the images saved with the `paths` layout into the content addressed layout:
+# every distinct image is stored once and the apartment paths become hardlinks to it.
+
+parser = argparse.ArgumentParser(description='Image deduplication arguments')
+parser.add_argument('-images_dir', type=str, default='scraping_results/images', help='Directory of the images of the apartments')
+parser.add_argument('-objects_dir', type=str, default=None, help='Directory of the distinct images, next to the images by default')
+args = parser.parse_args()
+
+images_path = args.images_dir.rstrip("/") + "/"
+image_storage = ImageStorage(
+    images_path = images_path,
+    image_error_log_path = os.path.join(os.path.dirname(images_path.rstrip("/")), "image_error_log.jsonl"),
+    content_addressed = True,
+    objects_path = args.objects_dir.rstrip("/") + "/" if args.objects_dir else None
+)
+
+for directory, _, files in os.walk(images_path):
+    for file in files:
+        if file.endswith(".tmp"):
+            continue
+        path = os.path.join(directory, file)
+        with open(path, 'rb') as f:
+            image = f.read()
+        image_storage.save_image(image, os.path.relpath(path, images_path))
+
+stats = image_storage.stats()
+print(f"{stats['images']} images, {stats['distinct']} distinct, dedupe ratio {stats['dedupe_ratio']:.2f}")
+print(f"{stats['bytes_saved'] / 1024 ** 2:.1f} MB saved")
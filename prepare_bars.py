@@ -3,6 +3,7 @@ import re
 import ast
 import pandas as pd
 from utils.dummies import dummify_columns
+from utils.reading import read_apartments
 
 def prepare_bars(
     raw_data_dir,
@@ -11,14 +12,14 @@ def prepare_bars(
     bars_condition_mapping,
     bars_feature_mapping,
     common_features,
-    skip_geo = False
+    skip_geo = False,
+    changed_since = None
     ):
     # Bars
     # Basic Cleaning
     print("Preparing Bars...")
-    bars = pd.read_csv(raw_data_dir)
+    bars = read_apartments(raw_data_dir, list_columns = ["facilities"], source = "bars", changed_since = changed_since)
     bars = bars.dropna(axis = 1, how="all") # remove all NaN columns 
-    bars['facilities'] = bars['facilities'].apply(ast.literal_eval)
 
     print("Basic cleaning...")
     new_buildings = (bars["building_type"] == "New building") & (bars["condition"] == "Without renovation")
@@ -3,6 +3,7 @@ import re
 import ast
 import pandas as pd
 from utils.dummies import dummify_columns
+from utils.reading import read_apartments
 
 def prepare_bnakaran(
     raw_data_dir,
@@ -11,14 +12,19 @@ def prepare_bnakaran(
     bnakaran_condition_mapping,
     bnakaran_feature_mapping,
     common_features,
-    skip_geo = False
+    skip_geo = False,
+    changed_since = None
 ):
     # Bnakaran
     print("Preparing Bnakaran...")
-    bnakaran = pd.read_csv(raw_data_dir)
+    bnakaran = read_apartments(
+        raw_data_dir,
+        list_columns = ["additional_features"],
+        map_columns = ["room_details"],
+        source = "bnakaran",
+        changed_since = changed_since
+    )
     bnakaran = bnakaran.dropna(axis = 1, how="all") # remove all NaN columns 
-    bnakaran['room_details'] = bnakaran['room_details'].apply(ast.literal_eval)
-    bnakaran['additional_features'] = bnakaran['additional_features'].apply(ast.literal_eval)
 
     print("Basic cleaning...")
     bnakaran["new_building"] = bnakaran["webpage"].str\
@@ -1,4 +1,5 @@
 
+import os
 import json 
 import pandas as pd
 import warnings
@@ -6,12 +7,15 @@ import ast
 import numpy as np
 from scipy import stats
 import argparse
+from datetime import datetime
 
 # Services
 from Services import GeoService, MapFeatureAggregator, AddressToCoordinateConverter
+from utils.reading import apartments_path, read_apartments
 
 parser = argparse.ArgumentParser(description='Process the script arguments')
 parser.add_argument('-data_dir', type=str, help='Directory where the CSV files will be saved')
+parser.add_argument('-changed_since', type=str, default=None, help='Only apartments changed since this date (YYYY-MM-DD) or unix timestamp, needs the SQLite storage')
 
 # Parse the arguments
 args = parser.parse_args()
@@ -21,6 +25,29 @@ if data_dir is None:
     print('Provide data directory')
     exit()
 
+changed_since = None
+if args.changed_since is not None:
+    try:
+        changed_since = float(args.changed_since)
+    except ValueError:
+        changed_since = datetime.fromisoformat(args.changed_since).timestamp()
+
+# The SQLite database (`-storage sqlite`) or the Parquet datasets (`-storage parquet`) are read if there are, CSV files otherwise
+data_dirs = {
+    "bars" : apartments_path("scraping_results/data/bars_apartments"),
+    "myrealty" : apartments_path("scraping_results/data/myrealty_apartments"),
+    "bnakaran" : apartments_path("scraping_results/data/bnakaran_apartments"),
+    "scraping_log" : "scraping_results/scraping_log.csv",
+    "apartment_clusters" : "scraping_results/apartment_clusters.csv"
+}
+
+if changed_since is not None and not all(data_dirs[source].endswith(".sqlite") for source in ["bars", "myrealty", "bnakaran"]):
+    print("-changed_since needs the SQLite storage (scrape_apartments.py -storage sqlite)")
+    exit(1)
+
+# Only the changed apartments are prepared, into their own files, so the full data set is kept
+output_suffix = "_changed" if changed_since is not None else ""
+
 with open("config.json", 'r') as file:
     config = json.load(file)
     building_type_mapping = config["building_type_mapping"]
@@ -58,8 +85,8 @@ def combine_datas(bars, myrealty, bnakaran):
     scraping_log = pd.read_csv(data_dirs["scraping_log"], index_col=0)
     rents = scraping_log[scraping_log.webpage.str.contains("rent")]
     rents = rents[rents.success == True]
-    bnakaran_raw = pd.read_csv(data_dirs["bnakaran"], index_col=0)
-    myrealty_raw = pd.read_csv(data_dirs["myrealty"], index_col=0)
+    bnakaran_raw = read_apartments(data_dirs["bnakaran"], columns = ["id", "webpage"], source = "bnakaran")
+    myrealty_raw = read_apartments(data_dirs["myrealty"], columns = ["id", "webpage"], source = "myrealty")
     
     renting_ap = bnakaran_raw[bnakaran_raw.webpage.isin(rents.webpage)]
     filtered_data_bnakaran = data[(data["source"] == 'bnakaran') & (data["id"].isin(renting_ap["id"]))]
@@ -84,12 +111,12 @@ def combine_datas(bars, myrealty, bnakaran):
     
     data["coordinates"] = data.apply(lambda row: (row['longitude'], row['latitude']), axis=1)
     
-    data.to_csv(f"{data_dir}/data_nomap_badprice.csv", index = False)
+    data.to_csv(f"{data_dir}/data_nomap_badprice{output_suffix}.csv", index = False)
     
     print("Adding significant locations...")
     significant_distances = aggregator.significant_distances(data, "coordinates")
     significant_distances = significant_distances.reset_index(drop = True)
-    significant_distances.to_csv(f"{data_dir}/significant_locations.csv", index=False)
+    significant_distances.to_csv(f"{data_dir}/significant_locations{output_suffix}.csv", index=False)
     
     print("Adding amenities...")
     amenities = aggregator.amenities_count(data, "coordinates")
@@ -119,17 +146,19 @@ def combine_datas(bars, myrealty, bnakaran):
     data = pd.get_dummies(data, columns = ["building_type", "condition"])
     data.drop(columns = ["building_type_Other", "condition_Other"])
     data = data.drop_duplicates(["source", "id"])
+
+    # The same apartment listed several times (found by `build_image_index.py` from their photos) is kept once
+    if os.path.exists(data_dirs["apartment_clusters"]):
+        clusters = pd.read_csv(data_dirs["apartment_clusters"], dtype = {"id": str})
+        cluster_of = {(row.source, row.id): row.cluster for row in clusters.itertuples()}
+        keys = data.apply(lambda row: cluster_of.get((row["source"], str(row["id"]))), axis = 1)
+        duplicates = keys.notna() & keys.duplicated()
+        print("Cross-listed duplicates removed", duplicates.sum())
+        data = data[~duplicates]
     
     data = data.dropna()
     return data
 
-data_dirs = {
-    "bars" : "scraping_results/data/bars_apartments.csv",
-    "myrealty" : "scraping_results/data/myrealty_apartments.csv",
-    "bnakaran" : "scraping_results/data/bnakaran_apartments.csv",
-    "scraping_log" : "scraping_results/scraping_log.csv"
-}
-
 bars = prepare_bars(
     data_dirs["bars"],
     location_converter = converter,
@@ -137,7 +166,8 @@ bars = prepare_bars(
     bars_condition_mapping = condition_mapping["bars"],
     bars_feature_mapping = feature_mapping["bars"],
     common_features = commong_features,
-    skip_geo = False
+    skip_geo = False,
+    changed_since = changed_since
 )
 print()
 
@@ -148,7 +178,8 @@ myrealty = prepare_myrealty(
     myrealty_condition_mapping = condition_mapping["myrealty"],
     myrealty_feature_mapping = feature_mapping["myrealty"],
     common_features = commong_features,
-    skip_geo = False
+    skip_geo = False,
+    changed_since = changed_since
 )
 print()
 
@@ -159,13 +190,14 @@ bnakaran = prepare_bnakaran(
     bnakaran_condition_mapping = condition_mapping["bnakaran"],
     bnakaran_feature_mapping = feature_mapping["bnakaran"],
     common_features = commong_features,
-    skip_geo = False
+    skip_geo = False,
+    changed_since = changed_since
 )
 print()
 
-bars.to_csv(f"{data_dir}/bars_almost_ready.csv", index=False)
-myrealty.to_csv(f"{data_dir}/myrealty_almost_ready.csv", index=False)
-bnakaran.to_csv(f"{data_dir}/bnakaran_almost_ready.csv",index=False)
+bars.to_csv(f"{data_dir}/bars_almost_ready{output_suffix}.csv", index=False)
+myrealty.to_csv(f"{data_dir}/myrealty_almost_ready{output_suffix}.csv", index=False)
+bnakaran.to_csv(f"{data_dir}/bnakaran_almost_ready{output_suffix}.csv",index=False)
 
 data = combine_datas(
     bars,
@@ -174,8 +206,9 @@ data = combine_datas(
 )
 
 
-data.to_csv(f"{data_dir}/data.csv",index=False)
-data_small = data.sample(frac=1).reset_index(drop=True)[:300]
-data_small.to_csv(f"{data_dir}/data_small.csv", index=False)
-data_small[:100].to_csv(f"{data_dir}/data_tiny.csv", index=False)
+data.to_csv(f"{data_dir}/data{output_suffix}.csv",index=False)
+if changed_since is None:
+    data_small = data.sample(frac=1).reset_index(drop=True)[:300]
+    data_small.to_csv(f"{data_dir}/data_small.csv", index=False)
+    data_small[:100].to_csv(f"{data_dir}/data_tiny.csv", index=False)
 print("Done")
\ No newline at end of file
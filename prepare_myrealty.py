@@ -3,6 +3,7 @@ import re
 import ast
 import pandas as pd
 from utils.dummies import dummify_columns
+from utils.reading import read_apartments
 from utils.formatting import myrealty_format_address
 
 def prepare_myrealty(
@@ -12,10 +13,11 @@ def prepare_myrealty(
     myrealty_condition_mapping,
     myrealty_feature_mapping,
     common_features,
-    skip_geo = False
+    skip_geo = False,
+    changed_since = None
 ):
     print("Preparing MyRealty...")
-    myrealty = pd.read_csv(raw_data_dir)
+    myrealty = read_apartments(raw_data_dir, list_columns = ["facilities"], source = "myrealty", changed_since = changed_since)
     myrealty = myrealty.dropna(axis = 1, how="all") # remove all NaN columns 
 
     print("Basic cleaning...")
@@ -30,8 +32,6 @@ def prepare_myrealty(
     # Condition
     myrealty["condition"] = myrealty["condition"].map(myrealty_condition_mapping)
 
-    myrealty['facilities'] = myrealty['facilities'].apply(ast.literal_eval)
-
     myrealty = myrealty.drop(columns = [
         "webpage",
         "view_count",
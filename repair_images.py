@@ -0,0 +1,61 @@
+import os
+import asyncio
+import aiohttp
+import argparse
+import logging
+
+from ConcreteStorages import ImageStorage
+from Services import ImageLoader, ImageManifest, ImageResizer
+
+# Downloads the images the manifest of the scraping has no file for: the ones pending when a run
+# stopped, the failed ones whose backoff is over, and the removed ones. The detail pages are not
+# requested again, the URLs of the images are in the manifest.
+
+parser = argparse.ArgumentParser(description='Image repair arguments')
+parser.add_argument('-images_dir', type=str, default='scraping_results/images', help='Directory of the images of the apartments')
+parser.add_argument('-manifest', type=str, default='scraping_results/image_manifest.sqlite', help='Image manifest written by scrape_apartments.py')
+parser.add_argument('-image_layout', type=str, default='paths', help='paths | content, as when scraping')
+parser.add_argument('-image_sizes', type=str, default='', help='Sides of the training sized variants of the images, as when scraping')
+parser.add_argument('-image_originals', type=str, default='keep', help='keep | drop, as when scraping')
+parser.add_argument('-retry_now', type=str, default='no', help='yes | no, yes retries the failed images before their backoff is over')
+parser.add_argument('-max_in_flight', type=int, default=64, help='Images downloaded at the same time')
+parser.add_argument('-max_in_flight_per_host', type=int, default=16, help='Images downloaded at the same time from one host')
+args = parser.parse_args()
+
+logging.basicConfig(level = logging.INFO)
+
+# The repaired images get their variants too
+image_resizer = None
+if args.image_sizes:
+    image_resizer = ImageResizer(sizes = [int(size) for size in args.image_sizes.split(",")])
+    image_resizer.start()
+
+images_path = args.images_dir.rstrip("/") + "/"
+image_storage = ImageStorage(
+    images_path = images_path,
+    image_error_log_path = os.path.join(os.path.dirname(images_path.rstrip("/")), "image_error_log.jsonl"),
+    content_addressed = args.image_layout == "content",
+    resizer = image_resizer,
+    keep_originals = args.image_originals == "keep"
+)
+image_manifest = ImageManifest(args.manifest)
+image_loader = ImageLoader(image_storage, manifest = image_manifest)
+
+images = image_manifest.to_repair(images_path, retry_now = args.retry_now == "yes")
+print("Before", image_manifest.counts())
+print(f"{len(images)} images to download")
+
+async def repair():
+    connector = aiohttp.TCPConnector(limit = args.max_in_flight, limit_per_host = args.max_in_flight_per_host)
+    async with aiohttp.ClientSession(connector = connector, timeout = aiohttp.ClientTimeout(total = 60)) as session:
+        await asyncio.gather(*[
+            image_loader.download_image(session, url, source, apartment_id, index)
+            for source, apartment_id, index, url in images
+        ])
+
+asyncio.run(repair())
+if image_resizer is not None:
+    image_resizer.close()
+image_storage.close()
+print("After", image_manifest.counts())
+image_manifest.close()
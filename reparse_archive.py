@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+import argparse
+import collections
+
+from ConcreteScrapers.Bars.BarsApartmentScraper import BarsApartmentScraper
+from ConcreteScrapers.Bnakaran.BnakaranApartmentScraper import BnakaranApartmentScraper
+from ConcreteScrapers.MyRealty.MyRealtyApartmentScraper import MyRealtyApartmentScraper
+from ConcreteStorages import CSVStorage, ParquetStorage, SQLiteStorage, HTMLArchive
+from Services import ParseStage, HTMLParser
+
+# Rebuilds the apartments CSVs (or Parquet datasets) from the pages archived while scraping,
+# without the network. The last fetch of every detail page is parsed,
+# in parallel over all cores.
+
+parser = argparse.ArgumentParser(description='Re-parsing arguments')
+parser.add_argument('-archive_dir', type=str, default='scraping_results/archive', help='Directory of the HTML archive')
+parser.add_argument('-output_dir', type=str, default='scraping_results/reparsed', help='Directory where the CSV files will be saved')
+parser.add_argument('-workers', type=int, default=os.cpu_count(), help='Number of parsing processes')
+parser.add_argument('-storage', type=str, default='csv', help='csv | parquet | sqlite')
+parser.add_argument('-max_pending', type=int, default=None, help='Pages read and being parsed at the same time, 4 per process by default')
+parser.add_argument('-parser', type=str, default='html.parser', help='html.parser | lxml | selectolax')
+args = parser.parse_args()
+
+os.makedirs(args.output_dir, exist_ok = True)
+logging.basicConfig(filename = os.path.join(args.output_dir, 'reparse.log'), level = logging.INFO)
+
+scrapers = {
+    scraper.source_identifier(): scraper
+    for scraper in [BarsApartmentScraper, BnakaranApartmentScraper, MyRealtyApartmentScraper]
+}
+
+archive = HTMLArchive(args.archive_dir)
+entries = archive.entries(kind = "detail", latest = True)
+print(f"Re-parsing {len(entries)} detail pages from {args.archive_dir}")
+
+HTMLParser.use(args.parser)
+parse_stage = ParseStage(max_workers = args.workers)
+parse_stage.start()
+
+storages = {}
+for source in set(entry["source"] for entry in entries):
+    if source not in scrapers:
+        print(f"No scraper for {source}, skipping its pages")
+        continue
+    if args.storage == "parquet":
+        storage = ParquetStorage(file_path = os.path.join(args.output_dir, f"{source}_apartments.parquet"))
+    elif args.storage == "sqlite":
+        storage = SQLiteStorage(file_path = os.path.join(args.output_dir, "apartments.sqlite"))
+    else:
+        storage = CSVStorage(file_path = os.path.join(args.output_dir, f"{source}_apartments.csv"))
+    storage.initialize()
+    storages[source] = storage
+
+def store(entry, future):
+    try:
+        apartment_data, _, _ = future.result()
+        storages[entry["source"]].append(apartment_data)
+        return True
+    except Exception as e:
+        logging.error(f"{entry['source']} | failed to re-parse {entry['url']}: {e}")
+        return False
+
+start = time.time()
+# Pages are read from the archive only as the ones before them are parsed, so at most
+# `max_pending` of them are in memory whatever the size of the archive
+max_pending = args.max_pending or 4 * parse_stage.max_workers
+pending = collections.deque()
+rows = 0
+errors = 0
+for entry in entries:
+    if entry["source"] not in storages:
+        continue
+    if len(pending) >= max_pending:
+        if store(*pending.popleft()):
+            rows += 1
+        else:
+            errors += 1
+    html = archive.get(entry["sha256"])
+    pending.append((entry, parse_stage.submit(scrapers[entry["source"]], entry["url"], html)))
+
+while pending:
+    if store(*pending.popleft()):
+        rows += 1
+    else:
+        errors += 1
+
+for storage in storages.values():
+    storage.close_file()
+parse_stage.close()
+
+print(f"Done in {time.time() - start:.1f}s, {rows} rows, {errors} errors")
+for source, storage in storages.items():
+    print(f"{source}: {storage.path()}")
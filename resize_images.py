@@ -0,0 +1,38 @@
+import os
+import argparse
+
+from Services.ImageResizer import ImageResizer
+
+# Writes the training sized variants of the images already downloaded,
+# `scrape_apartments.py -image_sizes` writes them for the new ones.
+
+parser = argparse.ArgumentParser(description='Image resizing arguments')
+parser.add_argument('-images_dir', type=str, default='scraping_results/images', help='Directory of the images of the apartments')
+parser.add_argument('-sizes', type=str, default='256', help='Sides of the variants, e.g. 256 or 256,384')
+parser.add_argument('-quality', type=int, default=90, help='JPEG quality of the variants')
+parser.add_argument('-workers', type=int, default=os.cpu_count(), help='Number of resizing processes')
+args = parser.parse_args()
+
+images_path = args.images_dir.rstrip("/") + "/"
+sizes = [int(size) for size in args.sizes.split(",")]
+resizer = ImageResizer(sizes = sizes, quality = args.quality, max_workers = args.workers)
+resizer.start()
+
+skipped = 0
+for directory, _, files in os.walk(images_path):
+    for file in files:
+        if file.endswith(".tmp"):
+            continue
+        path = os.path.join(directory, file)
+        image_name = os.path.relpath(path, images_path)
+        # Variants newer than their original are already there
+        variants = [ImageResizer.variants_path(images_path, size) + os.path.splitext(image_name)[0] + ".jpg" for size in sizes]
+        if all(os.path.exists(variant) and os.path.getmtime(variant) >= os.path.getmtime(path) for variant in variants):
+            skipped += 1
+            continue
+        resizer.submit(path, images_path, image_name)
+
+resizer.close()
+stats = resizer.stats()
+print(f"{stats['resized']} images resized, {stats['failed']} failed, {skipped} already resized")
+print(f"{stats['bytes_in'] / 1024 ** 2:.1f} MB of originals, {stats['bytes_out'] / 1024 ** 2:.1f} MB of variants")
@@ -10,86 +10,245 @@ from ConcreteScrapers.Bars.BarsApartmentScrapingPipeline import BarsApartmentScr
 from ConcreteScrapers.MyRealty.MyRealtyScrapingPipeline import MyRealtyScrapingPipeline
 
 # Storage
-from ConcreteStorages import CSVStorage, ImageStorage
+from ConcreteStorages import CSVStorage, ParquetStorage, SQLiteStorage, ImageStorage, HTMLArchive, SQLiteWorkQueue
 
 # Services
-from Services import ImageLoader, ScrapingLogService
+from Services import ImageDownloadService, ImageManifest, ImageResizer, ScrapingLogService, SitemapLastmodService, CrawlQueue, HTTPCache, RateController, HTTPClient, AsyncHTTPClient, ParseStage, HTMLParser
 
 # Misc
 import os
+import sys
+import atexit
+import signal
+import socket
+import asyncio
+import argparse
 import logging
 import pandas as pd
 
+parser = argparse.ArgumentParser(description='Scraping arguments')
+parser.add_argument('-mode', type=str, default='threads', help='threads | async | coordinator | worker')
+parser.add_argument('-work_queue', type=str, default='scraping_results/work_queue.sqlite', help='Queue shared by the coordinator and the workers')
+parser.add_argument('-worker_threads', type=int, default=8, help='Links scraped at the same time by a worker')
+parser.add_argument('-listing', type=str, default='walk', help='walk | fan_out, fan_out finds the last listing page and loads all pages at once')
+parser.add_argument('-parser', type=str, default='html.parser', help='html.parser | lxml | selectolax')
+parser.add_argument('-cache_max_mb', type=int, default=2048, help='Size of the HTTP cache of pages, 0 disables it')
+parser.add_argument('-image_layout', type=str, default='paths', help='paths | content, content stores identical images once')
+parser.add_argument('-image_sizes', type=str, default='', help='Sides of the training sized variants of the images, e.g. 256 or 256,384, none by default')
+parser.add_argument('-image_originals', type=str, default='keep', help='keep | drop, drop keeps only the variants of -image_sizes')
+parser.add_argument('-storage', type=str, default='csv', help='csv | parquet | sqlite, format of the scraped apartments')
+parser.add_argument('-cache_ttl_days', type=float, default=30, help='Days after which a cached page is downloaded again instead of revalidated')
+args = parser.parse_args()
+mode = args.mode
+
 scraping_folder = "scraping_results/"
 if not os.path.exists(scraping_folder):
     os.mkdir("scraping_results/")
 logging.basicConfig(filename = scraping_folder + 'scraping.log', level = logging.INFO)
 
+# Parsing runs in its own processes, started before any thread
+HTMLParser.use(args.parser)
+parse_stage = ParseStage(max_workers = os.cpu_count())
+parse_stage.start()
+# Variants of the images for the training, resized once when they are saved
+image_resizer = None
+if args.image_sizes:
+    image_resizer = ImageResizer(sizes = [int(size) for size in args.image_sizes.split(",")])
+    image_resizer.start()
+
 # Defining storages
 image_storage = ImageStorage(
     images_path = scraping_folder + "images/",
-    image_error_log_path = scraping_folder + "image_error_log.csv"
+    image_error_log_path = scraping_folder + "image_error_log.jsonl",
+    # Identical photos stored once, the apartment paths are hardlinks to them
+    content_addressed = args.image_layout == "content",
+    resizer = image_resizer,
+    keep_originals = args.image_originals == "keep"
 )
 
-bnakaran_storage = CSVStorage(
-    file_path = scraping_folder + "data/bnakaran_apartments.csv"
-)
+# Parquet keeps the types and the lists of the scraped values, and `prepare_data.py` reads only the columns it needs
+if args.storage == "parquet":
+    apartment_storage = lambda name: ParquetStorage(file_path = scraping_folder + f"data/{name}.parquet")
+elif args.storage == "sqlite":
+    # One database for all sources, scraping an apartment again updates its row
+    os.makedirs(scraping_folder + "data/", exist_ok = True)
+    sqlite_storage = SQLiteStorage(file_path = scraping_folder + "data/apartments.sqlite")
+    apartment_storage = lambda name: sqlite_storage
+else:
+    apartment_storage = lambda name: CSVStorage(file_path = scraping_folder + f"data/{name}.csv")
+
+bnakaran_storage = apartment_storage("bnakaran_apartments")
 bnakaran_storage.initialize()
 
-bars_storage = CSVStorage(
-    file_path = scraping_folder + "data/bars_apartments.csv"
-)
+bars_storage = apartment_storage("bars_apartments")
 bars_storage.initialize()
 
-myrealty_storage = CSVStorage(
-    file_path = scraping_folder + "data/myrealty_apartments.csv"
-)
+myrealty_storage = apartment_storage("myrealty_apartments")
 myrealty_storage.initialize()
 
+# Raw pages, to parse them again with `reparse_archive.py`
+html_archive = HTMLArchive(
+    archive_dir = scraping_folder + "archive/"
+)
+html_archive.initialize()
+
 # Services
-image_loader = ImageLoader(image_storage)
+# Pages unchanged since the last run are revalidated (304) instead of downloaded
+http_cache = None
+if args.cache_max_mb > 0:
+    http_cache = HTTPCache(
+        cache_dir = scraping_folder + "http_cache/",
+        max_bytes = args.cache_max_mb * 1024 ** 2,
+        ttl = args.cache_ttl_days * 24 * 3600
+    )
+# Requests in flight to every source grow while it answers well, and are cut on 429, 5xx or captcha
+rate_controller = RateController(
+    initial_limit = 2,
+    max_limit = 16
+)
+http_client = HTTPClient(
+    timeout = (10, 30),
+    max_retries = 3,
+    cache = http_cache,
+    rate_controller = rate_controller
+)
+# Photos already downloaded by a previous run are skipped, failed ones are retried after a backoff
+image_manifest = ImageManifest(
+    path = scraping_folder + "image_manifest.sqlite"
+)
+# Photos are downloaded in the background, by one event loop thread for all pipelines
+image_loader = ImageDownloadService(
+    image_storage,
+    manifest = image_manifest,
+    max_in_flight = 64,
+    max_in_flight_per_host = 16
+)
+image_loader.start()
 log_service = ScrapingLogService(
     path = scraping_folder + "scraping_log.csv"
 )
 
+# On exit, even on SIGTERM, the queued rows are written and the apartments they acknowledge logged
+def close_storages():
+    for storage in (bnakaran_storage, bars_storage, myrealty_storage):
+        storage.close_file()
+    log_service.close()
+atexit.register(close_storages)
+# SIGTERM ends the process without running atexit, turn it into an exit
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+# Only the apartments of the sitemap that are new or changed since the last run are queued
+sitemap_lastmod_service = SitemapLastmodService(
+    path = scraping_folder + "sitemap_lastmod.sqlite"
+)
+# Pending links and listing pages of every pipeline, a restart continues from them
+crawl_queue = CrawlQueue(
+    path = scraping_folder + "crawl_queue.sqlite"
+)
+
 # Defining pipelines
 myrealty_scraper_pipeline = MyRealtyScrapingPipeline(
     "https://myrealty.am/en/apartments-for-sale/7784",
     myrealty_storage,
-    image_loader = image_loader
+    image_loader = image_loader,
+    http_client = http_client,
+    parse_stage = parse_stage,
+    archive = html_archive
 )
 print("Initialized MyRealty")
 
 bnakaran_scraper_pipeline = BnakaranScrapingPipeline(
     "https://www.bnakaran.com/en/listing?ctype=apartment&deal=sale&country=am&sort=relevance", 
     bnakaran_storage,
-    image_loader
+    image_loader,
+    http_client = http_client,
+    parse_stage = parse_stage,
+    archive = html_archive
 )
 print("Initialized Bnakaran")
 
-bnakaran_sitemap_scraper_pipeline = BnakaranSitemapScrapingPipeline(
-    "https://www.bnakaran.com/en/sitemap.xml", 
-    bnakaran_storage,
-    image_loader
-)
-print("Initialized Bnakaran with sitemap")
+# Workers only scrape detail pages, the sitemap is read by the coordinator
+bnakaran_sitemap_scraper_pipeline = None
+if mode != "worker":
+    bnakaran_sitemap_scraper_pipeline = BnakaranSitemapScrapingPipeline(
+        "https://www.bnakaran.com/en/sitemap.xml", 
+        bnakaran_storage,
+        image_loader,
+        http_client = http_client,
+        parse_stage = parse_stage,
+        archive = html_archive,
+        lastmod_service = sitemap_lastmod_service
+    )
+    print("Initialized Bnakaran with sitemap")
 
 bars_scraper_pipeline = BarsApartmentScrapingPipeline(
     "https://bars.am/en/properties/standard/apartment", 
     bars_storage,
-    image_loader
+    image_loader,
+    http_client = http_client,
+    parse_stage = parse_stage,
+    archive = html_archive
 )
 print("Initialized Bars")
 
 print("Starting...")
 global_scraping_pipeline = GlobalScrapingPipeline(
     pipelines = [
-        bnakaran_scraper_pipeline,
-        bnakaran_sitemap_scraper_pipeline,
-        bars_scraper_pipeline,
-        myrealty_scraper_pipeline
+        pipeline for pipeline in [
+            bnakaran_scraper_pipeline,
+            bnakaran_sitemap_scraper_pipeline,
+            bars_scraper_pipeline,
+            myrealty_scraper_pipeline
+        ] if pipeline is not None
     ],
-    log_service = log_service
+    log_service = log_service,
+    # Upper bounds of the detail pages scraped concurrently for each source,
+    # the rate controller finds how many of them each source actually takes
+    workers_per_source = {
+        "bnakaran" : 16,
+        "myrealty" : 16,
+        "bars" : 16
+    },
+    fan_out = args.listing == "fan_out",
+    max_listing_requests = 8,
+    # With workers, the work queue keeps the state of the crawl
+    crawl_queue = crawl_queue if mode in ("threads", "async") else None
 )
 
-global_scraping_pipeline.run()
\ No newline at end of file
+if mode == "async":
+    # Everything runs on one event loop, bounded per host by the client
+    async def run_async():
+        async with AsyncHTTPClient(max_in_flight = 1000, max_in_flight_per_host = 64, cache = http_cache, rate_controller = rate_controller) as async_http_client:
+            await global_scraping_pipeline.run_async(async_http_client, max_in_flight = 1000)
+    asyncio.run(run_async())
+elif mode in ("coordinator", "worker"):
+    # One coordinator walks the listing pages, any number of workers on this machine scrape the links
+    work_queue = SQLiteWorkQueue(args.work_queue)
+    if mode == "coordinator":
+        global_scraping_pipeline.run_coordinator(work_queue)
+    else:
+        global_scraping_pipeline.run_worker(
+            work_queue,
+            worker_id = f"{socket.gethostname()}-{os.getpid()}",
+            threads = args.worker_threads
+        )
+    print(work_queue.counts())
+    work_queue.close()
+else:
+    global_scraping_pipeline.run()
+http_client.log_stats()
+# Waits for the queued photos
+image_loader.close()
+image_manifest.close()
+image_storage.log_stats()
+image_storage.close()
+if image_resizer is not None:
+    image_resizer.close()
+parse_stage.close()
+html_archive.close_file()
+for storage in (bnakaran_storage, bars_storage, myrealty_storage):
+    storage.close_file()
+sitemap_lastmod_service.close()
+crawl_queue.close()
+log_service.close()
+if http_cache is not None:
+    http_cache.close()
\ No newline at end of file
@@ -0,0 +1,16 @@
+import argparse
+import pandas as pd
+
+from ConcreteStorages import ImageStorage
+
+# Counts the failed images of the error log (and its rotated files) by source, host and status code
+
+parser = argparse.ArgumentParser(description='Image error summary arguments')
+parser.add_argument('-log', type=str, default='scraping_results/image_error_log.jsonl', help='Error log of the images')
+parser.add_argument('-by', type=str, default='source,host,status_code', help='Fields the errors are grouped by')
+args = parser.parse_args()
+
+summary = ImageStorage.summarize_errors(args.log, by = tuple(args.by.split(",")))
+with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200, "display.max_colwidth", 60):
+    print(summary)
+print(f"{summary['errors'].sum()} errors")
@@ -0,0 +1,55 @@
+import os
+import ast
+import pandas as pd
+from ConcreteStorages.SQLiteStorage import SQLiteStorage
+
+def apartments_path(base_path):
+    """
+    Returns the database of the scraping results if there is one (`SQLiteStorage`, `apartments.sqlite`
+    next to the other files), else the Parquet dataset of a source if there is one (`ParquetStorage`),
+    its CSV file otherwise (`CSVStorage`). `base_path` has no extension, e.g.
+    `scraping_results/data/bars_apartments`.
+    """
+    database_path = os.path.join(os.path.dirname(base_path), "apartments.sqlite")
+    if os.path.exists(database_path):
+        return database_path
+    if os.path.isdir(base_path + ".parquet"):
+        return base_path + ".parquet"
+    return base_path + ".csv"
+
+def read_apartments(path, columns = None, list_columns = (), map_columns = (), source = None, changed_since = None):
+    """
+    Reads scraped apartments from a CSV file, a Parquet dataset or a SQLite database.
+
+    Args:
+        path (str): The CSV file, the Parquet dataset directory or the database.
+        columns (list, optional): Only read these columns, in Parquet the others are not even loaded.
+        list_columns (list): Columns of lists, e.g. `facilities`.
+        map_columns (list): Columns of dictionaries, e.g. `room_details`.
+            In CSV both are Python representations and are evaluated,
+            in Parquet they are converted from Arrow lists and maps.
+        source (str, optional): The source of the apartments, to select them in the database, which holds all sources.
+        changed_since (float, optional): Only the apartments changed after this unix timestamp, database only.
+
+    Returns:
+        DataFrame: The apartments, with Python lists and dictionaries in those columns.
+    """
+    if path.endswith(".sqlite"):
+        data = SQLiteStorage.read(path, source = source, changed_since = changed_since, columns = columns)
+        # Same columns as the other formats
+        data = data.drop(columns = ["first_seen", "last_seen", "changed_at"])
+    elif path.endswith(".parquet"):
+        data = pd.read_parquet(path, columns = columns)
+        for column in list_columns:
+            if column in data:
+                data[column] = data[column].apply(lambda value: None if value is None else list(value))
+        # Maps are read as lists of (key, value) pairs
+        for column in map_columns:
+            if column in data:
+                data[column] = data[column].apply(lambda value: None if value is None else dict(value))
+    else:
+        data = pd.read_csv(path, usecols = columns)
+        for column in [*list_columns, *map_columns]:
+            if column in data:
+                data[column] = data[column].apply(ast.literal_eval)
+    return data